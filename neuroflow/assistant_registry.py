@@ -0,0 +1,139 @@
+import os
+import json
+import asyncio
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional
+from backboard import BackboardClient
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+"""
+Persistent name/description -> assistant_id registry.
+
+Creating a Backboard assistant is a full remote round-trip, and every process (and,
+before client pooling, every Streamlit turn) used to create a brand new one. The
+registry remembers the IDs we already created in a small JSON file so init_assistant
+only falls back to create_assistant the first time a given assistant is needed.
+
+Several processes share the file (the server, Streamlit, the CLIs), so every change
+re-reads it and merges under an exclusive lock on a sidecar .lock file; a process never
+writes back its own stale copy over entries another process added.
+"""
+
+REGISTRY_PATH = os.getenv("NEUROFLOW_ASSISTANT_REGISTRY", ".neuroflow/assistants.json")
+
+
+class AssistantRegistry:
+    def __init__(self, path: str = REGISTRY_PATH):
+        self.path = path
+        self._ids: Optional[Dict[str, dict]] = None
+        self._file_lock = threading.Lock()
+        self._create_locks: Dict[str, asyncio.Lock] = {}
+
+    @staticmethod
+    def key(name: str, description: str) -> str:
+        return hashlib.sha256(f"{name}\n{description}".encode("utf-8")).hexdigest()
+
+    def _read(self) -> Dict[str, dict]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except json.JSONDecodeError:
+            print(f"⚠️ Assistant registry at {self.path} is corrupt, starting fresh.")
+            return {}
+
+    def _load(self, refresh: bool = False) -> Dict[str, dict]:
+        if self._ids is None or refresh:
+            self._ids = self._read()
+        return self._ids
+
+    @contextmanager
+    def _exclusive(self) -> Iterator[None]:
+        # Serializes read-merge-write across processes; the thread lock covers this one
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(f"{self.path}.lock", "a+b") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                else:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _update(self, change: Callable[[Dict[str, dict]], bool]):
+        """
+        Re-reads the file, applies change to it and writes it back if change returns True.
+        """
+        with self._file_lock, self._exclusive():
+            ids = self._load(refresh=True)
+            if not change(ids):
+                return
+            # Write to a temp file first so a crash never leaves half a registry behind
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(ids, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+    def lookup(self, name: str, description: str, refresh: bool = False) -> Optional[str]:
+        """
+        refresh=True re-reads the file, to see assistants other processes created since.
+        """
+        with self._file_lock:
+            entry = self._load(refresh).get(self.key(name, description))
+        return entry["assistant_id"] if entry else None
+
+    def store(self, name: str, description: str, assistant_id: str):
+        def change(ids: Dict[str, dict]) -> bool:
+            ids[self.key(name, description)] = {
+                "name": name,
+                "description": description,
+                "assistant_id": assistant_id,
+            }
+            return True
+
+        self._update(change)
+
+    def forget(self, name: str, description: str):
+        """
+        Drops a stale entry (e.g. the assistant was deleted remotely).
+        """
+        self._update(lambda ids: ids.pop(self.key(name, description), None) is not None)
+
+    async def resolve(self, client: BackboardClient, name: str, description: str) -> str:
+        """
+        Returns the ID of the assistant registered under name/description,
+        creating (and registering) it only if we have never seen it before.
+        """
+        assistant_id = self.lookup(name, description)
+        if assistant_id is not None:
+            return assistant_id
+
+        # Concurrent sessions asking for the same assistant should create it once
+        lock = self._create_locks.setdefault(self.key(name, description), asyncio.Lock())
+        async with lock:
+            assistant_id = self.lookup(name, description, refresh=True)
+            if assistant_id is None:
+                assistant = await client.create_assistant(name=name, description=description)
+                assistant_id = str(assistant.assistant_id)
+                self.store(name, description, assistant_id)
+        return assistant_id
+
+
+# Shared by LLMClient and MemoryManager
+registry = AssistantRegistry()
@@ -0,0 +1,121 @@
+import os
+import sys
+import time
+import random
+import tempfile
+import argparse
+import datetime
+from typing import Callable, Dict, List, Optional
+
+from tools.note_archive import NoteArchive
+from tracing import percentile
+
+"""
+Query latency of the SOAP note archive (tools/note_archive.py) at dashboard scale.
+
+Fills a throwaway archive with synthetic notes (patients, dates over a year, risk factors
+and differential diagnoses drawn from small pools, like real intakes), then times the
+clinician dashboard's queries. Run from the neuroflow/ directory:
+
+    python -m bench.archive_bench --notes 20000
+    python -m bench.archive_bench --notes 20000 --max-ms 10   # exits 1 if a query's p99 is slower
+"""
+
+RISK_FACTORS = [
+    'Suicidal ideation (screen-flagged: "want to die")', "Self-harm", "Hopelessness", "Substance misuse",
+    "Abuse or unsafe environment", "Social isolation", "Sleep disturbance", "Recent loss",
+]
+DIAGNOSES = [
+    "Generalized anxiety disorder", "Major depressive disorder", "Adjustment disorder",
+    "Panic disorder", "Post-traumatic stress disorder", "Insomnia disorder", "Alcohol use disorder",
+]
+COMPLAINTS = ["Trouble sleeping", "Constant worry", "Low mood", "Panic attacks", "Stress at work", "Grief"]
+
+
+def synthetic_note(rng: random.Random, patient: int) -> dict:
+    return {
+        "patient_id": f"patient-{patient:05d}",
+        "subjective": {
+            "chief_complaint": rng.choice(COMPLAINTS),
+            "history_of_present_illness": "Synthetic note for the archive benchmark",
+            "emotional_state": rng.choice(["anxious", "sad", "numb", "overwhelmed"])
+        },
+        "objective": {
+            "observations": "Synthetic",
+            "risk_factors": rng.sample(RISK_FACTORS, rng.choice([0, 0, 1, 1, 2, 3]))
+        },
+        "assessment": {
+            "summary": "Synthetic",
+            "differential_diagnosis": rng.sample(DIAGNOSES, rng.choice([1, 1, 2, 3]))
+        },
+        "plan": {"immediate_actions": "None", "recommendations": "None"}
+    }
+
+
+def fill(archive: NoteArchive, notes: int, patients: int, seed: int = 7) -> float:
+    rng = random.Random(seed)
+    start_date = datetime.datetime(2025, 1, 1)
+    start = time.perf_counter()
+    for i in range(notes):
+        created = start_date + datetime.timedelta(seconds=rng.randrange(365 * 24 * 3600))
+        archive.add(f"thread-{i:06d}", synthetic_note(rng, rng.randrange(patients)), f"clinical_notes/{i}.pdf", created)
+    return time.perf_counter() - start
+
+
+def time_query(fn: Callable[[], object], rounds: int) -> Dict[str, float]:
+    fn()  # warm-up
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return {"p50_ms": percentile(timings, 50) * 1000, "p99_ms": percentile(timings, 99) * 1000}
+
+
+def deep_page(archive: NoteArchive, pages: int) -> Callable[[], object]:
+    # Cursor of the page `pages` deep, so the timed call is the page after it
+    cursor = None
+    for _ in range(pages):
+        cursor = archive.query(limit=50, cursor=cursor).next_cursor
+    return lambda: archive.query(limit=50, cursor=cursor)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Query latency of the SOAP note archive.")
+    parser.add_argument("--notes", type=int, default=20000)
+    parser.add_argument("--patients", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--max-ms", type=float, default=0.0, help="exit 1 if any query's p99 is slower")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        archive = NoteArchive(os.path.join(directory, "notes.db"))
+        seconds = fill(archive, args.notes, args.patients)
+        print(f"🗂️ {args.notes} notes for {args.patients} patients, filed at {args.notes / seconds:.0f} notes/s")
+
+        queries = {
+            "latest page": lambda: archive.query(limit=50),
+            "patient history": lambda: archive.query(patient_id="patient-00042"),
+            "one day": lambda: archive.query(since="2025-06-01", until="2025-06-02"),
+            "risk factor": lambda: archive.query(risk_factor="suicidal ideation", limit=50),
+            "risk prefix": lambda: archive.query(risk_factor="sub*", limit=50),
+            "diagnosis in a month": lambda: archive.query(diagnosis="panic disorder", since="2025-03-01", until="2025-04-01"),
+            "page 100": deep_page(archive, 100),
+            "count risk factor": lambda: archive.count(risk_factor="self-harm"),
+        }
+        worst = 0.0
+        for name, fn in queries.items():
+            result = time_query(fn, args.rounds)
+            worst = max(worst, result["p99_ms"])
+            print(f"   {name:<22} p50 {result['p50_ms']:.2f} ms | p99 {result['p99_ms']:.2f} ms")
+        archive.close()
+
+    if args.max_ms and worst > args.max_ms:
+        print(f"❌ Slowest query p99 {worst:.2f} ms is above {args.max_ms:.2f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
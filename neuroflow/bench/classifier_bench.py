@@ -0,0 +1,171 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from tools import intent_classifier
+from tools.intent_classifier import IntentClassifier
+from tracing import percentile
+
+"""
+Accuracy and latency report for the local intent/emotion classifier.
+
+Scores tools/intent_classifier.py against labeled patient messages
+(bench/classifier_fixtures.jsonl: one {"text", "intent", "emotion"} per line) and times
+classify(). The lexicon's cue phrases were written with these fixtures in view, so its
+accuracy is in-sample and flatters it; treat it as a regression check, not a measure of
+how it does on new patients. With NumPy installed, the lexicon + model blend is also
+scored with k-fold cross-validation, so the model is always judged on messages it was
+not trained on (the lexicon part of the blend is still in-sample).
+Run from the neuroflow/ directory:
+
+    python -m bench.classifier_bench
+    python -m bench.classifier_bench --train            # fit the model on all fixtures and save it
+    python -m bench.classifier_bench --min-accuracy 0.7 # exits 1 below that intent/emotion accuracy
+"""
+
+FIXTURES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "classifier_fixtures.jsonl")
+
+
+def load_fixtures(path: str = FIXTURES_PATH) -> List[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def label_report(gold: List[str], predicted: List[str]) -> Dict[str, dict]:
+    report = {}
+    for label in sorted(set(gold) | set(predicted)):
+        tp = sum(1 for g, p in zip(gold, predicted) if g == label and p == label)
+        fp = sum(1 for g, p in zip(gold, predicted) if g != label and p == label)
+        fn = sum(1 for g, p in zip(gold, predicted) if g == label and p != label)
+        precision = tp / (tp + fp) if tp + fp else 0.0
+        recall = tp / (tp + fn) if tp + fn else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        report[label] = {"precision": precision, "recall": recall, "f1": f1, "support": tp + fn}
+    return report
+
+
+def evaluate(classifier: IntentClassifier, fixtures: List[dict]) -> dict:
+    predictions = [classifier.classify(item["text"]) for item in fixtures]
+    result = {"n": len(fixtures)}
+    for field in ("intent", "emotion"):
+        gold = [item[field] for item in fixtures]
+        predicted = [getattr(p, field) for p in predictions]
+        correct = sum(g == p for g, p in zip(gold, predicted))
+        result[field] = {
+            "accuracy": correct / len(fixtures) if fixtures else 0.0,
+            "labels": label_report(gold, predicted),
+            "confusions": Counter(f"{g} -> {p}" for g, p in zip(gold, predicted) if g != p).most_common(5),
+        }
+    return result
+
+
+def time_classifier(classifier: IntentClassifier, fixtures: List[dict], rounds: int = 200) -> dict:
+    texts = [item["text"] for item in fixtures]
+    for text in texts:  # warm-up
+        classifier.classify(text)
+    timings = []
+    for _ in range(rounds):
+        for text in texts:
+            start = time.perf_counter()
+            classifier.classify(text)
+            timings.append(time.perf_counter() - start)
+    timings.sort()
+    return {
+        "calls": len(timings),
+        "mean_us": sum(timings) / len(timings) * 1e6,
+        "p50_us": percentile(timings, 50) * 1e6,
+        "p99_us": percentile(timings, 99) * 1e6,
+        "max_us": timings[-1] * 1e6,
+    }
+
+
+def cross_validate(fixtures: List[dict], folds: int = 5, seed: int = 7) -> Optional[dict]:
+    """
+    Held-out accuracy of the lexicon + model blend. None without NumPy.
+    """
+    if intent_classifier.np is None:
+        return None
+    shuffled = list(fixtures)
+    random.Random(seed).shuffle(shuffled)
+    correct = Counter()
+    for fold in range(folds):
+        test = shuffled[fold::folds]
+        train = [item for i, item in enumerate(shuffled) if i % folds != fold]
+        classifier = IntentClassifier(model_path=None)
+        classifier.fit_model([t["text"] for t in train], [t["intent"] for t in train], [t["emotion"] for t in train])
+        for item in test:
+            prediction = classifier.classify(item["text"])
+            correct["intent"] += prediction.intent == item["intent"]
+            correct["emotion"] += prediction.emotion == item["emotion"]
+    return {
+        "folds": folds,
+        "intent_accuracy": correct["intent"] / len(fixtures),
+        "emotion_accuracy": correct["emotion"] / len(fixtures),
+    }
+
+
+def print_report(report: dict):
+    lexicon = report["lexicon"]
+    print(f"🧪 {lexicon['n']} labeled messages")
+    for field in ("intent", "emotion"):
+        print(f"   {field:<8} accuracy {lexicon[field]['accuracy']:.1%} (lexicon, in-sample)")
+        for label, stats in lexicon[field]["labels"].items():
+            if stats["support"]:
+                print(f"      {label:<14} P {stats['precision']:.2f}  R {stats['recall']:.2f}  "
+                      f"F1 {stats['f1']:.2f}  (n={stats['support']})")
+        if lexicon[field]["confusions"]:
+            print("      most confused: " + ", ".join(f"{pair} x{n}" for pair, n in lexicon[field]["confusions"]))
+    cv = report.get("cross_validation")
+    if cv:
+        print(f"   lexicon + model ({cv['folds']}-fold, model held out): intent {cv['intent_accuracy']:.1%} | "
+              f"emotion {cv['emotion_accuracy']:.1%}")
+    latency = report["latency"]
+    print(f"   latency  mean {latency['mean_us']:.1f} µs | p50 {latency['p50_us']:.1f} µs | "
+          f"p99 {latency['p99_us']:.1f} µs | max {latency['max_us']:.1f} µs over {latency['calls']} calls")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Accuracy and latency of the local intent/emotion classifier.")
+    parser.add_argument("--fixtures", default=FIXTURES_PATH)
+    parser.add_argument("--rounds", type=int, default=200, help="timing passes over the fixtures")
+    parser.add_argument("--train", action="store_true", help="fit the NumPy model on all fixtures and save it")
+    parser.add_argument("--model-path", default=intent_classifier.MODEL_PATH)
+    parser.add_argument("--min-accuracy", type=float, default=0.0, help="exit 1 if lexicon accuracy is lower")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    fixtures = load_fixtures(args.fixtures)
+    lexicon_only = IntentClassifier(model_path=None)
+    report = {
+        "lexicon": evaluate(lexicon_only, fixtures),
+        "cross_validation": cross_validate(fixtures),
+        "latency": time_classifier(lexicon_only, fixtures, args.rounds),
+    }
+    print_report(report)
+
+    if args.train:
+        trained = IntentClassifier(model_path=None)
+        trained.fit_model([f["text"] for f in fixtures], [f["intent"] for f in fixtures], [f["emotion"] for f in fixtures])
+        trained.save_model(args.model_path)
+        report["latency_with_model"] = time_classifier(trained, fixtures, args.rounds)
+        print(f"✅ Saved classifier model to {args.model_path} "
+              f"(p50 {report['latency_with_model']['p50_us']:.1f} µs with the model)")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    worst = min(report["lexicon"]["intent"]["accuracy"], report["lexicon"]["emotion"]["accuracy"])
+    if worst < args.min_accuracy:
+        print(f"❌ Accuracy {worst:.1%} is below {args.min_accuracy:.1%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
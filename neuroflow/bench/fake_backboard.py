@@ -0,0 +1,176 @@
+import json
+import uuid
+import random
+import asyncio
+import datetime
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+from backboard.exceptions import BackboardServerError
+from backboard.models import Assistant, MessageResponse, MessageRole, Thread
+
+"""
+In-process stand-in for the BackboardClient surface NeuroFlow uses.
+
+Implements create_assistant, create_thread, add_message (plain and streamed) and
+add_memory with configurable latency and failure injection, returning the SDK's own
+models so the code under test cannot tell the difference. Install it with
+    client_pool.set_client_factory(lambda: FakeBackboardClient(...))
+"""
+
+
+@dataclass
+class Latency:
+    """
+    Latency distribution in seconds.
+    kind: "fixed" (always median), "uniform" (median +/- spread) or "lognormal" (sigma=spread)
+    """
+    median: float = 0.0
+    spread: float = 0.0
+    kind: str = "lognormal"
+
+    @classmethod
+    def parse(cls, spec: str) -> "Latency":
+        """
+        "0.8" -> fixed, "lognormal:0.8:0.4", "uniform:0.5:0.2"
+        """
+        parts = spec.split(":")
+        if len(parts) == 1:
+            return cls(float(parts[0]), 0.0, "fixed")
+        kind, median, spread = parts[0], float(parts[1]), float(parts[2]) if len(parts) > 2 else 0.0
+        if kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency kind: {kind}")
+        return cls(median, spread, kind)
+
+    def sample(self, rng: random.Random) -> float:
+        if self.median <= 0:
+            return 0.0
+        if self.kind == "uniform":
+            return max(0.0, rng.uniform(self.median - self.spread, self.median + self.spread))
+        if self.kind == "lognormal" and self.spread > 0:
+            return rng.lognormvariate(0.0, self.spread) * self.median
+        return self.median
+
+
+DEFAULT_REPLIES = [
+    {
+        "intent": "venting",
+        "emotion": "sad",
+        "response": "Thank you for telling me. How long have you been feeling this way?",
+        "memory_candidates": {"short_term": ["feeling low today"], "long_term": ["reports persistent low mood"]},
+        "terminate": False
+    },
+    {
+        "intent": "worry",
+        "emotion": "anxious",
+        "response": "That sounds stressful. How has it been affecting your sleep?",
+        "memory_candidates": {"short_term": [], "long_term": ["work stress", "trouble sleeping"]},
+        "terminate": False
+    },
+    {
+        "intent": "question",
+        "emotion": "neutral",
+        "response": "That's a good question. Can you tell me a bit more about what worries you most?",
+        "memory_candidates": {"short_term": ["asked about treatment options"], "long_term": []},
+        "terminate": False
+    },
+]
+
+DEFAULT_NOTES = {
+    "patient_id": "unknown",
+    "subjective": {
+        "chief_complaint": "Low mood",
+        "history_of_present_illness": "Several weeks of low mood and poor sleep related to work stress",
+        "emotional_state": "anxious"
+    },
+    "objective": {"observations": "Engaged and coherent", "risk_factors": []},
+    "assessment": {"summary": "Mild depressive symptoms", "differential_diagnosis": ["Adjustment disorder"]},
+    "plan": {"immediate_actions": "None", "recommendations": "Follow up with a clinician"}
+}
+
+_SCRIBE_MARKER = "END OF CLINICAL SESSION"
+
+
+class FakeBackboardClient:
+    def __init__(
+        self,
+        message_latency: Optional[Latency] = None,
+        memory_latency: Optional[Latency] = None,
+        thread_latency: Optional[Latency] = None,
+        replies: Optional[List[Dict[str, Any]]] = None,
+        notes: Optional[Dict[str, Any]] = None,
+        failure_rate: float = 0.0,
+        stream_chunk_size: int = 16,
+        seed: Optional[int] = None
+    ):
+        self.message_latency = message_latency or Latency()
+        self.memory_latency = memory_latency or Latency()
+        self.thread_latency = thread_latency or Latency()
+        self.replies = replies or DEFAULT_REPLIES
+        self.notes = notes or DEFAULT_NOTES
+        self.failure_rate = failure_rate
+        self.stream_chunk_size = stream_chunk_size
+        self._rng = random.Random(seed)
+
+        self.threads: Dict[str, List[str]] = {}  # thread_id -> contents of user messages
+        self.memories: List[Dict[str, Any]] = []
+        self.calls: Dict[str, int] = {"create_assistant": 0, "create_thread": 0, "add_message": 0, "add_memory": 0}
+
+    async def _delay(self, latency: Latency, call: str):
+        self.calls[call] += 1
+        await asyncio.sleep(latency.sample(self._rng))
+        if self.failure_rate and self._rng.random() < self.failure_rate:
+            raise BackboardServerError("Injected failure", 503)
+
+    @staticmethod
+    def _now() -> datetime.datetime:
+        return datetime.datetime.now(datetime.timezone.utc)
+
+    async def create_assistant(self, name: str, description: Optional[str] = None, **kwargs) -> Assistant:
+        await self._delay(self.thread_latency, "create_assistant")
+        return Assistant(assistant_id=uuid.uuid4(), name=name, description=description, created_at=self._now())
+
+    async def create_thread(self, assistant_id, **kwargs) -> Thread:
+        await self._delay(self.thread_latency, "create_thread")
+        thread = Thread(thread_id=uuid.uuid4(), created_at=self._now())
+        self.threads[str(thread.thread_id)] = []
+        return thread
+
+    async def add_memory(self, assistant_id, content: str, metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        await self._delay(self.memory_latency, "add_memory")
+        memory_id = str(uuid.uuid4())
+        self.memories.append({"id": memory_id, "assistant_id": str(assistant_id), "content": content, "metadata": metadata})
+        return {"success": True, "memory_id": memory_id}
+
+    def _reply_for(self, thread_id: str, content: str) -> str:
+        history = self.threads.setdefault(str(thread_id), [])
+        history.append(content or "")
+        if _SCRIBE_MARKER in (content or ""):
+            return json.dumps(self.notes)
+        reply = self.replies[(len(history) - 1) % len(self.replies)]
+        # Models like to wrap JSON in a markdown fence; keep the parser honest
+        return "```json\n" + json.dumps(reply) + "\n```"
+
+    async def add_message(self, thread_id, content: Optional[str] = None, stream: bool = False, **kwargs):
+        await self._delay(self.message_latency, "add_message")
+        text = self._reply_for(thread_id, content)
+        if stream:
+            return self._stream(text)
+        return MessageResponse(
+            message=text,
+            content=text,
+            thread_id=uuid.UUID(str(thread_id)),
+            message_id=uuid.uuid4(),
+            role=MessageRole.ASSISTANT,
+            model_provider=kwargs.get("llm_provider"),
+            model_name=kwargs.get("model_name"),
+            timestamp=self._now()
+        )
+
+    async def _stream(self, text: str):
+        for i in range(0, len(text), self.stream_chunk_size):
+            await asyncio.sleep(0)
+            yield {"type": "content_streaming", "content": text[i:i + self.stream_chunk_size]}
+        yield {"type": "message_complete", "status": "completed"}
+
+    async def aclose(self):
+        pass
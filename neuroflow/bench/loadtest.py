@@ -0,0 +1,198 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import resource
+import tempfile
+import tracemalloc
+from typing import Dict, List, Optional
+
+from bench.fake_backboard import FakeBackboardClient, Latency
+import client_pool
+import resilience
+from assistant_registry import AssistantRegistry
+from llm import LLMClient
+from main import NeuroFlowMain
+from memory import MemoryManager
+from memory_store import MemoryStore
+from response_cache import ResponseCache
+from tools.notetaker import NoteTaker
+from tracing import percentile
+
+"""
+Load test for NeuroFlowMain against the in-process fake Backboard.
+
+Drives N concurrent simulated patients through handle_patient_message and reports
+turn latency percentiles, throughput and memory use. Run from the neuroflow/ directory:
+    python -m bench.loadtest --patients 50 --turns 8 --latency lognormal:0.8:0.35
+
+--json writes the report to a file; --baseline compares against a previous report and
+exits non-zero if p95 latency or throughput regressed by more than --tolerance.
+"""
+
+PATIENT_LINES = [
+    "I've been feeling really low for the past few weeks.",
+    "Work has been stressful and I can't sleep properly.",
+    "Is it normal to feel this tired all the time?",
+    "I keep worrying that something bad is going to happen.",
+    "My appetite has been off and I don't enjoy things anymore.",
+    "I talked to a friend about it but it didn't help much.",
+    "Sometimes my heart races when I think about going to work.",
+    "I think that's everything, thank you.",
+]
+
+
+async def _patient(flow: NeuroFlowMain, turns: int, latencies: List[float], errors: Dict[str, int]):
+    try:
+        thread_id = await flow.llm.create_thread()
+    except Exception as e:
+        errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+        return
+    for turn in range(turns):
+        start = time.perf_counter()
+        try:
+            await flow.handle_patient_message(thread_id, PATIENT_LINES[turn % len(PATIENT_LINES)])
+        except Exception as e:
+            errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+            continue
+        latencies.append(time.perf_counter() - start)
+
+
+async def run_load(
+    patients: int,
+    turns: int,
+    fake: FakeBackboardClient,
+    ramp: float = 0.0,
+    trace_allocations: bool = False
+) -> dict:
+    client_pool.set_client_factory(lambda: fake)
+    resilience.metrics.reset()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        registry = AssistantRegistry(path=os.path.join(scratch, "assistants.json"))
+        llm = LLMClient(registry=registry)
+        response_cache = ResponseCache(path="")
+        flow = NeuroFlowMain(
+            llm_client=llm,
+            memory_manager=MemoryManager(registry=registry, store=MemoryStore(path=None)),
+            notetaker=NoteTaker(),
+            response_cache=response_cache
+        )
+        await llm.init_assistant()
+
+        latencies: List[float] = []
+        errors: Dict[str, int] = {}
+
+        # tracemalloc slows every allocation down, so it skews latency; opt-in only
+        if trace_allocations:
+            tracemalloc.start()
+        start = time.perf_counter()
+        tasks = []
+        for i in range(patients):
+            tasks.append(asyncio.create_task(_patient(flow, turns, latencies, errors)))
+            if ramp:
+                await asyncio.sleep(ramp / patients)
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+        await flow.drain()
+        peak_traced = 0
+        if trace_allocations:
+            _, peak_traced = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        await flow.note_queue.close()
+        await client_pool.close_client()
+
+    latencies.sort()
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    max_rss_mb = max_rss / (1024 * 1024) if sys.platform == "darwin" else max_rss / 1024
+    return {
+        "patients": patients,
+        "turns_per_patient": turns,
+        "turns": len(latencies),
+        "errors": errors,
+        "elapsed_s": elapsed,
+        "turns_per_s": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": (latencies[-1] if latencies else 0.0) * 1000,
+        "peak_traced_mb": peak_traced / (1024 * 1024),
+        "max_rss_mb": max_rss_mb,
+        "backboard_calls": dict(fake.calls),
+        "response_cache": {"hits": response_cache.hits, "misses": response_cache.misses},
+        "policies": resilience.metrics.summary(),
+    }
+
+
+def print_report(report: dict):
+    print(f"🧪 {report['patients']} patients x {report['turns_per_patient']} turns "
+          f"({report['turns']} completed, errors: {report['errors'] or 'none'})")
+    print(f"   latency  p50 {report['p50_ms']:.1f} ms | p95 {report['p95_ms']:.1f} ms | "
+          f"p99 {report['p99_ms']:.1f} ms | max {report['max_ms']:.1f} ms")
+    print(f"   throughput {report['turns_per_s']:.1f} turns/s over {report['elapsed_s']:.2f} s")
+    traced = f"peak traced {report['peak_traced_mb']:.1f} MB | " if report["peak_traced_mb"] else ""
+    print(f"   memory  {traced}max RSS {report['max_rss_mb']:.1f} MB")
+    print(f"   backboard calls {report['backboard_calls']}")
+    if "response_cache" in report:
+        print(f"   response cache {report['response_cache']}")
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    """
+    Regressions of report against baseline beyond tolerance (a fraction, e.g. 0.2).
+    """
+    regressions = []
+    if report["p95_ms"] > baseline["p95_ms"] * (1 + tolerance):
+        regressions.append(f"p95 {baseline['p95_ms']:.1f} -> {report['p95_ms']:.1f} ms")
+    if report["turns_per_s"] < baseline["turns_per_s"] * (1 - tolerance):
+        regressions.append(f"throughput {baseline['turns_per_s']:.1f} -> {report['turns_per_s']:.1f} turns/s")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load-test NeuroFlowMain against a fake Backboard.")
+    parser.add_argument("--patients", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=6)
+    parser.add_argument("--latency", default="lognormal:0.05:0.3", help="add_message latency, e.g. 0.8 or lognormal:0.8:0.35")
+    parser.add_argument("--memory-latency", default="0.01")
+    parser.add_argument("--thread-latency", default="0.01")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--ramp", type=float, default=0.0, help="seconds over which patients arrive")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--trace-allocations", action="store_true", help="report tracemalloc peak (slows the run)")
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--baseline", help="previous --json report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    fake = FakeBackboardClient(
+        message_latency=Latency.parse(args.latency),
+        memory_latency=Latency.parse(args.memory_latency),
+        thread_latency=Latency.parse(args.thread_latency),
+        failure_rate=args.failure_rate,
+        seed=args.seed
+    )
+    report = asyncio.run(run_load(
+        args.patients, args.turns, fake, ramp=args.ramp, trace_allocations=args.trace_allocations
+    ))
+    print_report(report)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print("❌ Regression: " + "; ".join(regressions))
+            return 1
+        print("✅ Within tolerance of baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
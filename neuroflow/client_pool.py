@@ -0,0 +1,167 @@
+import os
+import asyncio
+import atexit
+import threading
+import httpx
+from typing import Callable, Dict, Optional
+from backboard import BackboardClient
+
+"""
+Process-wide pool of Backboard clients.
+
+LLMClient, MemoryManager and NoteTaker all talk to Backboard. Instead of each one
+building its own BackboardClient (and its own HTTP connections), they ask this module
+for the client bound to the running event loop. httpx connections are tied to the loop
+they were opened on, so there is exactly one client per loop.
+
+Sync callers (Streamlit) should use run() so every turn lands on the same long-lived
+background loop and reuses warm connections instead of paying TLS setup each time.
+"""
+
+BASE_URL = os.getenv("BACKBOARD_BASE_URL", "https://app.backboard.io/api")
+TIMEOUT = float(os.getenv("BACKBOARD_TIMEOUT", "30"))
+MAX_CONNECTIONS = int(os.getenv("BACKBOARD_MAX_CONNECTIONS", "20"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("BACKBOARD_MAX_KEEPALIVE_CONNECTIONS", "10"))
+KEEPALIVE_EXPIRY = float(os.getenv("BACKBOARD_KEEPALIVE_EXPIRY", "60"))
+
+
+class PooledBackboardClient(BackboardClient):
+    """
+    BackboardClient whose HTTP transport keeps connections alive and caps their number.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = BASE_URL,
+        timeout: float = TIMEOUT,
+        max_connections: int = MAX_CONNECTIONS,
+        max_keepalive_connections: int = MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = KEEPALIVE_EXPIRY,
+    ):
+        super().__init__(api_key=api_key, base_url=base_url, timeout=timeout)
+
+        # The SDK builds a bare httpx client without pool limits; swap in a tuned one.
+        # The original has not opened any connection yet, so nothing leaks.
+        self._client = httpx.AsyncClient(
+            headers=self._client.headers,
+            timeout=self._client.timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+        )
+
+
+def _default_factory() -> BackboardClient:
+    api_key = os.getenv("BACKBOARD_API_KEY")
+    if api_key is None:
+        raise Exception("BACKBOARD API KEY not found")
+    return PooledBackboardClient(api_key=api_key)
+
+
+_factory: Callable[[], BackboardClient] = _default_factory
+_clients: Dict[asyncio.AbstractEventLoop, BackboardClient] = {}
+_lock = threading.Lock()
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_thread: Optional[threading.Thread] = None
+
+
+def set_client_factory(factory: Callable[[], BackboardClient]):
+    """
+    Replace how new clients are built (e.g. a fake Backboard for benchmarks).
+    Clients already handed out are left alone.
+    """
+    global _factory
+    _factory = factory
+
+
+def get_client() -> BackboardClient:
+    """
+    Returns the shared client for the running event loop, creating it on first use.
+    Must be called from inside a coroutine.
+    """
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _clients.get(loop)
+        if client is None:
+            # Loops closed by asyncio.run() can't be reused, drop their clients
+            for dead in [l for l in _clients if l.is_closed()]:
+                del _clients[dead]
+            client = _factory()
+            _clients[loop] = client
+    return client
+
+
+async def close_client():
+    """
+    Closes the client bound to the running loop. Call before the loop shuts down.
+    """
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _clients.pop(loop, None)
+    if client is not None:
+        await client.aclose()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """
+    Long-lived background event loop shared by sync callers.
+    """
+    global _loop, _loop_thread
+    with _lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(target=_loop.run_forever, name="backboard-loop", daemon=True)
+            _loop_thread.start()
+    return _loop
+
+
+def run(coro, timeout: Optional[float] = None):
+    """
+    Runs a coroutine on the shared background loop and blocks for its result.
+    Drop-in replacement for asyncio.run() that keeps connections warm across calls.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, get_loop()).result(timeout)
+
+
+def iterate(agen, timeout: Optional[float] = None):
+    """
+    Drives an async generator on the shared background loop and yields its items to sync code.
+    Lets Streamlit consume streaming turns (e.g. with st.write_stream).
+    """
+    async def _next():
+        return await agen.__anext__()
+
+    loop = get_loop()
+    try:
+        while True:
+            try:
+                yield asyncio.run_coroutine_threadsafe(_next(), loop).result(timeout)
+            except StopAsyncIteration:
+                return
+    finally:
+        asyncio.run_coroutine_threadsafe(agen.aclose(), loop).result(timeout)
+
+
+def shutdown():
+    """
+    Closes the background loop's client and stops the loop. Registered with atexit.
+    """
+    global _loop, _loop_thread
+    if _loop is None or _loop.is_closed():
+        return
+    try:
+        run(close_client(), timeout=5)
+    except Exception as e:
+        print(f"⚠️ Backboard client shutdown failed: {e}")
+    _loop.call_soon_threadsafe(_loop.stop)
+    _loop_thread.join(timeout=5)
+    _loop.close()
+    _loop = None
+    _loop_thread = None
+
+
+atexit.register(shutdown)
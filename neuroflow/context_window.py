@@ -0,0 +1,162 @@
+import os
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, List
+
+"""
+Bounded conversation window per session.
+
+Backboard keeps the whole thread history server-side and feeds it back to the model on
+every message, so a long intake gets slower turn by turn. Each session's window tracks
+the (estimated) tokens its active Backboard thread has accumulated. Once they pass the
+model's budget, the session moves to a fresh thread: older turns are folded into a
+compact local digest, and the digest plus the last few exchanges are sent once with the
+next prompt. The session id the frontend knows never changes; only the thread behind it.
+
+Windows are part of each session's state (session_store.py), so they outlive the process.
+
+Token counts are estimated from characters (chars_per_token) since no tokenizer ships
+with the SDK.
+"""
+
+
+@dataclass(frozen=True)
+class ContextBudget:
+    max_tokens: int  # rotate once the active thread holds more than this
+    recent_turns: int  # exchanges carried over verbatim
+    digest_tokens: int  # size cap of the digest of everything older
+    chars_per_token: float = 4.0
+
+
+MODEL_BUDGETS: Dict[str, ContextBudget] = {
+    "gemini-2.5-flash": ContextBudget(max_tokens=12000, recent_turns=4, digest_tokens=600),
+    "gemini-2.5-pro": ContextBudget(max_tokens=16000, recent_turns=4, digest_tokens=800),
+}
+DEFAULT_BUDGET = ContextBudget(max_tokens=8000, recent_turns=4, digest_tokens=500)
+
+
+def budget_for(model_name: str) -> ContextBudget:
+    """
+    The model's budget, with NEUROFLOW_CONTEXT_MAX_TOKENS / _RECENT_TURNS / _DIGEST_TOKENS overrides.
+    """
+    budget = MODEL_BUDGETS.get(model_name, DEFAULT_BUDGET)
+    overrides = {}
+    for name in ("max_tokens", "recent_turns", "digest_tokens"):
+        value = os.getenv(f"NEUROFLOW_CONTEXT_{name.upper()}")
+        if value:
+            overrides[name] = int(value)
+    return replace(budget, **overrides) if overrides else budget
+
+
+_CLIP_CHARS = 160
+_OMITTED = "- (earlier exchanges omitted)"
+
+
+def _clip(text: str, limit: int = _CLIP_CHARS) -> str:
+    text = " ".join((text or "").split())
+    return text if len(text) <= limit else text[: limit - 3].rstrip() + "..."
+
+
+@dataclass
+class TurnRecord:
+    patient_text: str
+    response: str
+
+
+@dataclass
+class ConversationWindow:
+    session_id: str
+    thread_id: str  # Backboard thread currently behind the session
+    budget: ContextBudget
+    thread_tokens: int = 0
+    thread_turns: int = 0
+    turns: List[TurnRecord] = field(default_factory=list)
+    digest: List[str] = field(default_factory=list)
+    carryover: str = ""  # sent with the first prompt on a rotated thread
+    rotations: int = 0
+    rotating: bool = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        # The budget comes from config and rotating is per process, so neither is stored
+        return {
+            "session_id": self.session_id,
+            "thread_id": self.thread_id,
+            "thread_tokens": self.thread_tokens,
+            "thread_turns": self.thread_turns,
+            "turns": [{"patient_text": t.patient_text, "response": t.response} for t in self.turns],
+            "digest": self.digest,
+            "carryover": self.carryover,
+            "rotations": self.rotations
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], budget: ContextBudget) -> "ConversationWindow":
+        fields = {key: value for key, value in data.items() if key in cls.__dataclass_fields__ and key not in ("budget", "rotating")}
+        fields["turns"] = [TurnRecord(**turn) for turn in fields.get("turns", [])]
+        return cls(budget=budget, **fields)
+
+    def tokens(self, text: str) -> int:
+        return int(len(text or "") / self.budget.chars_per_token) + 1
+
+    def add_exchange(self, thread_id: str, prompt: str, reply: str):
+        """
+        Accounts for one message and its reply on thread_id.
+        """
+        if str(thread_id) != self.thread_id:
+            return  # a turn that started before the last rotation
+        self.thread_tokens += self.tokens(prompt) + self.tokens(reply)
+        self.thread_turns += 1
+        self.carryover = ""
+
+    def add_local_exchange(self, patient_text: str, response: str):
+        """
+        An exchange answered without the thread (e.g. from the response cache); it is sent
+        along with the next prompt so the model knows what was already said.
+        """
+        exchange = f"Patient: {patient_text}\nNurse: {response}"
+        self.carryover = f"{self.carryover}\n\n{exchange}" if self.carryover else exchange
+
+    def add_turn(self, patient_text: str, response: str):
+        self.turns.append(TurnRecord(patient_text, response))
+
+    def over_budget(self) -> bool:
+        # A fresh thread starts with the instructions and the carryover; give it a few turns
+        # of its own before rotating again so a tight budget cannot rotate on every turn
+        return self.thread_tokens > self.budget.max_tokens and self.thread_turns > self.budget.recent_turns
+
+    def rotate(self, new_thread_id: str):
+        """
+        Switches to new_thread_id, folding everything but the recent turns into the digest.
+        """
+        split = max(0, len(self.turns) - self.budget.recent_turns)
+        older, kept = self.turns[:split], self.turns[split:]
+        self.digest.extend(
+            f"- Patient: {_clip(t.patient_text)} | Nurse: {_clip(t.response)}" for t in older
+        )
+        self._trim_digest()
+        self.turns = kept
+
+        parts = []
+        if self.digest:
+            parts.append("Summary of earlier exchanges:\n" + "\n".join(self.digest))
+        if kept:
+            parts.append("Most recent exchanges:\n" + "\n".join(
+                f"Patient: {t.patient_text}\nNurse: {t.response}" for t in kept
+            ))
+        self.carryover = "\n\n".join(parts)
+        self.thread_id = str(new_thread_id)
+        self.thread_tokens = 0
+        self.thread_turns = 0
+        self.rotations += 1
+
+    def _trim_digest(self):
+        # Oldest lines go first; a marker keeps the model aware something was dropped
+        had_marker = bool(self.digest) and self.digest[0] == _OMITTED
+        if had_marker:
+            self.digest.pop(0)
+        dropped = False
+        while len(self.digest) > 1 and sum(self.tokens(line) for line in self.digest) > self.budget.digest_tokens:
+            self.digest.pop(0)
+            dropped = True
+        if had_marker or dropped:
+            self.digest.insert(0, _OMITTED)
+
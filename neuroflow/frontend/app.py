@@ -1,5 +1,4 @@
 import streamlit as st
-import asyncio
 import os 
 import sys
 from dotenv import load_dotenv
@@ -13,17 +12,17 @@ parent_dir = os.path.dirname(current_dir)
 if parent_dir not in sys.path:
     sys.path.append(parent_dir)
 
-from main import NeuroFlowMain, LLMClient, MemoryManager, NoteTaker
+from frontend.server_client import NeuroFlowAPI
 
 st.set_page_config(page_title="NeuroFlow AI", page_icon="🧠")
 
-# --- CHANGE 1: CACHE ONLY MEMORY (Not the Network Client) ---
+# --- SERVER CONNECTION ---
+# All sessions are hosted by the NeuroFlow server (server.py); this UI only talks HTTP.
 @st.cache_resource
-def get_memory():
-    """Only cache things that hold DATA, not connections."""
-    return MemoryManager(), NoteTaker()
+def get_api():
+    return NeuroFlowAPI()
 
-memory_manager, note_taker = get_memory()
+api = get_api()
 
 # --- SESSION SETUP ---
 if "messages" not in st.session_state:
@@ -31,13 +30,24 @@ if "messages" not in st.session_state:
     st.session_state.messages.append({"role": "assistant", "content": "Hello! I am NeuroFlow. How can I help?"})
 
 if "thread_id" not in st.session_state:
-    async def init_chat():
-        # We create a temporary client just to get the thread ID
-        temp_client = LLMClient()
-        await temp_client.init_assistant()
-        return await temp_client.create_thread()
-    
-    st.session_state.thread_id = asyncio.run(init_chat())
+    # The session id rides in the URL, so a reload (or another frontend process) resumes it
+    resumed = api.session(st.query_params["session"]) if "session" in st.query_params else None
+    if resumed is not None:
+        st.session_state.thread_id = resumed["thread_id"]
+        for turn in resumed["transcript"]:
+            st.session_state.messages.append({"role": "user", "content": turn["patient"]})
+            st.session_state.messages.append({"role": "assistant", "content": turn["response"]})
+    else:
+        st.session_state.thread_id = api.create_session()
+        st.query_params["session"] = st.session_state.thread_id
+
+# --- CLINICAL NOTES STATUS ---
+with st.sidebar:
+    job = api.notes_status(st.session_state.thread_id)
+    if job is not None:
+        st.caption(f"Clinical notes: {job['status']}")
+        if job["status"] == "done":
+            st.caption(job["result"]["pdf_path"])
 
 # --- UI LOGIC ---
 st.title("🧠 NeuroFlow Agent")
@@ -51,36 +61,29 @@ if prompt := st.chat_input("Type here..."):
     with st.chat_message("user"):
         st.write(prompt)
 
-    # --- CHANGE 2: CREATE FRESH CLIENT INSIDE THE LOOP ---
-    async def get_response():
-        # Create a FRESH client that attaches to the CURRENT event loop
-        fresh_client = LLMClient()
-        
-        # Initialize it (since it's new)
-        await fresh_client.init_assistant()
-        
-        # Re-assemble the orchestrator with the fresh client + cached memory
-        flow = NeuroFlowMain(
-            llm_client=fresh_client, 
-            memory_manager=memory_manager, 
-            notetaker=note_taker
-        )
-        
-        return await flow.handle_patient_message(
-            thread_id=st.session_state.thread_id,
-            patient_text=prompt
-        )
-
-    # --- CHANGE 3: RUN ---
+    # --- STREAM THE REPLY FROM THE SERVER ---
     with st.chat_message("assistant"):
-        with st.spinner("Thinking..."):
-            # Now this works because everything is on the same loop!
-            result = asyncio.run(get_response())
-            
-            response_text = result["response"]
+        final = {}
+
+        def stream_reply():
+            for event in api.stream(st.session_state.thread_id, prompt):
+                if event["type"] == "delta":
+                    yield event["text"]
+                else:
+                    final.update(event)
+
+        streamed = st.write_stream(stream_reply())
+
+        if final.get("type") == "error":
+            st.error(f"NeuroFlow server error: {final['detail']}")
+            st.stop()
+
+        response_text = final["response"]
+        if not streamed:
+            # Nothing could be streamed (e.g. unexpected JSON shape), show the parsed reply
             st.write(response_text)
-            st.session_state.messages.append({"role": "assistant", "content": response_text})
-            
-            if result["terminate"]:
-                st.success("Session Ended.")
-                st.stop()
\ No newline at end of file
+        st.session_state.messages.append({"role": "assistant", "content": response_text})
+
+        if final["terminate"]:
+            st.success("Session Ended.")
+            st.stop()
@@ -1,11 +1,6 @@
 import streamlit as st
-import asyncio
 import os 
 import sys
-import speech_recognition as sr
-from gtts import gTTS
-import tempfile
-import json
 from dotenv import load_dotenv
 
 # 1. LOAD ENV
@@ -17,66 +12,60 @@ parent_dir = os.path.dirname(current_dir)
 if parent_dir not in sys.path:
     sys.path.append(parent_dir)
 
-from main import NeuroFlowMain, LLMClient, MemoryManager, NoteTaker
+from frontend.server_client import NeuroFlowAPI
+from tools import stt, tts
 
 st.set_page_config(page_title="NeuroFlow Voice", page_icon="🧠")
 
-# --- CACHE RESOURCES ---
+# --- SERVER CONNECTION ---
+# All sessions are hosted by the NeuroFlow server (server.py); this UI only talks HTTP.
 @st.cache_resource
-def get_memory():
-    """Only cache things that hold DATA, not connections."""
-    return MemoryManager(), NoteTaker()
+def get_api():
+    return NeuroFlowAPI()
 
-memory_manager, note_taker = get_memory()
+api = get_api()
 
 # --- MANUAL TERMINATION BUTTON ---
 with st.sidebar:
     if st.button("End Session & Save Notes", type="primary"):
-        with st.spinner("Saving session notes..."):
-            
-            # Define async task for termination
-            async def end_session():
-                # We can reuse the cached note_taker
-                await note_taker.generate_notes(st.session_state.thread_id)
-            
-            # Run the task
-            asyncio.run(end_session())
-            
-        st.success("Session saved and ended.")
-        st.session_state.messages.append({"role": "assistant", "content": "Session manually ended. Notes saved."})
+        # Notes are generated in the background by the server's job queue
+        api.end_session(st.session_state.thread_id)
+
+        st.success("Session ended. Notes are being generated.")
+        st.session_state.messages.append({"role": "assistant", "content": "Session manually ended. Notes will be saved shortly."})
         st.stop()
 
+    if "thread_id" in st.session_state:
+        job = api.notes_status(st.session_state.thread_id)
+        if job is not None:
+            st.caption(f"Clinical notes: {job['status']}")
+            if job["status"] == "done":
+                st.caption(job["result"]["pdf_path"])
+
 # --- AUDIO HELPER FUNCTIONS ---
 
+@st.cache_resource
+def get_stt():
+    return stt.get_stt()
+
 def transcribe_audio(audio_bytes):
-    """Converts audio input bytes to text."""
-    r = sr.Recognizer()
-    # Write bytes to a temporary wav file
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp_audio:
-        tmp_audio.write(audio_bytes.read())
-        tmp_audio_path = tmp_audio.name
-
-    text = ""
-    try:
-        with sr.AudioFile(tmp_audio_path) as source:
-            # Record the audio from the file
-            audio_data = r.record(source)
-            # Transcribe
-            text = r.recognize_google(audio_data)
-    except sr.UnknownValueError:
+    """Converts audio input bytes to text, in memory."""
+    text = get_stt().transcribe_wav(audio_bytes.read())
+    if not text:
         st.error("Could not understand audio.")
-    except sr.RequestError:
-        st.error("Could not request results from Google Speech Recognition service.")
-    finally:
-        os.remove(tmp_audio_path)
     return text
 
-def text_to_speech_file(text):
-    """Converts text to an MP3 file path."""
-    tts = gTTS(text=text, lang='en')
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp_mp3:
-        tts.save(tmp_mp3.name)
-        return tmp_mp3.name
+@st.cache_resource
+def get_tts():
+    return tts.get_engine()
+
+def text_to_speech(text, cache=False):
+    """
+    Converts text to audio bytes. Only fixed phrases (cache=True) are kept in the disk
+    cache; replies hold patient details and are synthesized to a scratch file that is
+    deleted right away.
+    """
+    return get_tts().synthesize_bytes(text, cache=cache or None)
 
 
 # --- SESSION SETUP ---
@@ -86,7 +75,7 @@ if "messages" not in st.session_state:
     greeting = "Hello! I’m NeuroFlow, your prescreening assistant. I’m here to ask a few questions to \
         better understand your current mental health and wellbeing. To start, can you tell me how you’ve been feeling \
             emotionally over the past week?"
-    greeting_audio = text_to_speech_file(greeting)
+    greeting_audio = text_to_speech(greeting, cache=True)
     st.session_state.messages.append({
         "role": "assistant", 
         "content": greeting, 
@@ -94,11 +83,7 @@ if "messages" not in st.session_state:
     })
 
 if "thread_id" not in st.session_state:
-    async def init_chat():
-        temp_client = LLMClient()
-        await temp_client.init_assistant()
-        return await temp_client.create_thread()
-    st.session_state.thread_id = asyncio.run(init_chat())
+    st.session_state.thread_id = api.create_session()
 
 # Key to force audio widget reset
 if "input_key" not in st.session_state:
@@ -114,7 +99,7 @@ with chat_container:
         with st.chat_message(msg["role"]):
             st.write(msg["content"])
             if "audio" in msg:
-                st.audio(msg["audio"], format="audio/mp3", start_time=0)
+                st.audio(msg["audio"], format=get_tts().mime, start_time=0)
 
 # 2. Audio Input Widget
 audio_value = st.audio_input("Record your voice", key=f"audio_{st.session_state.input_key}")
@@ -128,69 +113,19 @@ if audio_value:
         # Append User Message
         st.session_state.messages.append({"role": "user", "content": user_text})
         
-        # B. Define the Async Task
-        async def get_response():
-            # Create FRESH client to avoid "Event loop closed" error
-            fresh_client = LLMClient()
-            await fresh_client.init_assistant()
-            
-            flow = NeuroFlowMain(
-                llm_client=fresh_client, 
-                memory_manager=memory_manager, 
-                notetaker=note_taker
-            )
-            
-            # --- OVERRIDE handle_patient_message LOGIC HERE ---
-            # We must implement the fix for the memory parsing error manually
-            # since we can't easily edit 'main.py' from here.
-            
-            # 1. Get Context
-            memory_context = await flow.memory.get_context(st.session_state.thread_id)
-            
-            # 2. Get LLM Raw Text (Using the fresh client)
-            # Note: We need to import post_patient_text_to_llm for this
-            from parsing import post_patient_text_to_llm
-            import parsing
-            
-            parsed_txt = await post_patient_text_to_llm(
-                llm_client=fresh_client,
-                patient_text=user_text,
-                thread_id=st.session_state.thread_id,
-                memory_context=memory_context
-            )
-            
-            parsed = parsing.parse_llm_response(parsed_txt, user_text)
-            
-            # 3. FIX: Sanitize Memory Data
-            mem_candidates = parsed.memory_candidates
-            if isinstance(mem_candidates, str):
-                try:
-                    mem_candidates = json.loads(mem_candidates)
-                except json.JSONDecodeError:
-                    mem_candidates = {}
-
-            # 4. Save Memory
-            await flow.memory.write(st.session_state.thread_id, mem_candidates)
-            
-            # 5. Check Termination
-            if parsed.terminate:
-                await flow.notetaker.generate_notes(st.session_state.thread_id)
-            
-            return {"response": parsed.response, "terminate": parsed.terminate}
-
-        # C. Run Logic
+        # B. Run the turn on the server
         with st.spinner("Thinking..."):
-            result = asyncio.run(get_response())
+            result = api.turn(st.session_state.thread_id, user_text)
             
             response_text = result["response"]
             
             # Generate Audio for Response
-            response_audio_path = text_to_speech_file(response_text)
+            response_audio = text_to_speech(response_text)
             
             st.session_state.messages.append({
                 "role": "assistant", 
                 "content": response_text,
-                "audio": response_audio_path
+                "audio": response_audio
             })
             
             # Increment key to reset the microphone widget
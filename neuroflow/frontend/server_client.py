@@ -0,0 +1,62 @@
+import os
+import json
+from typing import Iterator, Optional
+import httpx
+
+"""
+Thin HTTP client the Streamlit frontends use to talk to the NeuroFlow server (server.py).
+"""
+
+SERVER_URL = os.getenv("NEUROFLOW_SERVER_URL", "http://127.0.0.1:8000")
+REQUEST_TIMEOUT = float(os.getenv("NEUROFLOW_REQUEST_TIMEOUT", "120"))
+
+
+class NeuroFlowAPI:
+    def __init__(self, base_url: str = SERVER_URL, timeout: float = REQUEST_TIMEOUT):
+        # One keep-alive connection pool for the whole Streamlit process
+        self._http = httpx.Client(base_url=base_url, timeout=timeout)
+
+    def create_session(self) -> str:
+        response = self._http.post("/sessions")
+        response.raise_for_status()
+        return response.json()["thread_id"]
+
+    def session(self, thread_id: str) -> Optional[dict]:
+        """
+        The session's transcript ({"thread_id", "transcript", "escalated"}), or None once it ended.
+        """
+        response = self._http.get(f"/sessions/{thread_id}")
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.json()
+
+    def turn(self, thread_id: str, patient_text: str) -> dict:
+        """
+        One full turn. Returns {"response": ..., "terminate": ..., "escalated": ...}.
+        """
+        response = self._http.post(f"/sessions/{thread_id}/turn", json={"patient_text": patient_text})
+        response.raise_for_status()
+        return response.json()
+
+    def stream(self, thread_id: str, patient_text: str) -> Iterator[dict]:
+        """
+        Yields the turn's events as the server streams them ("delta", then "final" or "error").
+        """
+        with self._http.stream("POST", f"/sessions/{thread_id}/stream", json={"patient_text": patient_text}) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if line:
+                    yield json.loads(line)
+
+    def end_session(self, thread_id: str) -> dict:
+        response = self._http.post(f"/sessions/{thread_id}/end")
+        response.raise_for_status()
+        return response.json()
+
+    def notes_status(self, thread_id: str) -> Optional[dict]:
+        response = self._http.get(f"/sessions/{thread_id}/notes")
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.json()
@@ -0,0 +1,347 @@
+import re
+import json
+from typing import Iterable, List, Optional
+
+try:
+    import orjson  # optional, noticeably faster loads
+except ImportError:
+    orjson = None
+
+"""
+Tolerant, incremental JSON extraction for LLM output.
+
+The LLM answers with one JSON object, but it may wrap it in markdown fences, add prose
+before or after it, or get cut off. parse_json_object finds the first balanced object
+in a single pass and repairs truncated output where it can; JSONObjectStream does the
+same on a stream of chunks. Both the chat turn parser and the NoteTaker scribe use them.
+A repaired object is only accepted if the fields the caller names as complete were not
+cut off: a reply whose "response" text stops mid-sentence, or that ends before its
+"terminate" flag was written out, raises TruncatedJSONError instead of reaching the
+patient as if it were whole. Repair never guesses a value: a half-written array item or
+literal ("tr…") is dropped rather than closed.
+
+The object's "response" field is the text the patient sees. Waiting for the whole object
+before showing anything makes the patient stare at a spinner, so JSONFieldStream is fed
+raw chunks as they stream in and hands back the decoded characters of that field as
+soon as they arrive.
+"""
+
+JSON_BACKEND = "orjson" if orjson is not None else "json"
+
+
+class JSONExtractionError(ValueError):
+    """Raised when no JSON object can be recovered from the text."""
+
+
+class TruncatedJSONError(JSONExtractionError):
+    """Raised when the object was cut off inside a field the caller needs complete."""
+
+
+# "{" that can start an object: a key, or "}", follows. Braces in prose usually fail this
+_OBJECT_START = re.compile(r'\{\s*(?:["}]|$)')
+
+
+def loads(text: str):
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+class _BraceScanner:
+    """
+    Tracks string/escape state and the open-bracket stack of a JSON object, one chunk at a time.
+    """
+
+    def __init__(self):
+        self.stack: List[str] = []
+        self.in_string = False
+        self.escape = False
+        self.string_start = -1  # index of the quote that opened the current string
+
+    def feed(self, text: str, start: int = 0) -> Optional[int]:
+        """
+        Scans text[start:] and returns the index where the object closes, if it does.
+        """
+        stack = self.stack
+        for i in range(start, len(text)):
+            ch = text[i]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+                self.string_start = i
+            elif ch == "{" or ch == "[":
+                stack.append(ch)
+            elif ch == "}" or ch == "]":
+                if stack:
+                    stack.pop()
+                if not stack:
+                    return i
+        return None
+
+    def closing_suffix(self) -> str:
+        suffix = '"' if self.in_string else ""
+        return suffix + "".join("}" if b == "{" else "]" for b in reversed(self.stack))
+
+
+def _close_truncated(text: str) -> str:
+    """
+    Turns a truncated object into valid JSON text by closing its open string and brackets.
+    """
+    if text.endswith("\\"):
+        text = text[:-1]
+    scanner = _BraceScanner()
+    scanner.feed(text)
+    if scanner.in_string and scanner.stack and scanner.stack[-1] == "[":
+        # A half-written array item (e.g. a memory) is dropped, not kept cut short
+        text = text[:scanner.string_start]
+        scanner = _BraceScanner()
+        scanner.feed(text)
+    if not scanner.in_string:
+        # A dangling key or cut literal stays invalid, so _repair drops that member
+        text = text.rstrip().rstrip(",")
+    return text + scanner.closing_suffix()
+
+
+def _repair(fragment: str, complete: Iterable[str] = ()) -> dict:
+    # Close the fragment as-is; if that is not valid, drop the last (partial) member and retry
+    candidate = fragment
+    for _ in range(4):
+        try:
+            data = loads(_close_truncated(candidate))
+            if isinstance(data, dict):
+                break
+        except ValueError:
+            pass
+        cut = candidate.rfind(",")
+        if cut <= 0:
+            raise JSONExtractionError("Truncated JSON object could not be repaired")
+        candidate = candidate[:cut]
+    else:
+        raise JSONExtractionError("Truncated JSON object could not be repaired")
+
+    for name in complete:
+        if name not in data:
+            raise TruncatedJSONError(f"LLM output was cut off before {name!r}")
+        if isinstance(data[name], str):
+            field = JSONFieldStream(name)
+            field.feed(fragment)
+            if not field.done:
+                raise TruncatedJSONError(f"LLM output was cut off before the end of {name!r}")
+    return data
+
+
+def parse_json_object(text: str, complete: Iterable[str] = ()) -> dict:
+    """
+    Returns the first JSON object in text, ignoring fences and surrounding prose.
+    A truncated trailing object is repaired by closing it, unless one of the fields
+    named in complete is missing or was cut off (TruncatedJSONError).
+    """
+    pos = text.find("{")
+    while pos != -1:
+        if _OBJECT_START.match(text, pos):
+            scanner = _BraceScanner()
+            end = scanner.feed(text, pos)
+            try:
+                if end is None:
+                    return _repair(text[pos:], complete)
+                data = loads(text[pos:end + 1])
+                if isinstance(data, dict):
+                    return data
+            except TruncatedJSONError:
+                raise
+            except ValueError:
+                pass
+        # Not an object after all (e.g. braces in prose), try the next one
+        pos = text.find("{", pos + 1)
+    raise JSONExtractionError("No JSON object found in LLM output")
+
+
+class JSONObjectStream:
+    """
+    Incremental parse_json_object: feed chunks, get the object back as soon as it closes.
+    Trailing commentary after the object is never waited for.
+    """
+
+    def __init__(self):
+        self.value: Optional[dict] = None
+        self._text: List[str] = []
+        self._length = 0
+        self._start: Optional[int] = None
+        self._scanner = _BraceScanner()
+
+    @property
+    def done(self) -> bool:
+        return self.value is not None
+
+    def feed(self, chunk: str) -> Optional[dict]:
+        if self.done:
+            return self.value
+        offset = self._length
+        self._text.append(chunk)
+        self._length += len(chunk)
+
+        scan_from = 0
+        if self._start is None:
+            brace = chunk.find("{")
+            if brace == -1:
+                return None
+            self._start = offset + brace
+            scan_from = brace
+
+        end = self._scanner.feed(chunk, scan_from)
+        while end is not None:
+            text = "".join(self._text)
+            try:
+                data = loads(text[self._start:offset + end + 1])
+                if isinstance(data, dict):
+                    self.value = data
+                    return data
+            except ValueError:
+                pass
+            # Balanced but not valid JSON, rescan from the next opening brace
+            self._scanner = _BraceScanner()
+            self._start = text.find("{", self._start + 1)
+            if self._start == -1:
+                self._start = None
+                return None
+            offset = 0
+            end = self._scanner.feed(text, self._start)
+        return None
+
+    def finish(self, complete: Iterable[str] = ()) -> dict:
+        """
+        Call once the stream has ended. Falls back to a full (repairing) parse of everything
+        seen; complete is passed on to parse_json_object.
+        """
+        if self.value is None:
+            self.value = parse_json_object("".join(self._text), complete)
+        return self.value
+
+_SIMPLE_ESCAPES = {
+    '"': '"',
+    "\\": "\\",
+    "/": "/",
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+}
+
+
+class JSONFieldStream:
+    """
+    Feed it chunks of LLM output, get back newly decoded text of one top-level string field.
+    Anything before the first '{' (markdown fences, preamble) is ignored.
+    """
+
+    def __init__(self, field: str = "response"):
+        self.field = field
+        self.done = False  # True once the field's closing quote has been seen
+
+        self._depth = 0
+        self._in_string = False
+        self._escape = ""  # pending escape sequence, starts with a backslash
+        self._expect_key = False
+        self._key: Optional[List[str]] = None  # characters of the top-level key being read
+        self._last_key: Optional[str] = None
+        self._awaiting_value = False
+        self._capturing = False
+
+    def feed(self, chunk: str) -> str:
+        """
+        Consume a chunk and return the field text decoded from it (may be empty).
+        """
+        out: List[str] = []
+        for ch in chunk:
+            if self.done:
+                break
+
+            if self._in_string:
+                if self._escape:
+                    self._escape += ch
+                    decoded = self._decode_escape()
+                    if decoded is not None:
+                        self._escape = ""
+                        self._emit(decoded, out)
+                elif ch == "\\":
+                    self._escape = ch
+                elif ch == '"':
+                    self._in_string = False
+                    if self._capturing:
+                        self._capturing = False
+                        self.done = True
+                    elif self._key is not None:
+                        self._last_key = "".join(self._key)
+                        self._key = None
+                else:
+                    self._emit(ch, out)
+                continue
+
+            # Skip preamble until the object starts
+            if self._depth == 0 and ch != "{":
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                if self._depth == 1 and self._expect_key:
+                    self._key = []
+                    self._expect_key = False
+                elif self._depth == 1 and self._awaiting_value and self._last_key == self.field:
+                    self._capturing = True
+                self._awaiting_value = False
+            elif ch in "{[":
+                self._depth += 1
+                if ch == "{" and self._depth == 1:
+                    self._expect_key = True
+                self._awaiting_value = False
+            elif ch in "}]":
+                self._depth -= 1
+            elif self._depth == 1 and ch == ",":
+                self._expect_key = True
+                self._awaiting_value = False
+            elif self._depth == 1 and ch == ":":
+                self._awaiting_value = True
+
+        return "".join(out)
+
+    def _emit(self, text: str, out: List[str]):
+        if self._capturing:
+            out.append(text)
+        elif self._key is not None:
+            self._key.append(text)
+
+    def _decode_escape(self) -> Optional[str]:
+        """
+        Decodes the pending escape, or returns None if more characters are needed.
+        """
+        esc = self._escape
+        if len(esc) < 2:
+            return None
+        if esc[1] != "u":
+            return _SIMPLE_ESCAPES.get(esc[1], esc[1])
+        if len(esc) < 6:
+            return None
+
+        try:
+            code = int(esc[2:6], 16)
+        except ValueError:
+            return ""
+        if 0xD800 <= code < 0xDC00:
+            # High surrogate: wait for the "\uXXXX" low half and combine them
+            if len(esc) >= 8 and esc[6:8] != "\\u":
+                return ""
+            if len(esc) < 12:
+                return None
+            try:
+                low = int(esc[8:12], 16)
+            except ValueError:
+                return ""
+            return chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00))
+        return chr(code)
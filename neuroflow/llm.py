@@ -2,10 +2,17 @@ import os
 import asyncio
 from typing import Optional
 from backboard import BackboardClient
+from backboard.exceptions import BackboardNotFoundError
+import client_pool
+from resilience import RetryPolicy, LLM_POLICY, call_with_policy
+from assistant_registry import AssistantRegistry, registry as default_registry
 from prompt_schemas import ParsedResponse
 import prompts
 import json
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, AsyncIterator
+
+LLM_PROVIDER = "google"
+MODEL_NAME = "gemini-2.5-flash"
 
 class LLMClient:
     """
@@ -13,26 +20,46 @@ class LLMClient:
     Handles prompt generation and streaming responses if needed.
     """
 
-    def __init__(self):
-        self.client = BackboardClient(api_key=os.getenv("BACKBOARD_API_KEY"))
-        self.assistant = None
+    def __init__(
+        self,
+        client: Optional[BackboardClient] = None,
+        registry: Optional[AssistantRegistry] = None,
+        policy: RetryPolicy = LLM_POLICY
+    ):
+        self._client = client
+        self.registry = registry or default_registry
+        self.policy = policy
+        self.assistant_id = None
+        self._assistant_spec = None
+
+    @property
+    def client(self) -> BackboardClient:
+        """
+        The injected client, or the shared pooled client for the running event loop.
+        """
+        return self._client or client_pool.get_client()
 
     async def init_assistant(self, name: str = "NeuroFlow LLM", description: str = "LLM for structured parsing and response generation"):
         """
-        Creates an assistant if it doesn't exist.
+        Resolves the assistant from the registry, creating it only if it doesn't exist.
         """
-        if self.assistant is None:
-            self.assistant = await self.client.create_assistant(
-                name=name,
-                description=description
-            )
+        if self.assistant_id is None:
+            self._assistant_spec = (name, description)
+            self.assistant_id = await self.registry.resolve(self.client, name, description)
 
     async def create_thread(self) -> str:
-        if self.assistant is None:
+        if self.assistant_id is None:
             await self.init_assistant()
 
-        thread_obj = await self.client.create_thread(assistant_id=self.assistant.assistant_id)
-        return thread_obj.thread_id  # valid UUID to use in add_message
+        try:
+            thread_obj = await self.client.create_thread(assistant_id=self.assistant_id)
+        except BackboardNotFoundError:
+            # Registered assistant was deleted remotely; forget it and create a new one once
+            self.registry.forget(*self._assistant_spec)
+            self.assistant_id = None
+            await self.init_assistant(*self._assistant_spec)
+            thread_obj = await self.client.create_thread(assistant_id=self.assistant_id)
+        return str(thread_obj.thread_id)  # valid UUID to use in add_message
 
 
     async def generate_response(
@@ -45,23 +72,57 @@ class LLMClient:
         """
         Calls Backboard API to generate a response for the given prompt.
         Returns the raw text of the assistant's latest message.
+        Runs under self.policy (per-attempt timeout, retries, optional hedging).
+        With stream=True the tokens are streamed and joined back together.
         """
-        if self.assistant is None:
+        if stream:
+            return "".join([chunk async for chunk in self.stream_response(prompt, thread_id, memory)])
+
+        if self.assistant_id is None:
             await self.init_assistant()
 
-        response = await self.client.add_message(
+        client = self.client
+        response = await call_with_policy(self.policy, lambda: client.add_message(
             #assistant_id=self.assistant.id, no assistant variable
             thread_id=thread_id,
             content=prompt,
             memory=memory,
-            llm_provider="google",
-            model_name="gemini-2.5-flash",
-            stream=stream
-        )
+            llm_provider=LLM_PROVIDER,
+            model_name=MODEL_NAME,
+            stream=False
+        ))
 
         # Return the latest message content from the assistant
         return response.content or response.message
 
+    async def stream_response(
+        self,
+        prompt: str,
+        thread_id: Optional[str] = None,
+        memory: str = "Auto"
+    ) -> AsyncIterator[str]:
+        """
+        Streams the assistant's reply, yielding text chunks as Backboard emits them.
+        Chunks already shown to the patient cannot be taken back, so this path is not
+        retried or hedged by self.policy.
+        """
+        if self.assistant_id is None:
+            await self.init_assistant()
+
+        events = await self.client.add_message(
+            thread_id=thread_id,
+            content=prompt,
+            memory=memory,
+            llm_provider=LLM_PROVIDER,
+            model_name=MODEL_NAME,
+            stream=True
+        )
+        async for event in events:
+            if event.get("type") == "content_streaming":
+                chunk = event.get("content")
+                if chunk:
+                    yield chunk
+
     #POST
     async def post_prompt(
         self,
@@ -1,10 +1,24 @@
 import asyncio
-from parsing import post_patient_text_to_llm  #<- I think this? #parse_prompt_llm
+from typing import AsyncIterator, Awaitable, Callable
+from parsing import post_patient_text_to_llm, stream_patient_text_to_llm  #<- I think this? #parse_prompt_llm
 import parsing
+from json_stream import JSONFieldStream, JSONObjectStream, JSONExtractionError
+from prompt_schemas import ParsedResponse, REPLY_COMPLETE_FIELDS
 from memory import MemoryManager #NeuroFlow
-from llm import LLMClient
+from llm import LLMClient, MODEL_NAME
+from context_window import ContextBudget, budget_for
+from session_store import SessionState, SessionStore, create_store
+from response_cache import ResponseCache, cache as default_response_cache
+import client_pool
+import tracing
 from dotenv import load_dotenv
 from tools.notetaker import NoteTaker
+from tools.note_queue import NoteJobQueue
+from tools import pdf_renderer
+from tools import intent_classifier
+from tools import prompt_builder
+from tools import risk_screener
+from pipeline import Stage, StageGraph
 
 load_dotenv()
 
@@ -18,13 +32,177 @@ class NeuroFlowMain:
         self,
         llm_client: LLMClient,
         memory_manager: MemoryManager,
-        notetaker: NoteTaker
+        notetaker: NoteTaker,
+        note_queue: NoteJobQueue | None = None,
+        session_store: SessionStore | None = None,
+        context_budget: ContextBudget | None = None,
+        response_cache: ResponseCache | None = None,
+        on_escalation: Callable[[str, risk_screener.Screening], Awaitable[None]] | None = None
     ):
         self.llm = llm_client
         self.memory = memory_manager
         self.notetaker = notetaker
+        self.note_queue = note_queue or NoteJobQueue(notetaker)
+        self._background: set[asyncio.Task] = set()
+        # Token budget per session; long sessions move to a fresh Backboard thread
+        self.budget = context_budget or budget_for(MODEL_NAME)
+        # Per-session state (window, parsed turns, SOAP draft, risk flags), see session_store.py
+        self.sessions = session_store or create_store(self.budget)
+        # Replies to deterministic turns (e.g. the bootstrap greeting) shared across sessions
+        self.response_cache = response_cache or default_response_cache
+        # Awaited in the background when a message gets the crisis response, e.g. to page a clinician
+        self.on_escalation = on_escalation
+        self._turn_graph = self._build_turn_graph()
     
     
+    def _build_turn_graph(self) -> StageGraph:
+        """
+        Stages of one turn. Resolving the assistant, retrieving memory and classifying the
+        message run side by side; memory writes, end-of-chat notes and warming the PDF pool
+        are detached from the reply. The risk screen is run on its own first (see
+        _escalate_if_crisis), since a crisis reply skips the LLM stages.
+        """
+        return StageGraph([
+            Stage("risk", self._screen_risk, critical=False),
+            Stage("assistant", self._ensure_assistant),
+            Stage("memory_context", self._get_context),
+            Stage("classification", self._classify, critical=False),
+            Stage("reply", self._ask_llm, deps=("assistant", "memory_context", "classification")),
+            Stage("parsed", self._parse, deps=("reply",)),
+            Stage("draft", self._update_draft, deps=("parsed",), critical=False),
+            Stage("window", self._record_turn, deps=("parsed",), critical=False),
+            Stage("save_session", self._save_session, deps=("draft", "window"), critical=False),
+            # A failed memory write must not keep end_session (notes, cleanup) from running
+            Stage("remember", self._remember, deps=("parsed",), detached=True, critical=False),
+            Stage("rotate_thread", self._rotate_if_over_budget, deps=("save_session",), detached=True, critical=False),
+            Stage("end_session", self._end_if_terminated, deps=("remember", "save_session"), detached=True),
+            Stage("prewarm_notes", self._prewarm_notes, deps=("parsed",), detached=True, critical=False),
+        ])
+
+    async def _session(self, thread_id: str) -> SessionState:
+        state = await self.sessions.get_async(thread_id)
+        if state is None:
+            return SessionState.new(thread_id, self.budget)
+        if state.primed:
+            # The session may have been served by another worker until now
+            prompt_builder.mark_primed(state.thread_id)
+        return state
+
+    async def _turn_context(self, thread_id: str, patient_text: str) -> dict:
+        session = await self._session(thread_id)
+        return {
+            "thread_id": thread_id,
+            "patient_text": patient_text,
+            "session": session,
+            "previous": session.last_parsed,
+            "conversation": session.window
+        }
+
+    async def _ensure_assistant(self, ctx: dict):
+        await self.llm.init_assistant()
+
+    async def _get_context(self, ctx: dict) -> str:
+        return await self.memory.get_context(ctx["thread_id"], ctx["patient_text"])
+
+    async def _classify(self, ctx: dict) -> intent_classifier.Classification:
+        # Local and sub-millisecond: plans this turn from this message instead of the last one
+        return intent_classifier.classify(ctx["patient_text"])
+
+    async def _screen_risk(self, ctx: dict) -> risk_screener.Screening:
+        # Recorded before the LLM call, so a failed call cannot lose a flag
+        screening = risk_screener.screen(ctx["patient_text"])
+        if screening.flags:
+            ctx["session"].draft.add_screening(screening)
+            self.sessions.put(ctx["session"])
+        return screening
+
+    def _escalate_if_crisis(self, ctx: dict) -> bool:
+        """
+        Answers a crisis disclosure with the fixed crisis response instead of waiting on
+        Backboard, once per session; later turns go to the LLM, which sees the exchange in
+        the next prompt. Fills in the LLM stages' results, so the rest of the graph runs as usual.
+        """
+        screening = ctx.get("risk")
+        if screening is None or not screening.crisis or not risk_screener.ESCALATION:
+            return False
+        draft = ctx["session"].draft
+        if draft.escalated:
+            return False
+        draft.escalated = True
+        tracing.incr("neuroflow_risk_escalations_total")
+        ctx["assistant"] = None
+        ctx["memory_context"] = ""
+        ctx["classification"] = None
+        ctx["reply"] = risk_screener.crisis_reply(screening)
+        ctx["conversation"].add_local_exchange(ctx["patient_text"], risk_screener.CRISIS_RESPONSE)
+        if self.on_escalation is not None:
+            task = asyncio.create_task(self.on_escalation(ctx["thread_id"], screening))
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+        return True
+
+    async def _ask_llm(self, ctx: dict) -> str:
+        return await post_patient_text_to_llm(
+            llm_client=self.llm,
+            patient_text=ctx["patient_text"],
+            thread_id=ctx["conversation"].thread_id,
+            memory_context=ctx["memory_context"],
+            parsed=ctx["previous"],
+            window=ctx["conversation"],
+            response_cache=self.response_cache,
+            classification=ctx["classification"]
+        )
+
+    async def _parse(self, ctx: dict) -> ParsedResponse:
+        parsed = parsing.parse_llm_response(ctx["reply"], ctx["patient_text"])
+        classification = ctx.get("classification")
+        if classification is not None:
+            # How often the local labels match the LLM's, as a running accuracy check
+            tracing.incr("neuroflow_classifier_agreement_total", field="intent", agree=classification.intent == parsed.intent)
+            tracing.incr("neuroflow_classifier_agreement_total", field="emotion", agree=classification.emotion == parsed.emotion)
+        # The next turn is planned from this one, so this must land before the reply is returned
+        session = ctx["session"]
+        session.turns.append(parsed)
+        session.plan = prompt_builder.plan_text(ctx["previous"], classification)
+        return parsed
+
+    async def _update_draft(self, ctx: dict):
+        ctx["session"].draft.update(ctx["parsed"])
+
+    async def _record_turn(self, ctx: dict):
+        ctx["conversation"].add_turn(ctx["patient_text"], ctx["parsed"].response)
+
+    async def _save_session(self, ctx: dict):
+        session = ctx["session"]
+        session.primed = not prompt_builder.needs_instructions(session.thread_id)
+        self.sessions.put(session)
+
+    async def _rotate_if_over_budget(self, ctx: dict):
+        # Runs after the reply is out, so the next turn finds the fresh thread ready
+        window = ctx["conversation"]
+        if ctx["parsed"].terminate or window.rotating or not window.over_budget():
+            return
+        window.rotating = True
+        try:
+            window.rotate(await self.llm.create_thread())
+            tracing.incr("neuroflow_thread_rotations_total")
+            ctx["session"].primed = False
+            self.sessions.put(ctx["session"])
+        finally:
+            window.rotating = False
+
+    async def _remember(self, ctx: dict):
+        await self.memory.schedule_write(ctx["thread_id"], ctx["parsed"].memory_candidates)
+
+    async def _end_if_terminated(self, ctx: dict):
+        # End-of-chat handling: notes are generated in the background,
+        # look them up with self.note_queue.status(thread_id)
+        if ctx["parsed"].terminate:
+            return await self.end_session(ctx["thread_id"])
+
+    async def _prewarm_notes(self, ctx: dict):
+        await pdf_renderer.renderer.warm()
+
     async def handle_patient_message(
         self,
         thread_id: str,
@@ -32,33 +210,107 @@ class NeuroFlowMain:
     ) -> dict:
         """
         One turn of the chat loop.
-        Returns response text + terminate flag for the frontend.
+        Returns response text + terminate flag for the frontend; escalated is True when the
+        reply is the crisis response.
         """
+        ctx = await self._turn_context(thread_id, patient_text)
+        with tracing.turn(thread_id) as trace:
+            await self._turn_graph.run(ctx, targets=("risk",))
+            escalated = self._escalate_if_crisis(ctx)
+            await self._turn_graph.run(ctx, background=self._background)
+            parsed = ctx["parsed"]
+            trace.set(intent=parsed.intent, emotion=parsed.emotion, terminate=parsed.terminate, escalated=escalated)
 
-        memory_context = await self.memory.get_context(thread_id)
-
-        parsed_txt = await post_patient_text_to_llm(
-            llm_client=self.llm,
-            patient_text=patient_text,
-            thread_id=thread_id,
-            memory_context=memory_context
-
-        )
+        return {
+            "response": parsed.response,
+            "terminate": parsed.terminate,
+            "escalated": escalated
+        }
 
-        parsed = parsing.parse_llm_response(parsed_txt, patient_text)
+    async def stream_patient_message(
+        self,
+        thread_id: str,
+        patient_text: str
+    ) -> AsyncIterator[dict]:
+        """
+        Streaming variant of handle_patient_message.
+        Yields {"type": "delta", "text": ...} as the patient-facing reply is generated,
+        then one {"type": "final", ...} with the full response, terminate and escalated flags
+        and memory candidates.
+        """
+        ctx = await self._turn_context(thread_id, patient_text)
+        with tracing.turn(thread_id, kind="stream_turn") as trace:
+            # Same graph as handle_patient_message, with the LLM stage replaced by the stream
+            await self._turn_graph.run(ctx, targets=("risk",))
+            escalated = self._escalate_if_crisis(ctx)
+            if escalated:
+                yield {"type": "delta", "text": risk_screener.CRISIS_RESPONSE}
+            else:
+                await self._turn_graph.run(ctx, targets=("assistant", "memory_context", "classification"))
 
-        # Store memory
-        self.memory.write(thread_id, parsed.memory_candidates)
+                extractor = JSONFieldStream("response")
+                object_stream = JSONObjectStream()
+                async for chunk in stream_patient_text_to_llm(
+                    llm_client=self.llm,
+                    patient_text=patient_text,
+                    thread_id=ctx["conversation"].thread_id,
+                    memory_context=ctx["memory_context"],
+                    parsed=ctx["previous"],
+                    window=ctx["conversation"],
+                    response_cache=self.response_cache,
+                    classification=ctx["classification"]
+                ):
+                    object_stream.feed(chunk)
+                    delta = extractor.feed(chunk)
+                    if delta:
+                        yield {"type": "delta", "text": delta}
 
-        # End-of-chat handling
-        if parsed.terminate:
-            await self.notetaker.generate_notes(thread_id)
+                try:
+                    ctx["reply"] = object_stream.finish(complete=REPLY_COMPLETE_FIELDS)
+                except JSONExtractionError as e:
+                    tracing.incr("neuroflow_parse_failures_total")
+                    raise parsing.LLMResponseError(str(e)) from e
+            await self._turn_graph.run(ctx, background=self._background)
+            parsed = ctx["parsed"]
+            trace.set(intent=parsed.intent, emotion=parsed.emotion, terminate=parsed.terminate, escalated=escalated)
 
-        return {
+        yield {
+            "type": "final",
             "response": parsed.response,
-            "terminate": parsed.terminate
+            "terminate": parsed.terminate,
+            "escalated": escalated,
+            "memory_candidates": parsed.memory_candidates
         }
 
+    async def end_session(self, thread_id: str):
+        """
+        Flushes and forgets the session's memory writes, then queues its clinical notes
+        so the scribe sees everything the patient said.
+        """
+        session = await self.sessions.get_async(thread_id)
+        self.sessions.delete(thread_id)
+        prompt_builder.forget_primed(thread_id, session.thread_id if session else None)
+        with tracing.turn(thread_id, kind="end_session"):
+            with tracing.span("memory_flush"):
+                await self.memory.flush(thread_id, end_session=True)
+                await self.memory.forget(thread_id)
+            with tracing.span("notes_submit"):
+                return await self.note_queue.submit(
+                    thread_id,
+                    draft=session.draft.to_soap() if session else None,
+                    conversation_thread=session.thread_id if session else None
+                )
+
+    async def drain(self):
+        """
+        Waits for detached turn side effects and queued notes, e.g. before exiting.
+        """
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+        await self.memory.flush()
+        await self.note_queue.join()
+        await asyncio.to_thread(self.sessions.flush)
+
 async def main():
     # --- instantiate dependencies ---
     llm_client = LLMClient()
@@ -74,7 +326,7 @@ async def main():
 
     # --- start chat ---
     await llm_client.init_assistant()
-    print("Assistant ID:", llm_client.assistant.assistant_id)
+    print("Assistant ID:", llm_client.assistant_id)
     thread_id = await llm_client.create_thread()  # for testing
     print("🧠 NeuroFlow Chatbot started. Type your message (or 'quit' to exit).")
 
@@ -98,6 +350,10 @@ async def main():
             break
 
     print("Chat ended.")
+    print("📝 Saving session...")
+    await neuroflow.drain()
+    await neuroflow.note_queue.close()
+    await client_pool.close_client()
 
 # Run the async main loop
 if __name__ == "__main__":
@@ -1,118 +1,20 @@
 import asyncio
-import speech_recognition as sr
-from gtts import gTTS
-import os
-import sys
 
 # --- Existing Imports ---
-from parsing import post_patient_text_to_llm
-import parsing
+# The orchestration layer is shared with the text CLI so both get the same turn pipeline
+from main import NeuroFlowMain
 from memory import MemoryManager 
 from llm import LLMClient
+import client_pool
 from dotenv import load_dotenv
 from tools.notetaker import NoteTaker
+from tools import tts
+from tools.voice_pipeline import VoicePipeline
 
 load_dotenv()
 
-# --- Audio Helper Functions ---
-
-def speak_response(text):
-    """
-    Converts text to audio using gTTS and plays it immediately.
-    """
-    print(f"NeuroFlow (Speaking): {text}") # Keep visual log
-    
-    # 1. Generate Audio
-    tts = gTTS(text=text, lang='en')
-    filename = "response.mp3"
-    tts.save(filename)
-    
-    # 2. Play Audio (Platform specific)
-    if sys.platform == "darwin":  # macOS
-        os.system(f"afplay {filename}")
-    elif sys.platform == "win32": # Windows
-        os.system(f"start {filename}")
-    else: # Linux
-        os.system(f"mpg123 {filename}") # Requires mpg123 installed
-
-def listen_to_patient():
-    """
-    Listens to the microphone and returns text.
-    Blocks until speech is detected and processed.
-    """
-    recognizer = sr.Recognizer()
-    
-    with sr.Microphone() as source:
-        print("\nListening... (Speak now)")
-        # Adjust for ambient noise to prevent silence from triggering
-        recognizer.adjust_for_ambient_noise(source, duration=1)
-        
-        try:
-            # Listen for input
-            audio = recognizer.listen(source, timeout=10) # 10s wait limit
-            text = recognizer.recognize_google(audio)
-            print(f"You said: {text}")
-            return text
-        except sr.UnknownValueError:
-            print("Could not understand audio.")
-            return ""
-        except sr.RequestError:
-            print("Could not request results (Offline?)")
-            return ""
-        except sr.WaitTimeoutError:
-            print("Listening timed out.")
-            return ""
-
-# --- Main Class ---
-
-class NeuroFlowMain:
-    """
-    Main orchestration layer.
-    """
-
-    def __init__(
-        self,
-        llm_client: LLMClient,
-        memory_manager: MemoryManager,
-        notetaker: NoteTaker
-    ):
-        self.llm = llm_client
-        self.memory = memory_manager
-        self.notetaker = notetaker
-    
-    
-    async def handle_patient_message(
-        self,
-        thread_id: str,
-        patient_text: str
-    ) -> dict:
-        """
-        One turn of the chat loop.
-        Returns response text + terminate flag.
-        """
-
-        memory_context = await self.memory.get_context(thread_id)
-
-        parsed_txt = await post_patient_text_to_llm(
-            llm_client=self.llm,
-            patient_text=patient_text,
-            thread_id=thread_id,
-            memory_context=memory_context
-        )
-
-        parsed = parsing.parse_llm_response(parsed_txt, patient_text)
-
-        # Store memory
-        self.memory.write(thread_id, parsed.memory_candidates)
-
-        # End-of-chat handling
-        if parsed.terminate:
-            await self.notetaker.generate_notes(thread_id)
-
-        return {
-            "response": parsed.response,
-            "terminate": parsed.terminate
-        }
+BOOTSTRAP_TEXT = "Hello! How are you feeling today?"
+GOODBYE_TEXT = "Goodbye."
 
 async def main():
     # --- instantiate dependencies ---
@@ -128,40 +30,49 @@ async def main():
 
     # --- start chat ---
     await llm_client.init_assistant()
-    print("Assistant ID:", llm_client.assistant.assistant_id)
+    print("Assistant ID:", llm_client.assistant_id)
     thread_id = await llm_client.create_thread()
     print("🧠 NeuroFlow Voice Chatbot started.")
+    # Fixed phrases are synthesized once and reused from the cache on later runs
+    await asyncio.to_thread(tts.get_engine().prerender, [GOODBYE_TEXT])
+    voice = VoicePipeline(neuroflow)
 
     # In your original code, you simulated the user saying "Hello" first
     # to trigger the bot's greeting. We keep this flow.
-    patient_text = "Hello! How are you feeling today?" 
+    patient_text = BOOTSTRAP_TEXT
     
     terminate = False
     first_run = True
 
     while not terminate:
-        # If it's NOT the first run, we need to listen for the user
+        # If it's NOT the first run, we need to listen for the user.
+        # Listening starts while the last reply is still playing; talking over it stops it.
         if not first_run:
-            patient_text = listen_to_patient()
+            patient_text = await voice.listen(timeout=10) # 10s wait limit
             
             # If listening failed or timed out, skip this loop iteration
             if not patient_text:
+                print("Could not understand audio (or listening timed out).")
                 continue
+            print(f"You said: {patient_text}")
                 
             if patient_text.lower() in ["quit", "exit", "stop"]:
-                speak_response("Goodbye.")
+                await voice.say(GOODBYE_TEXT)
                 break
 
-        # Process the input (either the phantom "Hello" or actual voice)
-        response_dict = await neuroflow.handle_patient_message(thread_id, patient_text)
-        
-        # Speak the result
-        speak_response(response_dict['response'])
+        # Process the input (either the phantom "Hello" or actual voice).
+        # Sentences are spoken as they stream in; this returns once the text is complete.
+        response_dict = await voice.respond(thread_id, patient_text)
 
         terminate = response_dict.get("terminate", False)
         first_run = False # Flag off after the bootstrap loop
 
+    await voice.close() # let the last reply finish playing
     print("Chat ended.")
+    print("📝 Saving session...")
+    await neuroflow.drain()
+    await neuroflow.note_queue.close()
+    await client_pool.close_client()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
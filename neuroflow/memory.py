@@ -1,31 +1,66 @@
 import os
+from typing import Dict, Iterable, List, Optional, Set
 from backboard import BackboardClient
+import client_pool
+from assistant_registry import AssistantRegistry, registry as default_registry
+from memory_store import MemoryStore
+from resilience import MEMORY_POLICY, call_with_policy
+import tracing
 import asyncio
 
+MEMORY_ASSISTANT_NAME = "Neuroflow Memory"
+MEMORY_ASSISTANT_DESCRIPTION = "Stores clinically relevant patient context such as symptoms, preferences, emotional state, and personal history."
+MEMORY_WRITE_CONCURRENCY = int(os.getenv("NEUROFLOW_MEMORY_WRITE_CONCURRENCY", "4"))
+MEMORY_TOP_K = int(os.getenv("NEUROFLOW_MEMORY_TOP_K", "5"))
+MEMORY_CHAR_BUDGET = int(os.getenv("NEUROFLOW_MEMORY_CHAR_BUDGET", "1200"))
+
+def _memory_key(item) -> str:
+    # Identical items modulo case/whitespace are written once per session
+    return " ".join(str(item).split()).lower()
+
 class MemoryManager:
-    def __init__(self):
-        api_key = os.getenv("BACKBOARD_API_KEY")
-        if api_key is None:
-            raise Exception("BACKBOARD API KEY not found")
-        self.client = BackboardClient(
-            api_key=api_key
-        )
-        self.assistant = None #TODO, have some assisntant ID in a config file everywhere
-                              #So we only craete a new one when needed.
+    def __init__(
+        self,
+        client: Optional[BackboardClient] = None,
+        registry: Optional[AssistantRegistry] = None,
+        write_concurrency: int = MEMORY_WRITE_CONCURRENCY,
+        store: Optional[MemoryStore] = None,
+        top_k: int = MEMORY_TOP_K,
+        char_budget: int = MEMORY_CHAR_BUDGET
+    ):
+        self._client = client
+        self.registry = registry or default_registry
+        self.assistant_id = None
+
+        # Local copy of every long-term memory, indexed for retrieval into the prompt
+        self.store = store or MemoryStore()
+        self.top_k = top_k
+        self.char_budget = char_budget
+
+        self.write_concurrency = write_concurrency
+        self._write_slots: Optional[asyncio.Semaphore] = None
+        self._written: Dict[str, Set[str]] = {}  # per-session dedupe of long-term items
+        self._pending: Dict[str, Set[asyncio.Task]] = {}  # fire-and-forget writes per session
+
+    @property
+    def client(self) -> BackboardClient:
+        """
+        The injected client, or the shared pooled client for the running event loop.
+        """
+        return self._client or client_pool.get_client()
 
     async def init_assistant(self):
-        if self.assistant is None:
-            self.assistant = await self.client.create_assistant(
-                name="Neuroflow Memory",
-                description="Stores clinically relevant patient context such as symptoms, preferences, emotional state, and personal history."
+        if self.assistant_id is None:
+            self.assistant_id = await self.registry.resolve(
+                self.client, MEMORY_ASSISTANT_NAME, MEMORY_ASSISTANT_DESCRIPTION
             )
 
-    async def read(self, thread_id: str):
+    async def read(self, thread_id: str, query: str = "") -> List[str]:
         """
-        Reading memory is implicit in Backboard.
-        Just return thread_id so the LLM can retrieve.
+        Returns the stored memories most relevant to query from the local index.
+        Backboard's own "Auto" memory still runs on top of this on the LLM side.
         """
-        return thread_id
+        return self.store.search(thread_id, query, top_k=self.top_k, char_budget=self.char_budget)
 
     async def write(self, thread_id: str, memory_candidates: dict):
         """
@@ -33,31 +68,91 @@ class MemoryManager:
         Short-term memory should stay in-session.
         """
 
-        long_term = memory_candidates.get("long_term", [])
+        long_term = memory_candidates.get("long_term", []) if memory_candidates else []
         if not long_term:
             return
 
-        for item in long_term: 
-            await self.client.add_memory(
-                assistant_id=thread_id,
-                content=item,
-               # memory="Auto",   # Let Backboard decide storage
-               # stream=False
-            )
+        # Local index first so the next turn can retrieve these right away
+        await asyncio.to_thread(self.store.add, thread_id, long_term)
+        await self.write_batch(thread_id, long_term)
 
-    async def get_context(self, thread_id: str) -> str:
+    async def write_batch(self, thread_id: str, items: Iterable[str]):
         """
-        Returns a string of relevant memory to include in the prompt.
+        Sends items concurrently (capped by write_concurrency), skipping anything
+        already written for this session.
         """
-        # Ensure assistant is initialized
+        written = self._written.setdefault(thread_id, set())
+        batch: List[str] = []
+        for item in items:
+            key = _memory_key(item)
+            if key and key not in written:
+                written.add(key)
+                batch.append(item)
+        if not batch:
+            return
+
         await self.init_assistant()
+        if self._write_slots is None:
+            self._write_slots = asyncio.Semaphore(self.write_concurrency)
+
+        async def add(item: str):
+            client = self.client
+            async with self._write_slots:
+                await call_with_policy(MEMORY_POLICY, lambda: client.add_memory(
+                    assistant_id=self.assistant_id,
+                    content=item,
+                    metadata={"thread_id": thread_id}
+                ))
+
+        with tracing.span("memory_write", items=len(batch)):
+            results = await asyncio.gather(*(add(item) for item in batch), return_exceptions=True)
+        for item, result in zip(batch, results):
+            if isinstance(result, Exception):
+                # Let a later turn retry it
+                written.discard(_memory_key(item))
+                tracing.incr("neuroflow_memory_write_failures_total")
+                print(f"⚠️ Memory write failed for {thread_id}: {result}")
 
-        # Read stored memories (stub for now just returns thread_id)
-        # In real implementation, you would fetch long-term memory objects
-        memories = await self.read(thread_id)  # this could return a list of items
-        if isinstance(memories, list):
-            return "\n".join(memories)
-        elif isinstance(memories, str):
-            return memories
-        else:
-            return ""
+    async def schedule_write(self, thread_id: str, memory_candidates: dict) -> asyncio.Task:
+        """
+        Fire-and-forget version of write() that keeps memory off the turn's critical path.
+        Returns once the items are indexed locally, so the very next turn can retrieve
+        them; call flush() at session end to make sure the remote writes landed.
+        """
+        long_term = memory_candidates.get("long_term", []) if memory_candidates else []
+        if long_term:
+            # The store appends to its JSONL file, keep that off the event loop
+            await asyncio.to_thread(self.store.add, thread_id, long_term)
+        task = asyncio.create_task(self.write_batch(thread_id, long_term))
+        pending = self._pending.setdefault(thread_id, set())
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+        return task
+
+    async def flush(self, thread_id: Optional[str] = None, end_session: bool = False):
+        """
+        Waits for scheduled writes of one session (or all sessions) to finish.
+        With end_session=True the session's dedupe state is dropped afterwards.
+        """
+        thread_ids = [thread_id] if thread_id is not None else list(self._pending)
+        for tid in thread_ids:
+            tasks = list(self._pending.get(tid, ()))
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            if end_session:
+                self._pending.pop(tid, None)
+                self._written.pop(tid, None)
+
+    async def forget(self, thread_id: str):
+        """
+        Drops a finished session's memories from the local store and its file.
+        """
+        await asyncio.to_thread(self.store.forget, thread_id)
+
+    async def get_context(self, thread_id: str, query: str = "") -> str:
+        """
+        Returns a string of relevant memory to include in the prompt.
+        Bounded by top_k items and char_budget characters.
+        """
+        memories = await self.read(thread_id, query)
+        return "\n".join(f"- {memory}" for memory in memories)
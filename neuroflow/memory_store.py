@@ -0,0 +1,218 @@
+import os
+import re
+import json
+import math
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+"""
+Local long-term memory store with an in-process BM25 index.
+
+Memories are kept per thread and indexed as they are written, so MemoryManager.get_context
+can pick the few items most relevant to the patient's latest message in microseconds,
+without a remote call. Items are optionally appended to a JSONL file so a restarted
+process keeps its memories.
+
+Each thread keeps its newest MAX_PER_THREAD memories; older ones are dropped from the
+index. The file is rewritten with only the kept memories when dropped lines outnumber
+the kept ones, and whenever a thread is forgotten, so forgotten memories leave the disk.
+NeuroFlowMain.end_session forgets the session's thread once its writes are flushed, so
+the file only holds memories of sessions that are still open (or were never ended).
+
+Reads and writes touch the file synchronously; async callers go through
+asyncio.to_thread (see MemoryManager).
+"""
+
+MEMORY_STORE_PATH = os.getenv("NEUROFLOW_MEMORY_STORE", ".neuroflow/memories.jsonl")
+MAX_PER_THREAD = int(os.getenv("NEUROFLOW_MEMORY_MAX_PER_THREAD", "200"))
+
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+_STOPWORDS = frozenset(
+    "a an and are as at be been but by for from had has have he her his i i'm im in is it its "
+    "me my of on or our she so that the their them they this to was we were what when with you your".split()
+)
+
+_SUFFIXES = ("ing", "ly", "ed", "s")
+
+
+def _stem(token: str) -> str:
+    # Crude suffix stripping so "sleeping"/"sleep" and "attacks"/"attack" match
+    for suffix in _SUFFIXES:
+        if len(token) > len(suffix) + 2 and token.endswith(suffix):
+            return token[: -len(suffix)]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    return [_stem(t) for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def _key(text: str) -> str:
+    # Memories that differ only in case or spacing are the same memory
+    return " ".join(text.split()).lower()
+
+
+class _ThreadIndex:
+    """
+    BM25 index over one thread's memories. Documents are only appended; keep_newest()
+    builds a trimmed copy instead of removing documents in place.
+    """
+
+    def __init__(self):
+        self.docs: List[str] = []
+        self.keys = set()
+        self.term_freqs: List[Counter] = []
+        self.lengths: List[int] = []
+        self.postings: Dict[str, List[int]] = {}
+        self.total_length = 0
+
+    def add(self, text: str, key: str, tf: Optional[Counter] = None):
+        doc_id = len(self.docs)
+        tf = tf if tf is not None else Counter(tokenize(text))
+        self.docs.append(text)
+        self.keys.add(key)
+        self.term_freqs.append(tf)
+        self.lengths.append(sum(tf.values()))
+        self.total_length += self.lengths[-1]
+        for term in tf:
+            self.postings.setdefault(term, []).append(doc_id)
+
+    def keep_newest(self, count: int) -> "_ThreadIndex":
+        # Doc ids are positions, so dropping documents means rebuilding the postings
+        trimmed = _ThreadIndex()
+        for text, tf in zip(self.docs[-count:], self.term_freqs[-count:]):
+            trimmed.add(text, _key(text), tf)
+        return trimmed
+
+    def score(self, query_terms: Iterable[str], k1: float, b: float) -> Dict[int, float]:
+        n_docs = len(self.docs)
+        avg_length = (self.total_length / n_docs) or 1.0
+        scores: Dict[int, float] = {}
+        for term in set(query_terms):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+            for doc_id in posting:
+                tf = self.term_freqs[doc_id][term]
+                norm = tf + k1 * (1 - b + b * self.lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (k1 + 1) / norm
+        return scores
+
+
+class MemoryStore:
+    def __init__(
+        self,
+        path: Optional[str] = MEMORY_STORE_PATH,
+        k1: float = 1.5,
+        b: float = 0.75,
+        max_per_thread: int = MAX_PER_THREAD
+    ):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.max_per_thread = max_per_thread
+        self._threads: Dict[str, _ThreadIndex] = {}
+        self._lock = threading.Lock()
+        self._file_lines = 0  # lines in the JSONL file, kept or not
+        if path:
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    self._file_lines += 1
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # torn write at the end of the file
+                    self._add(record["thread_id"], record["content"])
+        except FileNotFoundError:
+            pass
+
+    def _add(self, thread_id: str, content: str) -> bool:
+        index = self._threads.setdefault(thread_id, _ThreadIndex())
+        key = _key(content)
+        if not key or key in index.keys:
+            return False
+        index.add(content, key)
+        if len(index.docs) > self.max_per_thread:
+            self._threads[thread_id] = index.keep_newest(self.max_per_thread)
+        return True
+
+    def _kept(self) -> int:
+        return sum(len(index.docs) for index in self._threads.values())
+
+    def _compact(self):
+        # Rewrites the file with only the memories still indexed; the caller holds the lock
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for thread_id, index in self._threads.items():
+                for item in index.docs:
+                    f.write(json.dumps({"thread_id": thread_id, "content": item}) + "\n")
+        os.replace(tmp_path, self.path)
+        self._file_lines = self._kept()
+
+    def add(self, thread_id: str, items: Iterable[str]) -> List[str]:
+        """
+        Indexes new items for a thread and returns the ones that were not already stored.
+        """
+        with self._lock:
+            added = [str(item) for item in items if self._add(thread_id, str(item))]
+            if added and self.path:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    for item in added:
+                        f.write(json.dumps({"thread_id": thread_id, "content": item}) + "\n")
+                self._file_lines += len(added)
+                if self._file_lines > 2 * max(self._kept(), self.max_per_thread):
+                    self._compact()
+        return added
+
+    def items(self, thread_id: str) -> List[str]:
+        index = self._threads.get(thread_id)
+        return list(index.docs) if index else []
+
+    def search(self, thread_id: str, query: str = "", top_k: int = 5, char_budget: int = 1200) -> List[str]:
+        """
+        Top-k memories for the query, best first, within char_budget characters in total.
+        With no query (or no overlap) the most recent memories are returned instead.
+        """
+        index = self._threads.get(thread_id)
+        if index is None or not index.docs:
+            return []
+
+        with self._lock:
+            scores = index.score(tokenize(query), self.k1, self.b) if query else {}
+        if scores:
+            ranked = sorted(scores, key=lambda doc_id: (-scores[doc_id], -doc_id))
+        else:
+            ranked = range(len(index.docs) - 1, -1, -1)
+
+        results: List[str] = []
+        used = 0
+        for doc_id in ranked:
+            if len(results) >= top_k:
+                break
+            text = index.docs[doc_id]
+            if used + len(text) > char_budget:
+                continue
+            results.append(text)
+            used += len(text)
+        return results
+
+    def forget(self, thread_id: str):
+        """
+        Drops a thread's memories from the index and from the JSONL file.
+        """
+        with self._lock:
+            self._threads.pop(thread_id, None)
+            if self.path:
+                self._compact()
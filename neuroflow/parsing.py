@@ -1,42 +1,203 @@
+import time
 from llm import LLMClient  # your LLM wrapper
-from prompt_schemas import ParsedResponse
+from prompt_schemas import ParsedResponse, REPLY_COMPLETE_FIELDS
 import prompts
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, AsyncIterator
 from memory import MemoryManager
-import json
+from context_window import ConversationWindow
+import json_stream
+from response_cache import ResponseCache, cache as default_response_cache
 from tools import prompt_builder
+from tools.intent_classifier import Classification
+import tracing
+
+def _cache_key(prompt: str, parsed: Optional[ParsedResponse], memory_context: str, history: str, classification: Optional[Classification] = None) -> Optional[str]:
+    """
+    Only turns whose reply depends on nothing but the prompt and the plan are cacheable:
+    the first turn of a session, with no memory context and no carried-over history.
+    """
+    if parsed is not None or memory_context.strip() or history:
+        return None
+    return ResponseCache.key(prompt, plan=prompt_builder.plan_text(parsed, classification))
+
+
+def _cached_reply(response_cache: ResponseCache, key: Optional[str]) -> Optional[str]:
+    if key is None or not response_cache.enabled:
+        return None
+    reply = response_cache.get(key)
+    tracing.incr("neuroflow_response_cache_total", outcome="hit" if reply is not None else "miss")
+    return reply
+
+
+def _record_local_exchange(window: Optional[ConversationWindow], patient_text: str, reply: str):
+    # The thread never saw this exchange, so the next prompt carries it instead
+    if window is not None:
+        try:
+            response = json_stream.parse_json_object(reply).get("response", "")
+        except json_stream.JSONExtractionError:
+            response = ""
+        window.add_local_exchange(patient_text, response)
+
 
 #Send to API
-async def post_patient_text_to_llm(llm_client: LLMClient, patient_text: str, thread_id, memory_context: str = ""):
-    prompt = prompt_builder.build_full_prompt(patient_text, memory_context) #build prompt
-    response = await llm_client.post_prompt(prompt, thread_id) #json response
+async def post_patient_text_to_llm(llm_client: LLMClient, patient_text: str, thread_id, memory_context: str = "", parsed: Optional[ParsedResponse] = None, window: Optional[ConversationWindow] = None, response_cache: ResponseCache = default_response_cache, classification: Optional[Classification] = None):
+    """
+    parsed is the previous turn's ParsedResponse and classification the local classifier's
+    labels for patient_text; together they pick the response plan for this turn.
+    window, if given, supplies carried-over history and is charged for the exchange.
+    Deterministic turns (see _cache_key) are answered from response_cache when possible.
+    """
+    with tracing.span("build_prompt") as span:
+        include_instructions = prompt_builder.needs_instructions(thread_id)
+        history = window.carryover if window else ""
+        prompt = prompt_builder.build_full_prompt(patient_text, memory_context, parsed, include_instructions=include_instructions, history=history, classification=classification) #build prompt
+        span.set(chars=len(prompt), instructions=include_instructions)
+    cache_key = _cache_key(prompt, parsed, memory_context, history, classification)
+    cached = _cached_reply(response_cache, cache_key)
+    if cached is not None:
+        _record_local_exchange(window, patient_text, cached)
+        return cached
+
+    tracing.observe("neuroflow_prompt_chars", len(prompt), tracing.SIZE_BUCKETS)
+    with tracing.span("llm_call"):
+        response = await llm_client.post_prompt(prompt, thread_id) #json response
+    tracing.observe("neuroflow_response_chars", len(response or ""), tracing.SIZE_BUCKETS)
+    if window is not None:
+        window.add_exchange(thread_id, prompt, response or "")
+    # Only a prompt that actually reached the thread primes it; cached turns never do
+    if include_instructions:
+        prompt_builder.mark_primed(thread_id)
+    if cache_key is not None:
+        response_cache.put(cache_key, response or "")
     return response # dict[str->Any]
 
+async def stream_patient_text_to_llm(llm_client: LLMClient, patient_text: str, thread_id, memory_context: str = "", parsed: Optional[ParsedResponse] = None, window: Optional[ConversationWindow] = None, response_cache: ResponseCache = default_response_cache, classification: Optional[Classification] = None) -> AsyncIterator[str]:
+    """
+    Same as post_patient_text_to_llm, but yields the raw JSON text as it is generated.
+    A cached reply is yielded as a single chunk.
+    """
+    with tracing.span("build_prompt") as span:
+        include_instructions = prompt_builder.needs_instructions(thread_id)
+        history = window.carryover if window else ""
+        prompt = prompt_builder.build_full_prompt(patient_text, memory_context, parsed, include_instructions=include_instructions, history=history, classification=classification)
+        span.set(chars=len(prompt), instructions=include_instructions)
+    cache_key = _cache_key(prompt, parsed, memory_context, history, classification)
+    cached = _cached_reply(response_cache, cache_key)
+    if cached is not None:
+        _record_local_exchange(window, patient_text, cached)
+        yield cached
+        return
+
+    tracing.observe("neuroflow_prompt_chars", len(prompt), tracing.SIZE_BUCKETS)
+    with tracing.span("llm_stream") as span:
+        start = time.perf_counter()
+        chunks = []
+        async for chunk in llm_client.stream_response(prompt, thread_id):
+            if not chunks:
+                span.set(first_chunk_ms=round((time.perf_counter() - start) * 1000, 3))
+            chunks.append(chunk)
+            yield chunk
+    reply = "".join(chunks)
+    tracing.observe("neuroflow_response_chars", len(reply), tracing.SIZE_BUCKETS)
+    if window is not None:
+        window.add_exchange(thread_id, prompt, reply)
+    if include_instructions:
+        prompt_builder.mark_primed(thread_id)
+    if cache_key is not None:
+        response_cache.put(cache_key, reply)
+
+class LLMResponseError(ValueError):
+    """
+    The LLM output could not be turned into a ParsedResponse.
+    """
+
+
+def _as_list(value) -> List[str]:
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return [str(v) for v in value if v not in (None, "")]
+    return [str(value)]
+
+
+def validate_llm_fields(data: Any) -> Dict[str, Any]:
+    """
+    Checks the decoded LLM JSON against the ParsedResponse schema and normalizes it.
+    Only a missing/empty "response" is fatal; everything else falls back to a default.
+    """
+    if not isinstance(data, dict):
+        raise LLMResponseError(f"Expected a JSON object, got {type(data).__name__}")
+
+    response = data.get("response")
+    if not isinstance(response, str) or not response.strip():
+        raise LLMResponseError("LLM output has no 'response' text")
+
+    # The LLM sometimes returns memory_candidates as a JSON string instead of an object
+    memory_candidates = data.get("memory_candidates")
+    if isinstance(memory_candidates, str):
+        try:
+            memory_candidates = json_stream.loads(memory_candidates)
+        except ValueError:
+            memory_candidates = {}
+    if not isinstance(memory_candidates, dict):
+        memory_candidates = {}
+
+    terminate = data.get("terminate", False)
+    if isinstance(terminate, str):
+        terminate = terminate.strip().lower() == "true"
+
+    entities = data.get("entities")
+    return {
+        "intent": data.get("intent") if isinstance(data.get("intent"), str) else "other",
+        "emotion": data.get("emotion") if isinstance(data.get("emotion"), str) else "neutral",
+        "response": response,
+        "memory_candidates": {
+            "short_term": _as_list(memory_candidates.get("short_term")),
+            "long_term": _as_list(memory_candidates.get("long_term")),
+        },
+        "entities": entities if isinstance(entities, dict) else {},
+        "terminate": bool(terminate),
+    }
+
+
 def parse_llm_response(raw_llm_response, input_text: str):
     """
     returnes a parsed version of the response returned by the llm, packed in a ParsedResponse object
+    Accepts either the raw text (fences, prose and truncation are tolerated) or an already decoded dict.
+    A reply cut off inside its "response" text, or before its "terminate" flag, raises LLMResponseError rather than being sent half-finished.
     """
-    llm_text = raw_llm_response.replace("```json", "").replace("```", "").strip()
+    try:
+        if isinstance(raw_llm_response, dict):
+            data = raw_llm_response
+        else:
+            try:
+                data = json_stream.parse_json_object(raw_llm_response or "", complete=REPLY_COMPLETE_FIELDS)
+            except json_stream.JSONExtractionError as e:
+                raise LLMResponseError(str(e)) from e
 
-    data = json.loads(llm_text)
+        fields = validate_llm_fields(data)
+    except LLMResponseError:
+        tracing.incr("neuroflow_parse_failures_total")
+        raise
 
     parsed_response = ParsedResponse(
     input_text=input_text, #previous patient prompt
-    intent=data["intent"],
-    emotion=data["emotion"],
-    response=data["response"],
-    memory_candidates=data["memory_candidates"],
-    entities=data.get("entities", {}),
-    terminate=data.get("terminate", False)
+    intent=fields["intent"],
+    emotion=fields["emotion"],
+    response=fields["response"],
+    memory_candidates=fields["memory_candidates"],
+    entities=fields["entities"],
+    terminate=fields["terminate"]
     )
 
     return parsed_response
 
 
 #POST
-def post_to_memory(memory_manager: MemoryManager, thread_id: str, parsed_response):
+async def post_to_memory(memory_manager: MemoryManager, thread_id: str, parsed_response):
+    # Returns once indexed locally; the remote write stays tracked for flush()
     memory_candidates = parsed_response.memory_candidates
-    memory_manager.write(thread_id, memory_candidates)
+    await memory_manager.schedule_write(thread_id, memory_candidates)
 
 
 
@@ -0,0 +1,133 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+import tracing
+
+"""
+Small dependency-graph executor for the stages of a turn.
+
+A stage is an async function of the turn context (a dict). It runs as soon as the
+stages it depends on have finished, so independent stages overlap, and its result is
+stored in the context under the stage's name. Stages whose name is already in the
+context are treated as done, which lets one graph be run piecewise (the streaming turn
+runs the stages before and after the LLM call separately).
+
+- critical stages: a failure cancels the rest of the turn and is raised unchanged
+- non-critical stages: a failure is logged and the stage's result is None
+- detached stages: post-response side effects. run() returns without waiting for them;
+  they are tracked in the `background` set so callers can drain them later
+"""
+
+StageFn = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+
+@dataclass(frozen=True)
+class Stage:
+    name: str
+    fn: StageFn
+    deps: Tuple[str, ...] = ()
+    critical: bool = True
+    detached: bool = False
+
+
+class StageGraph:
+    def __init__(self, stages: Iterable[Stage]):
+        self.stages: Dict[str, Stage] = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"Duplicate stage: {stage.name}")
+            self.stages[stage.name] = stage
+        self.order = self._toposort()
+
+    def _toposort(self) -> List[str]:
+        order: List[str] = []
+        visiting: Set[str] = set()
+        done: Set[str] = set()
+
+        def visit(name: str):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Stage cycle through: {name}")
+            if name not in self.stages:
+                raise ValueError(f"Unknown stage dependency: {name}")
+            visiting.add(name)
+            for dep in self.stages[name].deps:
+                visit(dep)
+                if self.stages[dep].detached and not self.stages[name].detached:
+                    raise ValueError(f"{name} cannot wait for detached stage {dep}")
+            visiting.discard(name)
+            done.add(name)
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+    def _closure(self, targets: Optional[Iterable[str]]) -> List[str]:
+        if targets is None:
+            return self.order
+        needed: Set[str] = set()
+        stack = list(targets)
+        while stack:
+            name = stack.pop()
+            if name not in needed:
+                needed.add(name)
+                stack.extend(self.stages[name].deps)
+        return [name for name in self.order if name in needed]
+
+    async def _run_stage(self, stage: Stage, ctx: Dict[str, Any], tasks: Dict[str, asyncio.Task]):
+        for dep in stage.deps:
+            if dep in tasks:
+                await tasks[dep]
+        with tracing.span(stage.name):
+            try:
+                result = await stage.fn(ctx)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if stage.critical:
+                    raise
+                print(f"⚠️ Stage {stage.name} failed: {type(e).__name__}: {e}")
+                result = None
+        ctx[stage.name] = result
+        return result
+
+    async def run(
+        self,
+        ctx: Dict[str, Any],
+        targets: Optional[Iterable[str]] = None,
+        background: Optional[Set[asyncio.Task]] = None
+    ) -> Dict[str, Any]:
+        """
+        Runs the stages needed for targets (default: all) and returns ctx once every
+        attached stage has finished. Detached stages keep running in the background.
+        """
+        tasks: Dict[str, asyncio.Task] = {}
+        for name in self._closure(targets):
+            if name in ctx:
+                continue
+            tasks[name] = asyncio.create_task(self._run_stage(self.stages[name], ctx, tasks))
+
+        attached = [task for name, task in tasks.items() if not self.stages[name].detached]
+        try:
+            await asyncio.gather(*attached)
+        except BaseException:
+            # Cancellation or a critical failure: nothing of this turn may keep running
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+
+        for name, task in tasks.items():
+            if self.stages[name].detached:
+                if background is not None:
+                    background.add(task)
+                    task.add_done_callback(background.discard)
+                task.add_done_callback(_report_detached_failure)
+        return ctx
+
+
+def _report_detached_failure(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        print(f"⚠️ Background stage failed: {type(task.exception()).__name__}: {task.exception()}")
@@ -1,6 +1,10 @@
 from dataclasses import dataclass, field
 from typing import List, Dict
 
+# Fields of the LLM's JSON reply that must be written out in full; a reply cut off before
+# either is a parse failure, never a guessed "terminate": false
+REPLY_COMPLETE_FIELDS = ("response", "terminate")
+
 @dataclass
 class ParsedResponse:
     """
@@ -0,0 +1,249 @@
+import os
+import time
+import asyncio
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, TypeVar
+from tenacity import AsyncRetrying, retry_if_exception, stop_after_attempt, stop_after_delay, wait_exponential_jitter
+from backboard.exceptions import BackboardAPIError, BackboardRateLimitError, BackboardServerError
+import tracing
+
+"""
+Deadlines, retries and hedged requests for Backboard calls.
+
+Every remote call on the turn path (LLMClient.post_prompt, NoteTaker.generate_notes and
+memory writes) goes through call_with_policy with a named RetryPolicy:
+- each attempt gets its own deadline (timeout)
+- retryable failures (429, 5xx, timeouts, connection errors) back off exponentially with jitter
+- calls that are not idempotent (add_message appends to the thread) are only retried on
+  429, which Backboard sends before accepting the request; a timeout or 5xx may come after
+  the message was stored, and a retry would post the patient's message twice
+- optionally, if an attempt is still running after hedge_after seconds (or the policy's
+  observed p95 latency), a second identical request is fired and the first to succeed wins
+
+Every attempt is recorded in `metrics` so latency percentiles and failure counts can be
+inspected or exported.
+
+Policies are configured per name from the environment, e.g. for "llm":
+    NEUROFLOW_LLM_TIMEOUT, NEUROFLOW_LLM_MAX_ATTEMPTS, NEUROFLOW_LLM_DEADLINE,
+    NEUROFLOW_LLM_HEDGE_AFTER (seconds, or "p95")
+"""
+
+T = TypeVar("T")
+
+# Transport failures the Backboard SDK reports without a status code
+_TRANSIENT_MESSAGES = ("Request timed out", "Connection error", "Request failed")
+
+METRICS_WINDOW = int(os.getenv("NEUROFLOW_METRICS_WINDOW", "500"))
+
+
+def is_retryable(error: BaseException, idempotent: bool = True) -> bool:
+    if not idempotent:
+        return isinstance(error, BackboardRateLimitError)
+    if isinstance(error, (asyncio.TimeoutError, BackboardRateLimitError, BackboardServerError)):
+        return True
+    if isinstance(error, BackboardAPIError) and error.status_code is None:
+        return str(error).startswith(_TRANSIENT_MESSAGES)
+    return False
+
+
+@dataclass
+class AttemptRecord:
+    policy: str
+    attempt: int
+    hedged: bool
+    latency: float
+    outcome: str  # "ok", "timeout", "cancelled" or the exception type name
+    timestamp: float = field(default_factory=time.time)
+
+
+class PolicyMetrics:
+    """
+    Rolling window of attempts per policy.
+    """
+
+    def __init__(self, window: int = METRICS_WINDOW):
+        self.window = window
+        self._records: Dict[str, Deque[AttemptRecord]] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def record(self, record: AttemptRecord):
+        self._records.setdefault(record.policy, deque(maxlen=self.window)).append(record)
+        counters = self._counters.setdefault(
+            record.policy, {"attempts": 0, "failures": 0, "retries": 0, "hedges": 0}
+        )
+        counters["attempts"] += 1
+        if record.outcome not in ("ok", "cancelled"):
+            counters["failures"] += 1
+        if record.attempt > 1 and not record.hedged:
+            counters["retries"] += 1
+        if record.hedged:
+            counters["hedges"] += 1
+
+    def records(self, policy: str) -> List[AttemptRecord]:
+        return list(self._records.get(policy, ()))
+
+    def percentile(self, policy: str, q: float, min_samples: int = 1) -> Optional[float]:
+        """
+        Latency percentile (0-100) of successful attempts, or None with too few samples.
+        """
+        latencies = sorted(r.latency for r in self._records.get(policy, ()) if r.outcome == "ok")
+        if len(latencies) < max(min_samples, 1):
+            return None
+        return tracing.percentile(latencies, q)
+
+    def summary(self) -> Dict[str, dict]:
+        return {
+            policy: {
+                **counters,
+                "p50": self.percentile(policy, 50),
+                "p95": self.percentile(policy, 95),
+            }
+            for policy, counters in self._counters.items()
+        }
+
+    def reset(self):
+        self._records.clear()
+        self._counters.clear()
+
+
+metrics = PolicyMetrics()
+
+
+def _env_float(name: str, default: Optional[float]) -> Optional[float]:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return float(value) if value.strip() else None
+
+
+@dataclass
+class RetryPolicy:
+    name: str
+    timeout: Optional[float] = 30.0  # per attempt
+    max_attempts: int = 3
+    deadline: Optional[float] = None  # across all attempts
+    backoff_initial: float = 0.5
+    backoff_max: float = 8.0
+    # False for calls that must not run twice; see is_retryable. Never hedged either
+    idempotent: bool = True
+    # Hedging duplicates the request, so only enable it where a duplicate is harmless
+    hedge_after: Optional[float] = None
+    hedge_percentile: Optional[float] = None
+    hedge_min_samples: int = 20
+
+    @classmethod
+    def from_env(cls, name: str, **defaults) -> "RetryPolicy":
+        prefix = f"NEUROFLOW_{name.upper()}_"
+        policy = cls(name=name, **defaults)
+        policy.timeout = _env_float(prefix + "TIMEOUT", policy.timeout)
+        policy.deadline = _env_float(prefix + "DEADLINE", policy.deadline)
+        policy.max_attempts = int(os.getenv(prefix + "MAX_ATTEMPTS", policy.max_attempts))
+
+        hedge = os.getenv(prefix + "HEDGE_AFTER")
+        if hedge is not None:
+            hedge = hedge.strip().lower()
+            if hedge.startswith("p"):
+                policy.hedge_after, policy.hedge_percentile = None, float(hedge[1:])
+            else:
+                policy.hedge_after, policy.hedge_percentile = (float(hedge) if hedge else None), None
+        return policy
+
+    def hedge_delay(self, stats: PolicyMetrics) -> Optional[float]:
+        if not self.idempotent:
+            return None
+        if self.hedge_after is not None:
+            return self.hedge_after
+        if self.hedge_percentile is not None:
+            return stats.percentile(self.name, self.hedge_percentile, self.hedge_min_samples)
+        return None
+
+
+async def _timed(policy: RetryPolicy, attempt: int, hedged: bool, call: Callable[[], Awaitable[T]]) -> T:
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        return await asyncio.wait_for(call(), policy.timeout)
+    except asyncio.CancelledError:
+        outcome = "cancelled"  # lost the race against a hedged request
+        raise
+    except asyncio.TimeoutError:
+        outcome = "timeout"
+        raise
+    except Exception as e:
+        outcome = type(e).__name__
+        raise
+    finally:
+        latency = time.perf_counter() - start
+        metrics.record(AttemptRecord(policy.name, attempt, hedged, latency, outcome))
+        tracing.incr("neuroflow_backboard_attempts_total", policy=policy.name, outcome=outcome)
+        tracing.observe("neuroflow_backboard_attempt_seconds", latency, policy=policy.name)
+        if attempt > 1 and not hedged:
+            tracing.incr("neuroflow_backboard_retries_total", policy=policy.name)
+        if hedged:
+            tracing.incr("neuroflow_backboard_hedges_total", policy=policy.name)
+
+
+async def _race(tasks: List[asyncio.Future]):
+    """
+    First successful result among tasks, cancelling the rest. Raises the last error if all fail.
+    """
+    pending = set(tasks)
+    error: Optional[BaseException] = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def _attempt(policy: RetryPolicy, attempt: int, call: Callable[[], Awaitable[T]]) -> T:
+    first = asyncio.ensure_future(_timed(policy, attempt, False, call))
+    hedge_delay = policy.hedge_delay(metrics)
+    if hedge_delay is None or (policy.timeout is not None and hedge_delay >= policy.timeout):
+        return await _race([first])
+
+    # Give the first request hedge_delay seconds on its own before sending a duplicate
+    try:
+        done, _ = await asyncio.wait({first}, timeout=hedge_delay)
+    except asyncio.CancelledError:
+        first.cancel()
+        raise
+    if done:
+        return first.result()
+    second = asyncio.ensure_future(_timed(policy, attempt, True, call))
+    return await _race([first, second])
+
+
+async def call_with_policy(policy: RetryPolicy, call: Callable[[], Awaitable[T]]) -> T:
+    """
+    Runs call() under the policy. call must create a fresh request each time it is invoked.
+    Non-retryable errors and the last retryable one are raised unchanged.
+    """
+    stop = stop_after_attempt(max(1, policy.max_attempts))
+    if policy.deadline is not None:
+        stop = stop | stop_after_delay(policy.deadline)
+
+    retrying = AsyncRetrying(
+        stop=stop,
+        wait=wait_exponential_jitter(
+            multiplier=policy.backoff_initial, max=policy.backoff_max, jitter=policy.backoff_initial
+        ),
+        retry=retry_if_exception(lambda error: is_retryable(error, policy.idempotent)),
+        reraise=True
+    )
+    async for attempt in retrying:
+        with attempt:
+            return await _attempt(policy, attempt.retry_state.attempt_number, call)
+
+
+# Both post with add_message, which appends to the thread on every call
+LLM_POLICY = RetryPolicy.from_env("llm", timeout=45.0, max_attempts=3, deadline=120.0, idempotent=False)
+NOTES_POLICY = RetryPolicy.from_env("notes", timeout=120.0, max_attempts=2, idempotent=False)
+MEMORY_POLICY = RetryPolicy.from_env("memory", timeout=15.0, max_attempts=4)
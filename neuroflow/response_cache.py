@@ -0,0 +1,147 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+import json_stream
+from prompt_schemas import REPLY_COMPLETE_FIELDS
+
+"""
+Local cache of LLM replies for deterministic turns.
+
+Many sessions open the same way (main.main sends a fixed bootstrap message, and patients
+tend to start with "hi"), and the first turn of a session carries no memory, history or
+previous parse, so its reply depends only on the prompt and the response plan. Those
+replies are served from here instead of costing a Backboard round-trip.
+
+Entries expire after a TTL and the least recently used ones are evicted past max_entries.
+A reply opts out of caching when it carries anything patient-specific (memory candidates,
+entities) or ends the session. Entries are mirrored to a small JSON file so a restarted
+process keeps them.
+"""
+
+CACHE_PATH = os.getenv("NEUROFLOW_RESPONSE_CACHE", ".neuroflow/response_cache.json")  # "" keeps it in memory
+CACHE_TTL = float(os.getenv("NEUROFLOW_RESPONSE_CACHE_TTL", str(24 * 3600)))  # seconds, 0 disables the cache
+CACHE_MAX_ENTRIES = int(os.getenv("NEUROFLOW_RESPONSE_CACHE_MAX", "256"))
+
+
+def normalize(text: str) -> str:
+    return " ".join((text or "").split()).casefold()
+
+
+def is_cacheable_reply(raw_reply: str) -> bool:
+    """
+    Per-entry opt-out: only generic replies may be reused for another patient.
+    """
+    try:
+        data = json_stream.parse_json_object(raw_reply or "", complete=REPLY_COMPLETE_FIELDS)
+    except json_stream.JSONExtractionError:
+        return False
+    if not isinstance(data, dict) or not isinstance(data.get("response"), str) or not data["response"].strip():
+        return False
+    candidates = data.get("memory_candidates")
+    if isinstance(candidates, dict) and any(candidates.get(kind) for kind in ("short_term", "long_term")):
+        return False
+    if data.get("entities") or str(data.get("terminate", "")).lower() == "true" or data.get("terminate") is True:
+        return False
+    return True
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        path: str = CACHE_PATH,
+        ttl: float = CACHE_TTL,
+        max_entries: int = CACHE_MAX_ENTRIES
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Optional["OrderedDict[str, Tuple[float, str]]"] = None  # key -> (expires_at, reply)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    @staticmethod
+    def key(prompt: str, plan: str = "") -> str:
+        return hashlib.sha256(f"{normalize(plan)}\n{normalize(prompt)}".encode("utf-8")).hexdigest()
+
+    def _load(self) -> "OrderedDict[str, Tuple[float, str]]":
+        if self._entries is None:
+            self._entries = OrderedDict()
+            if self.path:
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        stored: Dict[str, list] = json.load(f)
+                    now = time.time()
+                    for key, (expires_at, reply) in sorted(stored.items(), key=lambda item: item[1][0]):
+                        if expires_at > now:
+                            self._entries[key] = (expires_at, reply)
+                except FileNotFoundError:
+                    pass
+                except (json.JSONDecodeError, ValueError, TypeError):
+                    print(f"⚠️ Response cache at {self.path} is corrupt, starting fresh.")
+        return self._entries
+
+    def _save(self):
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({key: list(entry) for key, entry in self._entries.items()}, f)
+        os.replace(tmp_path, self.path)
+
+    def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entries = self._load()
+            entry = entries.get(key)
+            if entry is None or entry[0] <= time.time():
+                if entry is not None:
+                    del entries[key]
+                self.misses += 1
+                return None
+            entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, reply: str, ttl: Optional[float] = None) -> bool:
+        """
+        Stores reply unless it opts out (see is_cacheable_reply) or ttl is 0.
+        Returns whether it was stored.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        if not self.enabled or ttl <= 0 or not is_cacheable_reply(reply):
+            return False
+        with self._lock:
+            entries = self._load()
+            entries[key] = (time.time() + ttl, reply)
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+            self._save()
+        return True
+
+    def invalidate(self, key: str):
+        with self._lock:
+            if self._load().pop(key, None) is not None:
+                self._save()
+
+    def clear(self):
+        with self._lock:
+            self._entries = OrderedDict()
+            self._save()
+
+
+# Shared by the chat turns in parsing.py
+cache = ResponseCache()
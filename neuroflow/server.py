@@ -0,0 +1,229 @@
+import os
+import json
+import asyncio
+import secrets
+from contextlib import asynccontextmanager
+from dataclasses import asdict
+from typing import Dict, Optional
+from fastapi import Depends, FastAPI, Header, HTTPException, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+from dotenv import load_dotenv
+from backboard.exceptions import BackboardAPIError
+
+from main import NeuroFlowMain
+from parsing import LLMResponseError
+from memory import MemoryManager
+from llm import LLMClient
+from tools.notetaker import NoteTaker
+from tools import pdf_renderer
+from tools import note_archive
+import client_pool
+import tracing
+
+"""
+Long-running NeuroFlow service.
+
+One event loop hosts a single NeuroFlowMain for every intake session, so all sessions
+share the pooled Backboard connections, the assistant and the note queue. The Streamlit
+frontends are thin clients of this API (see frontend/server_client.py).
+
+Run from the neuroflow/ directory:
+    uvicorn server:app --host 127.0.0.1 --port 8000
+
+The archive routes (/notes) return clinical notes of every patient, so they require
+NEUROFLOW_CLINICIAN_TOKEN as a bearer token and are disabled while it is unset. Keep
+the server on localhost, or behind a TLS-terminating proxy if it must be reachable.
+"""
+
+load_dotenv()
+
+HOST = os.getenv("NEUROFLOW_HOST", "127.0.0.1")
+PORT = int(os.getenv("NEUROFLOW_PORT", "8000"))
+SHUTDOWN_NOTES_TIMEOUT = float(os.getenv("NEUROFLOW_SHUTDOWN_NOTES_TIMEOUT", "60"))
+CLINICIAN_TOKEN = os.getenv("NEUROFLOW_CLINICIAN_TOKEN", "")
+
+
+class TurnRequest(BaseModel):
+    patient_text: str
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    llm_client = LLMClient()
+    flow = NeuroFlowMain(
+        llm_client=llm_client,
+        memory_manager=MemoryManager(),
+        notetaker=NoteTaker()
+    )
+    await llm_client.init_assistant()
+
+    app.state.flow = flow
+    app.state.session_locks = {}
+    yield
+
+    # Give in-flight memory writes and notes a chance to land before tearing everything down
+    try:
+        await asyncio.wait_for(flow.drain(), SHUTDOWN_NOTES_TIMEOUT)
+    except asyncio.TimeoutError:
+        print("⚠️ Shutting down with clinical notes still pending.")
+    await flow.note_queue.close()
+    await asyncio.to_thread(flow.sessions.close)
+    await client_pool.close_client()
+    pdf_renderer.renderer.close()
+    tracing.tracer.close()
+
+
+app = FastAPI(title="NeuroFlow", lifespan=lifespan)
+
+
+def _session_lock(request: Request, thread_id: str) -> asyncio.Lock:
+    # A Backboard thread takes one message at a time, so turns of a session are serialized
+    locks: Dict[str, asyncio.Lock] = request.app.state.session_locks
+    return locks.setdefault(thread_id, asyncio.Lock())
+
+
+def require_clinician(authorization: Optional[str] = Header(default=None)):
+    # Guards routes that read across patients; unset token means they stay off
+    if not CLINICIAN_TOKEN:
+        raise HTTPException(status_code=503, detail="Note archive is disabled: set NEUROFLOW_CLINICIAN_TOKEN")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(token.encode(), CLINICIAN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Clinician token required", headers={"WWW-Authenticate": "Bearer"})
+
+
+def _drop_session_lock(request: Request, thread_id: str, lock: asyncio.Lock):
+    # Called once the session has ended, so the lock table only holds live sessions
+    locks: Dict[str, asyncio.Lock] = request.app.state.session_locks
+    if locks.get(thread_id) is lock and not lock.locked():
+        del locks[thread_id]
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Turn, stage and Backboard metrics in the Prometheus text format (NEUROFLOW_TRACING=1).
+    """
+    return PlainTextResponse(tracing.tracer.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@app.post("/sessions")
+async def create_session(request: Request):
+    flow: NeuroFlowMain = request.app.state.flow
+    thread_id = await flow.llm.create_thread()
+    return {"thread_id": str(thread_id)}
+
+
+@app.get("/sessions/{thread_id}")
+async def session(thread_id: str, request: Request):
+    """
+    The session's transcript, so a frontend (or a restarted one) can resume it.
+    """
+    flow: NeuroFlowMain = request.app.state.flow
+    state = await flow.sessions.get_async(thread_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Unknown or ended session")
+    return {"thread_id": thread_id, "transcript": state.transcript(), "escalated": state.draft.escalated}
+
+
+@app.post("/sessions/{thread_id}/turn")
+async def turn(thread_id: str, body: TurnRequest, request: Request):
+    flow: NeuroFlowMain = request.app.state.flow
+    lock = _session_lock(request, thread_id)
+    async with lock:
+        try:
+            result = await flow.handle_patient_message(thread_id, body.patient_text)
+        except BackboardAPIError as e:
+            raise HTTPException(status_code=502, detail=f"Backboard error: {e}")
+        except LLMResponseError as e:
+            raise HTTPException(status_code=502, detail=f"Could not parse LLM response: {e}")
+    if result["terminate"]:
+        _drop_session_lock(request, thread_id, lock)
+    return result
+
+
+@app.post("/sessions/{thread_id}/stream")
+async def stream(thread_id: str, body: TurnRequest, request: Request):
+    """
+    Streams the turn as newline-delimited JSON events (see NeuroFlowMain.stream_patient_message).
+    """
+    flow: NeuroFlowMain = request.app.state.flow
+    lock = _session_lock(request, thread_id)
+
+    async def events():
+        terminated = False
+        async with lock:
+            try:
+                async for event in flow.stream_patient_message(thread_id, body.patient_text):
+                    terminated = event.get("type") == "final" and event["terminate"]
+                    yield json.dumps(event) + "\n"
+            except Exception as e:
+                # Headers are already sent, so report the failure in-band
+                yield json.dumps({"type": "error", "detail": f"{type(e).__name__}: {e}"}) + "\n"
+        if terminated:
+            _drop_session_lock(request, thread_id, lock)
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+@app.post("/sessions/{thread_id}/end")
+async def end_session(thread_id: str, request: Request):
+    """
+    Manually ends a session and queues its clinical notes.
+    Waits for a turn still running on the session, so the note sees the whole turn.
+    """
+    flow: NeuroFlowMain = request.app.state.flow
+    lock = _session_lock(request, thread_id)
+    async with lock:
+        job = await flow.end_session(thread_id)
+    _drop_session_lock(request, thread_id, lock)
+    return {"thread_id": thread_id, "notes_status": job.status}
+
+
+@app.get("/sessions/{thread_id}/notes")
+async def notes(thread_id: str, request: Request):
+    flow: NeuroFlowMain = request.app.state.flow
+    job = flow.note_queue.status(thread_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="No notes requested for this session")
+    return job
+
+
+@app.get("/notes", dependencies=[Depends(require_clinician)])
+async def list_notes(
+    patient_id: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    risk_factor: Optional[str] = None,
+    diagnosis: Optional[str] = None,
+    limit: int = note_archive.PAGE_SIZE,
+    cursor: Optional[str] = None
+):
+    """
+    Archived SOAP notes, newest first. Pass next_cursor back as cursor for the next page.
+    """
+    try:
+        page = await asyncio.to_thread(
+            note_archive.archive.query, patient_id, since, until, risk_factor, diagnosis, limit, cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Bad query: {e}")
+    return {"items": [asdict(item) for item in page.items], "next_cursor": page.next_cursor}
+
+
+@app.get("/notes/{note_id}", dependencies=[Depends(require_clinician)])
+async def get_note(note_id: int):
+    note = await asyncio.to_thread(note_archive.archive.get, note_id)
+    if note is None:
+        raise HTTPException(status_code=404, detail="No such note")
+    return note
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host=HOST, port=PORT)
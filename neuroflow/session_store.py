@@ -0,0 +1,344 @@
+import os
+import json
+import time
+import asyncio
+import uuid
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+import tracing
+from context_window import DEFAULT_BUDGET, ContextBudget, ConversationWindow
+from prompt_schemas import ParsedResponse
+from tools.soap_draft import SOAPDraft
+
+"""
+Per-session state of NeuroFlowMain, behind a pluggable store.
+
+A session's state is everything a turn needs besides Backboard: the conversation window
+(and with it the Backboard thread currently behind the session), the parsed turns (the
+transcript with intent, emotion and memory candidates), the response plan last used, the
+rolling SOAP draft with its risk flags, and whether the thread already holds the static
+instructions. Keeping it in a store instead of on NeuroFlowMain lets another worker
+process pick up a session, and a restarted worker resume it.
+
+- MemorySessionStore: in-process LRU, the default; nothing survives a restart
+- SQLiteSessionStore: one row of JSON per session in a WAL-mode database shared by the
+  workers of one host. Writes are batched: put() only snapshots the state, and a
+  background thread writes every session changed in the last FLUSH_INTERVAL seconds in a
+  single transaction. Reads check the row's writer and reuse the cached state when this
+  store wrote it last, so only a session that moved between workers is deserialized.
+  That check is a SELECT, so NeuroFlowMain reads through get_async(), which runs it in a
+  worker thread instead of on the event loop. Rows not written for SESSION_TTL seconds
+  (a patient who closed the tab without ending the chat) are deleted by the flusher.
+
+Batched writes mean a crash can lose up to FLUSH_INTERVAL of state, and two workers
+serving the same session at the same time overwrite each other (last write wins), so
+route a session's turns to one worker at a time (as server.py already serializes them
+per process) and let the store handle failover and restarts.
+"""
+
+STORE_BACKEND = os.getenv("NEUROFLOW_SESSION_STORE", "memory")  # memory | sqlite
+STORE_PATH = os.getenv("NEUROFLOW_SESSION_DB", ".neuroflow/sessions.db")
+MAX_SESSIONS = int(os.getenv("NEUROFLOW_SESSION_MAX", "1024"))  # kept in memory (LRU)
+FLUSH_INTERVAL = float(os.getenv("NEUROFLOW_SESSION_FLUSH_SECONDS", "0.05"))
+SESSION_TTL = float(os.getenv("NEUROFLOW_SESSION_TTL_SECONDS", str(24 * 3600)))  # 0 keeps sessions forever
+_EXPIRE_INTERVAL = 60.0  # seconds between sweeps for expired sessions
+
+
+@dataclass
+class SessionState:
+    session_id: str
+    window: ConversationWindow
+    draft: SOAPDraft
+    turns: List[ParsedResponse] = field(default_factory=list)
+    plan: str = ""  # response plan of the latest turn
+    primed: bool = False  # the window's current thread already holds the static instructions
+
+    @classmethod
+    def new(cls, session_id: str, budget: ContextBudget) -> "SessionState":
+        session_id = str(session_id)
+        return cls(session_id, ConversationWindow(session_id, session_id, budget), SOAPDraft(session_id))
+
+    @property
+    def thread_id(self) -> str:
+        return self.window.thread_id
+
+    @property
+    def last_parsed(self) -> Optional[ParsedResponse]:
+        return self.turns[-1] if self.turns else None
+
+    def transcript(self) -> List[Dict[str, str]]:
+        return [{"patient": turn.input_text, "response": turn.response} for turn in self.turns]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "session_id": self.session_id,
+            "window": self.window.to_dict(),
+            "draft": self.draft.to_dict(),
+            "turns": [vars(turn) for turn in self.turns],
+            "plan": self.plan,
+            "primed": self.primed
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], budget: ContextBudget) -> "SessionState":
+        return cls(
+            session_id=data["session_id"],
+            window=ConversationWindow.from_dict(data["window"], budget),
+            draft=SOAPDraft.from_dict(data["draft"]),
+            turns=[ParsedResponse(**turn) for turn in data.get("turns", [])],
+            plan=data.get("plan", ""),
+            primed=bool(data.get("primed", False))
+        )
+
+
+class SessionStore(ABC):
+    """
+    get() returns None for an unknown session; put() must be called after every change
+    the store should keep (the SQLite store snapshots the state at that moment).
+    """
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[SessionState]:
+        ...
+
+    @abstractmethod
+    def put(self, state: SessionState):
+        ...
+
+    @abstractmethod
+    def delete(self, session_id: str):
+        ...
+
+    async def get_async(self, session_id: str) -> Optional[SessionState]:
+        """
+        get() for callers on the event loop. Stores that read from disk override this.
+        """
+        return self.get(session_id)
+
+    def flush(self):
+        """
+        Writes anything still pending. A no-op for stores without write-behind.
+        """
+
+    def close(self):
+        self.flush()
+
+
+class MemorySessionStore(SessionStore):
+    def __init__(self, max_sessions: int = MAX_SESSIONS):
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, SessionState]" = OrderedDict()
+
+    def get(self, session_id: str) -> Optional[SessionState]:
+        state = self._sessions.get(str(session_id))
+        if state is not None:
+            self._sessions.move_to_end(state.session_id)
+        return state
+
+    def put(self, state: SessionState):
+        self._sessions[state.session_id] = state
+        self._sessions.move_to_end(state.session_id)
+        while len(self._sessions) > self.max_sessions:
+            evicted, _ = self._sessions.popitem(last=False)
+            tracing.incr("neuroflow_session_evictions_total")
+            print(f"⚠️ Session store full, dropped session {evicted}")
+
+    def delete(self, session_id: str):
+        self._sessions.pop(str(session_id), None)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    writer TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    data TEXT NOT NULL
+)
+"""
+_UPDATED_INDEX = "CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at)"
+
+
+class SQLiteSessionStore(SessionStore):
+    def __init__(
+        self,
+        path: str = STORE_PATH,
+        budget: ContextBudget = DEFAULT_BUDGET,
+        flush_interval: float = FLUSH_INTERVAL,
+        max_cached: int = MAX_SESSIONS,
+        ttl: float = SESSION_TTL
+    ):
+        self.path = path
+        self.budget = budget
+        self.flush_interval = flush_interval
+        self.max_cached = max_cached
+        self.ttl = ttl
+        self._next_expiry = 0.0
+        self.writer = uuid.uuid4().hex  # tags the rows this store wrote last
+        self._cache: "OrderedDict[str, SessionState]" = OrderedDict()
+        self._pending: Dict[str, Optional[str]] = {}  # session_id -> JSON snapshot, None deletes
+        self._lock = threading.Lock()  # guards _cache and _pending
+        self._write_lock = threading.Lock()  # one batch at a time
+        self._local = threading.local()  # sqlite3 connections are per thread
+        self._wake = threading.Event()
+        self._closed = False
+        self._flusher: Optional[threading.Thread] = None
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection().execute(_SCHEMA)
+        self._connection().execute(_UPDATED_INDEX)
+        self.expire()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")  # durable at checkpoints; a crash loses at most the last commits
+            self._local.conn = conn
+        return conn
+
+    def _cache_put(self, state: SessionState):
+        self._cache[state.session_id] = state
+        self._cache.move_to_end(state.session_id)
+        while len(self._cache) > self.max_cached:
+            self._cache.popitem(last=False)
+
+    def get(self, session_id: str) -> Optional[SessionState]:
+        session_id = str(session_id)
+        with self._lock:
+            cached = self._cache.get(session_id)
+            pending = self._pending.get(session_id, "")
+        if pending is None:
+            return None  # deleted, not flushed yet
+        if pending:
+            # Written by this process and not flushed yet: newer than the database
+            if cached is not None:
+                return cached
+            data, source = pending, "snapshot"
+        else:
+            row = self._connection().execute(
+                "SELECT writer, data FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            writer, data = row
+            source = "db"
+            if writer == self.writer and cached is not None:
+                tracing.incr("neuroflow_session_loads_total", source="cache")
+                return cached
+        try:
+            state = SessionState.from_dict(json.loads(data), self.budget)
+        except (json.JSONDecodeError, KeyError, TypeError) as e:
+            print(f"⚠️ Session {session_id} in {self.path} is corrupt, starting fresh: {type(e).__name__}: {e}")
+            return None
+        tracing.incr("neuroflow_session_loads_total", source=source)
+        with self._lock:
+            self._cache_put(state)
+        return state
+
+    async def get_async(self, session_id: str) -> Optional[SessionState]:
+        return await asyncio.to_thread(self.get, session_id)
+
+    def put(self, state: SessionState):
+        snapshot = json.dumps(state.to_dict())
+        with self._lock:
+            self._cache_put(state)
+            self._pending[state.session_id] = snapshot
+        self._schedule()
+
+    def delete(self, session_id: str):
+        session_id = str(session_id)
+        with self._lock:
+            self._cache.pop(session_id, None)
+            self._pending[session_id] = None
+        self._schedule()
+
+    def _schedule(self):
+        if self._flusher is None or not self._flusher.is_alive():
+            self._flusher = threading.Thread(target=self._run, name="session-store-flush", daemon=True)
+            self._flusher.start()
+        self._wake.set()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait()
+            self._wake.clear()
+            # Let the other turns of this interval join the batch
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+                if time.time() >= self._next_expiry:
+                    self.expire()
+            except sqlite3.Error as e:
+                print(f"⚠️ Session store flush failed, retrying: {type(e).__name__}: {e}")
+                time.sleep(1.0)
+                self._wake.set()
+
+    def flush(self):
+        with self._write_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return
+            now = time.time()
+            upserts = [(session_id, self.writer, now, data) for session_id, data in batch.items() if data is not None]
+            deletes = [(session_id,) for session_id, data in batch.items() if data is None]
+            conn = self._connection()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.executemany(
+                    "INSERT INTO sessions (session_id, writer, updated_at, data) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(session_id) DO UPDATE SET writer = excluded.writer, "
+                    "updated_at = excluded.updated_at, data = excluded.data",
+                    upserts
+                )
+                conn.executemany("DELETE FROM sessions WHERE session_id = ?", deletes)
+                conn.execute("COMMIT")
+            except sqlite3.Error:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                with self._lock:
+                    # Put the batch back unless a newer snapshot arrived meanwhile
+                    for session_id, data in batch.items():
+                        self._pending.setdefault(session_id, data)
+                raise
+        tracing.observe("neuroflow_session_flush_batch", len(batch), (1, 2, 5, 10, 25, 50, 100, 250))
+
+    def expire(self) -> int:
+        """
+        Deletes sessions that were not written for ttl seconds; returns how many.
+        """
+        self._next_expiry = time.time() + _EXPIRE_INTERVAL
+        if not self.ttl:
+            return 0
+        with self._write_lock:
+            expired = self._connection().execute(
+                "DELETE FROM sessions WHERE updated_at < ?", (time.time() - self.ttl,)
+            ).rowcount
+        if expired:
+            tracing.incr("neuroflow_session_expired_total", expired)
+        return expired
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        if self._flusher is not None:
+            self._flusher.join(timeout=self.flush_interval + 5.0)
+        self.flush()
+
+
+def create_store(budget: ContextBudget = DEFAULT_BUDGET, backend: str = STORE_BACKEND) -> SessionStore:
+    if backend == "sqlite":
+        return SQLiteSessionStore(budget=budget)
+    if backend != "memory":
+        raise ValueError(f"Unknown session store backend {backend!r} (expected memory or sqlite)")
+    return MemorySessionStore()
@@ -0,0 +1,65 @@
+import asyncio
+import pytest
+
+import client_pool
+from assistant_registry import AssistantRegistry
+from bench.fake_backboard import DEFAULT_REPLIES, FakeBackboardClient
+from llm import LLMClient
+from main import NeuroFlowMain
+from memory import MemoryManager
+from memory_store import MemoryStore
+from response_cache import ResponseCache
+from tools.note_queue import NoteJobQueue
+from tools.notetaker import NoteTaker
+
+GOODBYE = {**DEFAULT_REPLIES[0], "response": "Take care, goodbye.", "terminate": True}
+
+
+class BrokenMemory(MemoryManager):
+    """
+    Memory whose remote assistant (or local index) is unavailable.
+    """
+
+    def __init__(self, failing: str, **kwargs):
+        super().__init__(**kwargs)
+        self.failing = failing
+
+    async def init_assistant(self):
+        if self.failing == "init_assistant":
+            raise RuntimeError("memory assistant unavailable")
+        await super().init_assistant()
+
+    async def schedule_write(self, thread_id: str, memory_candidates: dict):
+        if self.failing == "schedule_write":
+            raise OSError("memory store is read-only")
+        return await super().schedule_write(thread_id, memory_candidates)
+
+
+@pytest.mark.parametrize("failing", ["init_assistant", "schedule_write"])
+def test_failed_memory_write_still_ends_the_session(failing, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # note PDFs and archive land in clinical_notes/
+
+    async def scenario():
+        fake = FakeBackboardClient(replies=[GOODBYE])
+        client_pool.set_client_factory(lambda: fake)
+        registry = AssistantRegistry(path=str(tmp_path / "assistants.json"))
+        notetaker = NoteTaker()
+        flow = NeuroFlowMain(
+            llm_client=LLMClient(registry=registry),
+            memory_manager=BrokenMemory(failing, registry=registry, store=MemoryStore(path=None)),
+            notetaker=notetaker,
+            note_queue=NoteJobQueue(notetaker, jobs_dir=str(tmp_path / "jobs")),
+            response_cache=ResponseCache(path="")
+        )
+        try:
+            thread_id = await flow.llm.create_thread()
+            reply = await flow.handle_patient_message(thread_id, "That's all for today, thanks.")
+            assert reply["terminate"] is True
+            await flow.drain()
+            assert flow.note_queue.status(thread_id) is not None
+            assert flow.sessions.get(thread_id) is None
+        finally:
+            await flow.note_queue.close()
+            await client_pool.close_client()
+
+    asyncio.run(scenario())
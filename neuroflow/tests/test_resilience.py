@@ -0,0 +1,149 @@
+import asyncio
+import pytest
+from backboard.exceptions import BackboardRateLimitError, BackboardServerError, BackboardValidationError
+
+import resilience
+from resilience import RetryPolicy, call_with_policy
+
+
+class StubCall:
+    """
+    Stands in for a Backboard request: each call plays the next scripted step,
+    sleeping `delay` seconds and then raising `error` or returning `result`.
+    """
+
+    def __init__(self, *steps):
+        self.steps = list(steps)
+        self.calls = 0
+        self.cancelled = 0
+
+    async def __call__(self):
+        delay, outcome = self.steps[min(self.calls, len(self.steps) - 1)]
+        self.calls += 1
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+
+def policy(**overrides) -> RetryPolicy:
+    settings = dict(name="test", timeout=1.0, max_attempts=3, backoff_initial=0.001, backoff_max=0.002)
+    settings.update(overrides)
+    return RetryPolicy(**settings)
+
+
+def server_error() -> BackboardServerError:
+    return BackboardServerError("Service unavailable", status_code=503)
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    resilience.metrics.reset()
+    yield
+    resilience.metrics.reset()
+
+
+def test_retries_a_503_and_returns_the_next_result():
+    stub = StubCall((0, server_error()), (0, "ok"))
+
+    assert asyncio.run(call_with_policy(policy(), stub)) == "ok"
+    assert stub.calls == 2
+    counters = resilience.metrics.summary()["test"]
+    assert counters["attempts"] == 2
+    assert counters["failures"] == 1
+    assert counters["retries"] == 1
+    assert [r.outcome for r in resilience.metrics.records("test")] == ["BackboardServerError", "ok"]
+
+
+def test_raises_the_last_503_once_attempts_run_out():
+    stub = StubCall((0, server_error()))
+
+    with pytest.raises(BackboardServerError):
+        asyncio.run(call_with_policy(policy(max_attempts=2), stub))
+    assert stub.calls == 2
+    assert resilience.metrics.summary()["test"]["failures"] == 2
+
+
+def test_does_not_retry_a_client_error():
+    stub = StubCall((0, BackboardValidationError("Bad request", status_code=400)))
+
+    with pytest.raises(BackboardValidationError):
+        asyncio.run(call_with_policy(policy(), stub))
+    assert stub.calls == 1
+    assert resilience.metrics.summary()["test"]["retries"] == 0
+
+
+def test_times_out_a_slow_attempt_and_retries_it():
+    stub = StubCall((1.0, "too late"), (0, "ok"))
+
+    assert asyncio.run(call_with_policy(policy(timeout=0.05), stub)) == "ok"
+    assert stub.calls == 2
+    assert stub.cancelled == 1
+    assert [r.outcome for r in resilience.metrics.records("test")] == ["timeout", "ok"]
+
+
+def test_raises_timeout_when_every_attempt_is_slow():
+    stub = StubCall((1.0, "too late"))
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(call_with_policy(policy(timeout=0.02, max_attempts=2), stub))
+    assert stub.calls == 2
+    assert resilience.metrics.summary()["test"]["failures"] == 2
+
+
+def test_non_idempotent_call_is_not_retried_after_a_timeout():
+    # The server may already have stored the message; a retry would post it twice
+    stub = StubCall((1.0, "too late"), (0, "ok"))
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(call_with_policy(policy(timeout=0.05, idempotent=False), stub))
+    assert stub.calls == 1
+
+
+def test_non_idempotent_call_is_retried_after_a_429():
+    stub = StubCall((0, BackboardRateLimitError("Too many requests", status_code=429)), (0, "ok"))
+
+    assert asyncio.run(call_with_policy(policy(idempotent=False, hedge_after=0.01), stub)) == "ok"
+    assert stub.calls == 2
+    assert resilience.metrics.summary()["test"]["hedges"] == 0
+
+
+def test_hedges_a_slow_attempt_and_cancels_the_loser():
+    stub = StubCall((1.0, "first"), (0.01, "hedge"))
+
+    async def run():
+        result = await call_with_policy(policy(hedge_after=0.05), stub)
+        await asyncio.sleep(0.01)  # let the cancelled loser record its attempt
+        return result
+
+    assert asyncio.run(run()) == "hedge"
+    assert stub.calls == 2
+    assert stub.cancelled == 1
+    records = resilience.metrics.records("test")
+    assert sorted((r.hedged, r.outcome) for r in records) == [(False, "cancelled"), (True, "ok")]
+    counters = resilience.metrics.summary()["test"]
+    assert counters["hedges"] == 1
+    assert counters["retries"] == 0
+    assert counters["failures"] == 0
+
+
+def test_does_not_hedge_an_attempt_that_finishes_in_time():
+    stub = StubCall((0.01, "ok"))
+
+    assert asyncio.run(call_with_policy(policy(hedge_after=0.5), stub)) == "ok"
+    assert stub.calls == 1
+    assert resilience.metrics.summary()["test"]["hedges"] == 0
+
+
+def test_percentile_hedge_waits_for_enough_samples():
+    hedged = policy(hedge_percentile=95, hedge_min_samples=5)
+    assert hedged.hedge_delay(resilience.metrics) is None
+
+    for latency in (0.1, 0.2, 0.3, 0.4, 0.5):
+        resilience.metrics.record(resilience.AttemptRecord("test", 1, False, latency, "ok"))
+    assert hedged.hedge_delay(resilience.metrics) == 0.5
+    assert resilience.metrics.percentile("test", 50) == 0.3
@@ -0,0 +1,48 @@
+import pytest
+
+from tools import risk_screener
+
+
+def categories(text: str):
+    return risk_screener.screen(text).categories
+
+
+@pytest.mark.parametrize("text", [
+    "I can't stop thinking about suicide",
+    "I cannot stop thinking about suicide",
+    "I can't get rid of thoughts of suicide",
+    "I can't help thinking about suicide",
+])
+def test_compulsion_is_not_a_negation(text):
+    assert categories(text) == ["suicidal_ideation"]
+
+
+@pytest.mark.parametrize("text", ["I'm not suicidal", "I would never hurt myself", "I don't want to kill myself"])
+def test_negated_disclosure_is_ignored(text):
+    assert categories(text) == []
+
+
+@pytest.mark.parametrize("text", [
+    "Last year I tried to kill myself",
+    "I almost killed myself in March",
+    "There were nights I wanted to die",
+])
+def test_past_attempts_and_ideation_are_flagged(text):
+    screening = risk_screener.screen(text)
+    assert screening.crisis
+    assert screening.categories == ["suicidal_ideation"]
+
+
+@pytest.mark.parametrize("text", ["I ran 5 kms this morning", "We walked a few kms to the lake"])
+def test_kms_after_a_distance_is_not_flagged(text):
+    assert categories(text) == []
+
+
+def test_kms_on_its_own_is_flagged():
+    assert categories("honestly i just want to kms") == ["suicidal_ideation"]
+
+
+def test_crisis_about_someone_else_is_a_concern():
+    screening = risk_screener.screen("My brother attempted suicide last year")
+    assert not screening.crisis
+    assert screening.categories == [risk_screener.THIRD_PARTY]
@@ -0,0 +1,30 @@
+import asyncio
+import time
+
+from context_window import DEFAULT_BUDGET
+from session_store import SessionState, SQLiteSessionStore
+
+
+def test_sqlite_store_expires_abandoned_sessions(tmp_path):
+    store = SQLiteSessionStore(path=str(tmp_path / "sessions.db"), ttl=0.05)
+    try:
+        store.put(SessionState.new("abandoned", DEFAULT_BUDGET))
+        store.flush()
+        assert asyncio.run(store.get_async("abandoned")) is not None
+
+        time.sleep(0.1)
+        assert store.expire() == 1
+        assert asyncio.run(store.get_async("abandoned")) is None
+    finally:
+        store.close()
+
+
+def test_sqlite_store_keeps_sessions_without_a_ttl(tmp_path):
+    store = SQLiteSessionStore(path=str(tmp_path / "sessions.db"), ttl=0)
+    try:
+        store.put(SessionState.new("live", DEFAULT_BUDGET))
+        store.flush()
+        assert store.expire() == 0
+        assert store.get("live") is not None
+    finally:
+        store.close()
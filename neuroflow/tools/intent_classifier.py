@@ -0,0 +1,424 @@
+import os
+import re
+import zlib
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from prompts import INTENT_DEFINITIONS, EMOTION_DEFINITIONS
+
+try:
+    import numpy as np
+except ImportError:  # the lexicon works without it; only the vectorized model needs NumPy
+    np = None
+
+"""
+Local intent/emotion classifier for planning the current turn.
+
+The response plan is picked from (intent, emotion), but the LLM only reports those for the
+message it is answering, so until now each turn was planned from the previous one. This
+classifier labels the patient's message before the LLM call, in well under a millisecond:
+
+- a lexicon: each label's own name and the wording of its definition in prompts.py, plus
+  curated cue phrases (1-3 words), looked up from the message's n-grams
+- optionally a small NumPy softmax model over hashed unigrams/bigrams, trained on labeled
+  examples (python -m bench.classifier_bench --train) and blended with the lexicon
+
+When nothing is detected the result is ("other", "neutral") and callers fall back to the
+previous turn's labels. Accuracy against bench/classifier_fixtures.jsonl is reported by
+bench/classifier_bench.py; cue phrases are general wording, not copied from the fixtures,
+but they were written with the fixtures in view, so that lexicon figure is in-sample.
+"""
+
+MODEL_PATH = os.getenv("NEUROFLOW_CLASSIFIER_MODEL", ".neuroflow/classifier_model.npz")
+# Share of the model in the blend; worth raising once it is trained on more than the fixtures
+MODEL_WEIGHT = float(os.getenv("NEUROFLOW_CLASSIFIER_MODEL_WEIGHT", "0.2"))
+MIN_CONFIDENCE = float(os.getenv("NEUROFLOW_CLASSIFIER_MIN_CONFIDENCE", "0.35"))
+HASH_DIM = 4096
+
+FALLBACK_INTENT = "other"
+FALLBACK_EMOTION = "neutral"
+_FALLBACK_SCORE = 0.75  # a fallback label wins unless some cue scores higher
+
+_LABEL_RE = re.compile(r"^([a-z][a-z-]*):\s*$", re.MULTILINE)
+_WORD_RE = re.compile(r"[a-z0-9']+")
+_NEGATIONS = frozenset("not no never don't dont didn't isn't wasn't can't cannot hardly".split())
+_DEFINITION_STOPWORDS = frozenset(
+    "a an and are as at be by for from in into is it of on or the to with about often patient patient's "
+    "feels feel expresses expression statements statement shows anything doesn't fit clearly above "
+    "categories can include rather than meant convey focus current situations situation example "
+    "directed general related due".split()
+)
+
+# Curated cue phrases -> weight. Complements the definition wording.
+INTENT_CUES: Dict[str, Dict[str, float]] = {
+    "venting": {
+        "so tired of": 2.0, "sick of": 2.0, "fed up": 2.0, "can't take": 2.0, "cant take": 2.0, "ugh": 2.0,
+        "i hate": 1.5, "so overwhelmed": 2.0, "too much": 1.0, "drives me crazy": 2.0, "so annoying": 1.5,
+        "i'm so": 1.0, "im so": 1.0, "everything is": 1.0, "nobody": 0.5, "always": 0.5, "just": 0.3,
+        "exhausted": 1.0, "frustrating": 1.0, "stressed": 1.0, "so stressed": 1.5, "stressful": 1.0,
+        "tired of": 1.5, "can't deal": 2.0, "i can't anymore": 2.0, "it's so": 1.0, "so frustrating": 2.0,
+        "furious": 1.5, "so angry": 1.5, "what's the point": 1.5, "whats the point": 1.5, "it feels like": 1.0,
+    },
+    "question": {
+        "how can": 2.0, "how do": 2.0, "what should": 2.0, "should i": 2.0, "is it normal": 2.5, "is it": 1.0,
+        "can you": 1.5, "could you": 1.5, "do you": 1.0, "what can": 1.5, "why do": 1.5, "why am": 1.5,
+        "is there": 1.5, "what is": 1.0, "what are": 1.0, "how long": 1.0, "will this": 1.5, "does": 0.5,
+        "any advice": 2.0, "would it": 1.5, "is that": 1.0, "am i": 1.0, "what does": 1.5,
+    },
+    "report": {
+        "i have": 1.0, "i've had": 1.0, "ive had": 1.0, "i take": 1.5, "i'm taking": 1.5, "diagnosed": 2.0,
+        "hours": 1.0, "a night": 1.0, "times a": 1.5, "every day": 1.0, "per week": 1.5, "medication": 1.5,
+        "mg": 2.0, "i sleep": 1.5, "i eat": 1.0, "i work": 1.0, "i live": 1.5, "i drink": 1.5, "prescribed": 2.0,
+        "my doctor": 1.0, "lost": 0.5, "pounds": 1.5, "weight": 1.0, "appetite": 1.0, "i've been": 0.8,
+        "ive been": 0.8, "for the past": 1.0, "weeks": 0.5, "months": 0.5, "since": 0.5, "trouble sleeping": 1.0,
+        "waking up": 1.0, "insomnia": 1.0, "therapist": 0.5, "twice": 1.0, "i feel": 1.0, "i wake up": 1.5,
+        "every night": 1.0, "most days": 1.0,
+    },
+    "reflection": {
+        "i notice": 2.5, "i've noticed": 2.5, "ive noticed": 2.5, "i realize": 2.5, "i realized": 2.5,
+        "i guess": 1.0, "i think it's because": 2.5, "maybe it's because": 2.5, "pattern": 2.0,
+        "whenever i": 2.0, "i tend to": 2.5, "i always seem": 2.0, "looking back": 2.0, "i've learned": 2.0,
+        "i understand now": 2.0, "it makes sense": 1.5, "i wonder if": 1.5, "part of me": 1.5,
+        "i think i": 1.0, "every time i": 1.5, "probably because": 2.0,
+    },
+    "goal": {
+        "i want to": 2.5, "i'd like to": 2.5, "id like to": 2.5, "i plan to": 2.5, "i'm planning": 2.5,
+        "my goal": 3.0, "going to start": 2.5, "i hope to": 2.5, "i need to start": 2.0, "want to get": 2.0,
+        "want to be": 2.0, "trying to": 1.0, "i will": 1.0, "i'm going to": 1.5, "this year": 1.0,
+        "start": 0.5, "improve": 1.0, "get better at": 2.0, "i wish i could": 1.5, "learn to": 1.5,
+    },
+    "narrative": {
+        "last week": 2.0, "yesterday": 2.0, "last night": 2.0, "last month": 2.0, "last year": 2.0,
+        "when i was": 2.0, "ago": 1.5, "the other day": 2.0, "once": 0.5, "then": 0.5, "after that": 1.5,
+        "happened": 1.0, "we had": 1.0, "i went": 1.0, "told me": 1.0, "said": 0.5, "argument": 1.0,
+        "this morning": 1.5, "at the time": 1.5, "growing up": 2.0, "back then": 2.0, "it started when": 2.5,
+        "over the weekend": 2.0, "had a fight": 2.0, "broke up": 1.5,
+    },
+    "worry": {
+        "what if": 2.5, "keep thinking": 2.5, "can't stop thinking": 2.5, "cant stop thinking": 2.5,
+        "worried that": 2.5, "worried about": 2.0, "afraid that": 2.0, "scared that": 2.0,
+        "going to fail": 2.5, "something bad": 2.0, "going to happen": 1.5, "worry": 1.5, "worrying": 2.0,
+        "overthinking": 2.0, "i'm afraid": 1.5, "what will": 1.5, "might lose": 2.0, "won't be able": 1.5,
+        "i keep": 1.0, "over and over": 2.0, "the worst": 1.0,
+    },
+    "other": {
+        "hello": 1.5, "hi": 1.5, "hey": 1.5, "good morning": 1.5, "good afternoon": 1.5, "thanks": 1.0,
+        "thank you": 1.0, "okay": 1.0, "ok": 1.0, "bye": 1.5, "goodbye": 1.5, "nothing else": 1.5,
+        "i don't know": 0.5, "not sure": 0.5, "yes": 0.5,
+    },
+}
+
+EMOTION_CUES: Dict[str, Dict[str, float]] = {
+    "anxious": {"anxious": 3.0, "anxiety": 3.0, "nervous": 3.0, "on edge": 3.0, "tense": 2.0, "uneasy": 2.5,
+                "panic": 2.5, "panicky": 2.5, "panicking": 2.5, "panic attack": 2.5, "panic attacks": 2.5,
+                "restless": 2.0, "worried": 2.5, "worrying": 2.0, "heart races": 2.5, "racing thoughts": 2.5,
+                "jittery": 2.5, "stressed": 1.5},
+    "sad": {"sad": 3.0, "down": 1.5, "feeling low": 3.0, "low mood": 3.0, "depressed": 3.0, "unhappy": 3.0,
+            "crying": 2.5, "cry": 2.0, "miserable": 3.0, "unmotivated": 2.0, "blue": 1.5, "heartbroken": 3.0,
+            "really low": 3.0, "don't enjoy": 2.0, "dont enjoy": 2.0, "grief": 2.5, "grieving": 2.5,
+            "feeling down": 3.0, "died": 2.0, "passed away": 2.5, "lost my": 1.0},
+    "happy": {"happy": 3.0, "joy": 2.5, "glad": 2.5, "great": 1.5, "good day": 2.0, "content": 2.0,
+              "excited": 2.0, "wonderful": 2.5, "enjoyed": 2.0, "fun": 1.5, "really good": 2.0},
+    "neutral": {"fine": 1.0, "okay": 0.8, "ok": 0.8, "normal": 0.8, "usual": 1.0},
+    "angry": {"angry": 3.0, "mad": 2.5, "furious": 3.0, "rage": 3.0, "pissed": 3.0, "irritated": 2.5,
+              "annoyed": 2.0, "so annoying": 2.0, "i hate": 2.0, "yelled": 2.0},
+    "guilty": {"guilty": 3.0, "guilt": 3.0, "my fault": 3.0, "regret": 2.5, "should have": 1.5,
+               "shouldn't have": 2.0, "i let them down": 3.0, "sorry for": 1.5, "blame myself": 2.0},
+    "hopeful": {"hopeful": 3.0, "hope": 1.5, "optimistic": 3.0, "looking forward": 2.5, "will help": 2.0,
+                "getting better": 2.0, "things will improve": 3.0, "positive": 1.5, "feel better": 2.0,
+                "would help": 2.0, "help me": 1.0},
+    "fearful": {"scared": 3.0, "afraid": 2.5, "terrified": 3.0, "fear": 2.5, "frightened": 3.0,
+                "unsafe": 3.0, "something bad": 2.0, "threatened": 3.0, "shaking": 1.5},
+    "overwhelmed": {"overwhelmed": 3.0, "overwhelming": 3.0, "too much": 2.5, "can't keep up": 3.0,
+                    "cant keep up": 3.0, "can't cope": 3.0, "drowning": 2.5, "so much going on": 3.0,
+                    "swamped": 2.5, "can't handle": 2.5, "everything at once": 2.5},
+    "lonely": {"lonely": 3.0, "alone": 2.5, "isolated": 3.0, "no friends": 3.0, "nobody to talk": 3.0,
+               "no one to talk": 3.0, "disconnected": 2.0, "by myself": 1.5, "left out": 2.5, "nobody": 1.0},
+    "ashamed": {"ashamed": 3.0, "shame": 3.0, "embarrassed": 3.0, "humiliated": 3.0, "disgusted with myself": 3.0},
+    "relieved": {"relieved": 3.0, "relief": 3.0, "weight off": 3.0, "finally over": 3.0, "glad it's over": 3.0},
+    "confused": {"confused": 3.0, "don't understand": 2.0, "dont understand": 2.0, "don't know what": 2.0,
+                 "dont know what": 2.0, "unclear": 2.0, "lost": 1.0, "mixed up": 2.0, "makes no sense": 2.5,
+                 "not sure what": 1.5, "i don't know": 1.5, "i dont know": 1.5, "supposed to": 1.0},
+    "frustrated": {"frustrated": 3.0, "frustrating": 3.0, "stuck": 2.0, "nothing works": 3.0,
+                   "no matter what": 2.0, "fed up": 2.0, "sick of": 1.5,
+                   "tired of": 1.5, "didn't help": 1.5, "didnt help": 1.5},
+    "numb": {"numb": 3.0, "empty": 2.5, "don't feel anything": 3.0, "dont feel anything": 3.0,
+             "feel nothing": 3.0, "detached": 2.5, "flat": 1.5, "hollow": 2.5},
+    "grateful": {"grateful": 3.0, "thankful": 3.0, "appreciate": 2.5, "thank you": 1.5, "thanks": 1.0,
+                 "lucky to have": 2.5},
+    "motivated": {"motivated": 3.0, "determined": 3.0, "ready to": 2.0, "energized": 2.5, "driven": 2.0,
+                  "finally feel like doing": 2.5},
+    "hopeless": {"hopeless": 3.0, "no point": 3.0, "never going to get better": 3.0, "nothing will change": 3.0,
+                 "give up": 2.5, "gave up": 2.5, "what's the point": 3.0, "whats the point": 3.0,
+                 "pointless": 2.5, "never get better": 3.0, "helpless": 2.5},
+    "resentful": {"resentful": 3.0, "resent": 3.0, "bitter": 3.0, "still angry": 2.5, "never forgave": 3.0},
+    "calm": {"calm": 3.0, "relaxed": 3.0, "peaceful": 3.0, "at ease": 3.0, "grounded": 2.5, "steady": 2.0},
+    "self-critical": {"hard on myself": 3.0, "i'm useless": 3.0, "im useless": 3.0, "i'm stupid": 3.0,
+                      "not good enough": 3.0, "i'm a failure": 3.0, "im a failure": 3.0, "hate myself": 3.0,
+                      "my own fault": 2.0, "i always mess": 3.0, "i'm worthless": 3.0, "worthless": 2.5,
+                      "don't deserve": 3.0, "dont deserve": 3.0, "sabotage": 2.5},
+    "trusting": {"trust": 2.5, "feel safe": 2.5, "confident": 2.0, "i believe": 1.5, "open with": 2.0},
+    "disappointed": {"disappointed": 3.0, "disappointing": 3.0, "let down": 2.5, "expected more": 2.5,
+                     "didn't turn out": 2.5, "didnt turn out": 2.5},
+}
+
+# A negated emotion word counts towards its opposite ("not happy" -> sad) instead
+NEGATED_EMOTIONS = {"happy": "sad", "good": "sad", "okay": "sad", "ok": "sad", "hopeful": "hopeless", "calm": "anxious"}
+
+# When the message names no emotion, what its intent implies (see the worry/goal definitions)
+INTENT_EMOTION_PRIORS = {"worry": "anxious", "goal": "motivated"}
+_PRIOR_SCORE = 1.0
+_STATEMENT_WORDS = 5  # longer messages without other cues are reports rather than "other"
+
+
+def parse_definitions(text: str) -> Dict[str, str]:
+    """
+    label -> definition text, from the INTENT_DEFINITIONS / EMOTION_DEFINITIONS prompt blocks.
+    """
+    matches = list(_LABEL_RE.finditer(text))
+    definitions = {}
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        definitions[match.group(1)] = text[match.end():end]
+    return definitions
+
+
+def words(text: str) -> List[str]:
+    return _WORD_RE.findall((text or "").lower().replace("’", "'"))
+
+
+def ngrams(tokens: Sequence[str], max_n: int = 3) -> Iterable[Tuple[int, str]]:
+    """
+    (start index, n-gram) for every 1..max_n-gram.
+    """
+    for n in range(1, max_n + 1):
+        for i in range(len(tokens) - n + 1):
+            yield i, " ".join(tokens[i:i + n])
+
+
+class Lexicon:
+    """
+    n-gram -> [(label, weight)] for one task (intents or emotions).
+    """
+
+    def __init__(
+        self,
+        definitions: Dict[str, str],
+        cues: Dict[str, Dict[str, float]],
+        fallback: str,
+        negated: Optional[Dict[str, str]] = None
+    ):
+        self.labels = list(definitions) or list(cues)
+        self.fallback = fallback
+        self.negated = negated
+        self.entries: Dict[str, List[Tuple[str, float]]] = {}
+        for label, definition in definitions.items():
+            if label == fallback:
+                continue  # the fallback is what remains when nothing matches
+            # The label itself and the wording of its definition (minus the quoted example)
+            self._add(label.replace("-", " "), label, 2.0)
+            body = definition.split("Example:")[0]
+            for word in set(words(body)):
+                if len(word) > 3 and word not in _DEFINITION_STOPWORDS and word != label:
+                    self._add(word, label, 0.5)
+        for label, phrases in cues.items():
+            for phrase, weight in phrases.items():
+                self._add(" ".join(words(phrase)), label, weight)
+
+    def _add(self, phrase: str, label: str, weight: float):
+        bucket = self.entries.setdefault(phrase, [])
+        for i, (existing, existing_weight) in enumerate(bucket):
+            if existing == label:
+                bucket[i] = (label, max(weight, existing_weight))
+                return
+        bucket.append((label, weight))
+
+    def score(self, tokens: Sequence[str]) -> Dict[str, float]:
+        scores: Dict[str, float] = {self.fallback: _FALLBACK_SCORE}
+        for start, gram in ngrams(tokens):
+            hits = self.entries.get(gram)
+            if not hits:
+                continue
+            negated = self.negated is not None and start > 0 and tokens[start - 1] in _NEGATIONS
+            for label, weight in hits:
+                if negated:
+                    label = self.negated.get(label)
+                    if label is None:
+                        continue
+                scores[label] = scores.get(label, 0.0) + weight
+        return scores
+
+
+def _normalize(scores: Dict[str, float], labels: Sequence[str]) -> List[float]:
+    # Share of the total score; the fallback's base score keeps weak single cues unsure
+    total = sum(scores.values())
+    return [scores.get(label, 0.0) / total for label in labels]
+
+
+# --- optional vectorized model ---
+
+def feature_ids(text: str, dim: int = HASH_DIM) -> List[int]:
+    """
+    Hashed unigram + bigram ids (crc32, so they are stable across processes).
+    """
+    tokens = words(text)
+    grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    if text.rstrip().endswith("?"):
+        grams.append("<question-mark>")
+    return sorted({zlib.crc32(gram.encode("utf-8")) % dim for gram in grams})
+
+
+class SoftmaxModel:
+    """
+    Linear softmax over hashed n-grams for one task. Prediction sums a few weight rows.
+    """
+
+    def __init__(self, labels: Sequence[str], weights, bias):
+        self.labels = list(labels)
+        self.weights = weights  # (HASH_DIM, n_labels)
+        self.bias = bias  # (n_labels,)
+
+    def probabilities(self, ids: List[int]) -> List[float]:
+        logits = self.bias + (self.weights[ids].sum(axis=0) if ids else 0.0)
+        logits = logits - logits.max()
+        exps = np.exp(logits)
+        return (exps / exps.sum()).tolist()
+
+    @classmethod
+    def train(
+        cls,
+        texts: Sequence[str],
+        labels: Sequence[str],
+        label_set: Sequence[str],
+        epochs: int = 300,
+        learning_rate: float = 0.5,
+        l2: float = 1e-3,
+        dim: int = HASH_DIM
+    ) -> "SoftmaxModel":
+        if np is None:
+            raise RuntimeError("Training the classifier model requires NumPy")
+        label_set = list(label_set)
+        index = {label: i for i, label in enumerate(label_set)}
+        x = np.zeros((len(texts), dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            x[row, feature_ids(text, dim)] = 1.0
+        y = np.zeros((len(texts), len(label_set)), dtype=np.float32)
+        y[np.arange(len(texts)), [index[label] for label in labels]] = 1.0
+
+        weights = np.zeros((dim, len(label_set)), dtype=np.float32)
+        bias = np.zeros(len(label_set), dtype=np.float32)
+        for _ in range(epochs):
+            logits = x @ weights + bias
+            logits -= logits.max(axis=1, keepdims=True)
+            probs = np.exp(logits)
+            probs /= probs.sum(axis=1, keepdims=True)
+            grad = (probs - y) / len(texts)
+            weights -= learning_rate * (x.T @ grad + l2 * weights)
+            bias -= learning_rate * grad.sum(axis=0)
+        return cls(label_set, weights, bias)
+
+
+@dataclass
+class Classification:
+    intent: str
+    emotion: str
+    intent_confidence: float
+    emotion_confidence: float
+
+    @property
+    def detected(self) -> bool:
+        """
+        Whether anything beyond the fallback labels was found with enough confidence.
+        """
+        return (
+            (self.intent != FALLBACK_INTENT and self.intent_confidence >= MIN_CONFIDENCE)
+            or (self.emotion != FALLBACK_EMOTION and self.emotion_confidence >= MIN_CONFIDENCE)
+        )
+
+    def labels_or(self, intent: Optional[str], emotion: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+        """
+        This turn's labels where confident, the given ones (e.g. last turn's) otherwise.
+        """
+        if self.intent != FALLBACK_INTENT and self.intent_confidence >= MIN_CONFIDENCE:
+            intent = self.intent
+        if self.emotion != FALLBACK_EMOTION and self.emotion_confidence >= MIN_CONFIDENCE:
+            emotion = self.emotion
+        return intent, emotion
+
+
+class IntentClassifier:
+    def __init__(self, model_path: Optional[str] = MODEL_PATH, model_weight: float = MODEL_WEIGHT):
+        self.intents = Lexicon(parse_definitions(INTENT_DEFINITIONS), INTENT_CUES, FALLBACK_INTENT)
+        self.emotions = Lexicon(parse_definitions(EMOTION_DEFINITIONS), EMOTION_CUES, FALLBACK_EMOTION, NEGATED_EMOTIONS)
+        self.model_weight = model_weight
+        self.intent_model: Optional[SoftmaxModel] = None
+        self.emotion_model: Optional[SoftmaxModel] = None
+        if model_path and np is not None and os.path.exists(model_path):
+            self.load_model(model_path)
+
+    def _blend(self, lexicon: Lexicon, scores: Dict[str, float], model: Optional[SoftmaxModel], ids) -> Tuple[str, float]:
+        labels = lexicon.labels
+        probs = _normalize(scores, labels)
+        if model is not None:
+            model_probs = dict(zip(model.labels, model.probabilities(ids)))
+            probs = [
+                (1 - self.model_weight) * p + self.model_weight * model_probs.get(label, 0.0)
+                for p, label in zip(probs, labels)
+            ]
+        best = max(range(len(labels)), key=probs.__getitem__)
+        return labels[best], probs[best]
+
+    def classify(self, text: str) -> Classification:
+        tokens = words(text)
+        intent_scores = self.intents.score(tokens)
+        if text.rstrip().endswith("?"):
+            intent_scores["question"] = intent_scores.get("question", 0.0) + 2.0
+        if len(tokens) >= _STATEMENT_WORDS:
+            intent_scores["report"] = intent_scores.get("report", 0.0) + _FALLBACK_SCORE + 0.05
+        emotion_scores = self.emotions.score(tokens)
+        if len(emotion_scores) == 1:
+            # Nothing named: fall back on what the strongest intent implies
+            lead = max(intent_scores, key=intent_scores.get)
+            if lead in INTENT_EMOTION_PRIORS:
+                emotion_scores[INTENT_EMOTION_PRIORS[lead]] = _PRIOR_SCORE
+
+        ids = feature_ids(text) if (self.intent_model or self.emotion_model) else None
+        intent, intent_confidence = self._blend(self.intents, intent_scores, self.intent_model, ids)
+        emotion, emotion_confidence = self._blend(self.emotions, emotion_scores, self.emotion_model, ids)
+        return Classification(intent, emotion, intent_confidence, emotion_confidence)
+
+    # --- model persistence ---
+
+    def fit_model(self, texts: Sequence[str], intents: Sequence[str], emotions: Sequence[str], **kwargs):
+        self.intent_model = SoftmaxModel.train(texts, intents, self.intents.labels, **kwargs)
+        self.emotion_model = SoftmaxModel.train(texts, emotions, self.emotions.labels, **kwargs)
+
+    def save_model(self, path: str = MODEL_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        np.savez_compressed(
+            path,
+            intent_labels=np.array(self.intent_model.labels), intent_weights=self.intent_model.weights,
+            intent_bias=self.intent_model.bias,
+            emotion_labels=np.array(self.emotion_model.labels), emotion_weights=self.emotion_model.weights,
+            emotion_bias=self.emotion_model.bias,
+        )
+
+    def load_model(self, path: str = MODEL_PATH):
+        with np.load(path) as data:
+            self.intent_model = SoftmaxModel(data["intent_labels"].tolist(), data["intent_weights"], data["intent_bias"])
+            self.emotion_model = SoftmaxModel(data["emotion_labels"].tolist(), data["emotion_weights"], data["emotion_bias"])
+
+
+_classifier: Optional[IntentClassifier] = None
+
+
+def get_classifier() -> IntentClassifier:
+    global _classifier
+    if _classifier is None:
+        _classifier = IntentClassifier()
+    return _classifier
+
+
+def classify(text: str) -> Classification:
+    return get_classifier().classify(text)
@@ -0,0 +1,392 @@
+import os
+import re
+import sys
+import json
+import glob
+import sqlite3
+import datetime
+import argparse
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Iterable, List, Optional, Tuple
+
+"""
+Indexed archive of finished SOAP notes.
+
+generate_notes used to keep only the PDF, so finding a past note meant opening PDFs by
+hand. Every finished note's JSON is now also stored here, in a SQLite database next to
+the PDFs, with indexes for the clinician dashboard:
+
+- patient_id and date (newest first), for a patient's history or a day's intakes
+- risk factors and differential diagnoses, one indexed row per item. Items are matched
+  on a normalized term: lower case, without a trailing parenthetical, so the screen's
+  'Suicidal ideation (screen-flagged: "...")' is found as "suicidal ideation". A
+  trailing "*" matches by prefix ("suicid*"). The note's date is copied into these rows,
+  so a term's index is already in date order and a page of matches reads only its own
+  rows.
+
+Listings are paginated with a keyset cursor on (created_at, id), so a page costs the
+same however deep it is. One note is kept per session (thread_id); regenerating it
+replaces the earlier one.
+
+Backfill from persisted note jobs, and query from the command line (from neuroflow/):
+    python -m tools.note_archive --import "clinical_notes/jobs/*.json"
+    python -m tools.note_archive --risk "suicid*" --limit 20
+"""
+
+ARCHIVE_PATH = os.getenv("NEUROFLOW_NOTE_ARCHIVE", os.path.join("clinical_notes", "notes.db"))  # next to the PDFs
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+_PARENTHETICAL = re.compile(r"\s*\([^()]*\)\s*$")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS notes (
+    id INTEGER PRIMARY KEY,
+    thread_id TEXT NOT NULL UNIQUE,
+    patient_id TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    chief_complaint TEXT NOT NULL,
+    pdf_path TEXT,
+    notes TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS notes_patient ON notes (patient_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS notes_created ON notes (created_at DESC, id DESC);
+CREATE TABLE IF NOT EXISTS note_risk_factors (
+    note_id INTEGER NOT NULL REFERENCES notes (id) ON DELETE CASCADE,
+    term TEXT NOT NULL,
+    text TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS risk_factors_term ON note_risk_factors (term, created_at DESC, note_id DESC);
+CREATE INDEX IF NOT EXISTS risk_factors_note ON note_risk_factors (note_id);
+CREATE TABLE IF NOT EXISTS note_diagnoses (
+    note_id INTEGER NOT NULL REFERENCES notes (id) ON DELETE CASCADE,
+    term TEXT NOT NULL,
+    text TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS diagnoses_term ON note_diagnoses (term, created_at DESC, note_id DESC);
+CREATE INDEX IF NOT EXISTS diagnoses_note ON note_diagnoses (note_id);
+"""
+
+
+def term(text: str) -> str:
+    """
+    The normalized form risk factors and diagnoses are indexed and matched by.
+    """
+    return _PARENTHETICAL.sub("", " ".join(str(text).split())).casefold()
+
+
+def _items(value: Any) -> List[str]:
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, list):
+        return []
+    return list(dict.fromkeys(str(item).strip() for item in value if str(item).strip()))
+
+
+def _section(notes: dict, name: str) -> dict:
+    section = notes.get(name)
+    return section if isinstance(section, dict) else {}
+
+
+def _timestamp(value: Any) -> Optional[str]:
+    # Dates compare as ISO strings; a bare date means the start of that day
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime.datetime):
+        return value.isoformat(timespec="seconds")
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return datetime.datetime.fromisoformat(str(value)).isoformat(timespec="seconds")
+
+
+@dataclass
+class NoteSummary:
+    id: int
+    thread_id: str
+    patient_id: str
+    created_at: str
+    chief_complaint: str
+    pdf_path: Optional[str]
+    risk_factors: List[str] = field(default_factory=list)
+    differential_diagnosis: List[str] = field(default_factory=list)
+
+
+@dataclass
+class NotePage:
+    items: List[NoteSummary]
+    next_cursor: Optional[str]  # pass back as cursor for the next page; None on the last page
+
+
+class NoteArchive:
+    def __init__(self, path: str = ARCHIVE_PATH):
+        self.path = path
+        self._local = threading.local()  # sqlite3 connections are per thread; opened on first use
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def add(
+        self,
+        thread_id: str,
+        notes: dict,
+        pdf_path: Optional[str] = None,
+        created_at: Optional[datetime.datetime] = None
+    ) -> int:
+        """
+        Stores (or replaces) the session's note and returns its id.
+        """
+        created = _timestamp(created_at or datetime.datetime.now())
+        subjective = _section(notes, "subjective")
+        risk_factors = _items(_section(notes, "objective").get("risk_factors"))
+        diagnoses = _items(_section(notes, "assessment").get("differential_diagnosis"))
+
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT INTO notes (thread_id, patient_id, created_at, chief_complaint, pdf_path, notes) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(thread_id) DO UPDATE SET "
+                "patient_id = excluded.patient_id, created_at = excluded.created_at, "
+                "chief_complaint = excluded.chief_complaint, pdf_path = excluded.pdf_path, notes = excluded.notes",
+                (
+                    str(thread_id),
+                    str(notes.get("patient_id") or "unknown"),
+                    created,
+                    str(subjective.get("chief_complaint") or ""),
+                    pdf_path,
+                    json.dumps(notes)
+                )
+            )
+            note_id = conn.execute("SELECT id FROM notes WHERE thread_id = ?", (str(thread_id),)).fetchone()[0]
+            for table, items in (("note_risk_factors", risk_factors), ("note_diagnoses", diagnoses)):
+                conn.execute(f"DELETE FROM {table} WHERE note_id = ?", (note_id,))
+                by_term = {}
+                for item in items:
+                    by_term.setdefault(term(item), item)
+                conn.executemany(
+                    f"INSERT INTO {table} (note_id, term, text, created_at) VALUES (?, ?, ?, ?)",
+                    [(note_id, key, item, created) for key, item in by_term.items()]
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return note_id
+
+    def get(self, note_id: int) -> Optional[dict]:
+        """
+        The full note with its archive metadata, or None.
+        """
+        row = self._connection().execute(
+            "SELECT id, thread_id, created_at, pdf_path, notes FROM notes WHERE id = ?", (note_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"id": row[0], "thread_id": row[1], "created_at": row[2], "pdf_path": row[3], "notes": json.loads(row[4])}
+
+    def get_by_thread(self, thread_id: str) -> Optional[dict]:
+        row = self._connection().execute("SELECT id FROM notes WHERE thread_id = ?", (str(thread_id),)).fetchone()
+        return self.get(row[0]) if row else None
+
+    @staticmethod
+    def _match(table: str, value: str, note_id: str) -> Tuple[str, list]:
+        wanted = term(value.rstrip("*"))
+        if value.endswith("*"):
+            # A range scan on the term index rather than LIKE, which would not use it
+            return f"{note_id} IN (SELECT note_id FROM {table} WHERE term >= ? AND term < ?)", [wanted, wanted + "\uffff"]
+        return f"{note_id} IN (SELECT note_id FROM {table} WHERE term = ?)", [wanted]
+
+    def _plan(
+        self,
+        patient_id: Optional[str],
+        since: Any,
+        until: Any,
+        risk_factor: Optional[str],
+        diagnosis: Optional[str]
+    ) -> Tuple[Optional[str], List[str], list, str, str]:
+        """
+        Driving term table (None: notes itself), conditions, parameters and the (date, id)
+        ordering columns of a query.
+        A patient's own index is the most selective, so it drives the query when given;
+        otherwise an exact risk factor or diagnosis does, through its date-ordered term index.
+        """
+        driver = None
+        if not patient_id:
+            for table, value in (("note_risk_factors", risk_factor), ("note_diagnoses", diagnosis)):
+                if value and not value.endswith("*"):
+                    driver = table
+                    break
+        if driver:
+            created, note_id = "t.created_at", "t.note_id"
+            clauses, params = ["t.term = ?"], [term(risk_factor if driver == "note_risk_factors" else diagnosis)]
+        else:
+            created, note_id = "n.created_at", "n.id"
+            clauses, params = [], []
+
+        if patient_id:
+            clauses.append("n.patient_id = ?")
+            params.append(str(patient_id))
+        if _timestamp(since):
+            clauses.append(f"{created} >= ?")
+            params.append(_timestamp(since))
+        if _timestamp(until):
+            clauses.append(f"{created} < ?")
+            params.append(_timestamp(until))
+        for table, value in (("note_risk_factors", risk_factor), ("note_diagnoses", diagnosis)):
+            if value and table != driver:
+                clause, values = self._match(table, value, note_id)
+                clauses.append(clause)
+                params.extend(values)
+        return driver, clauses, params, created, note_id
+
+    @staticmethod
+    def _source(driver: Optional[str], with_notes: bool = True) -> str:
+        if driver is None:
+            return "notes AS n"
+        return f"{driver} AS t JOIN notes AS n ON n.id = t.note_id" if with_notes else f"{driver} AS t"
+
+    def query(
+        self,
+        patient_id: Optional[str] = None,
+        since: Any = None,
+        until: Any = None,
+        risk_factor: Optional[str] = None,
+        diagnosis: Optional[str] = None,
+        limit: int = PAGE_SIZE,
+        cursor: Optional[str] = None
+    ) -> NotePage:
+        """
+        Notes matching every given filter, newest first, one page at a time. since is
+        inclusive and until exclusive (ISO dates or datetimes).
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        driver, clauses, params, created, note_id = self._plan(patient_id, since, until, risk_factor, diagnosis)
+        if cursor:
+            created_at, _, last_id = cursor.rpartition("|")
+            clauses.append(f"({created} < ? OR ({created} = ? AND {note_id} < ?))")
+            params.extend([created_at, created_at, int(last_id)])
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        conn = self._connection()
+        rows = conn.execute(
+            "SELECT n.id, n.thread_id, n.patient_id, n.created_at, n.chief_complaint, n.pdf_path "
+            f"FROM {self._source(driver)} {where} ORDER BY {created} DESC, {note_id} DESC LIMIT ?",
+            params + [limit + 1]
+        ).fetchall()
+        has_more = len(rows) > limit
+        items = [NoteSummary(*row) for row in rows[:limit]]
+
+        if items:
+            by_id = {item.id: item for item in items}
+            marks = ",".join("?" * len(by_id))
+            for table, attr in (("note_risk_factors", "risk_factors"), ("note_diagnoses", "differential_diagnosis")):
+                for row_note_id, text in conn.execute(
+                    f"SELECT note_id, text FROM {table} WHERE note_id IN ({marks}) ORDER BY rowid", list(by_id)
+                ):
+                    getattr(by_id[row_note_id], attr).append(text)
+
+        next_cursor = f"{items[-1].created_at}|{items[-1].id}" if has_more else None
+        return NotePage(items, next_cursor)
+
+    def count(
+        self,
+        patient_id: Optional[str] = None,
+        since: Any = None,
+        until: Any = None,
+        risk_factor: Optional[str] = None,
+        diagnosis: Optional[str] = None
+    ) -> int:
+        driver, clauses, params, _, _ = self._plan(patient_id, since, until, risk_factor, diagnosis)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        # With a driving term every condition is on its rows, so notes need not be joined
+        source = self._source(driver, with_notes=False)
+        return self._connection().execute(f"SELECT COUNT(*) FROM {source} {where}", params).fetchone()[0]
+
+    def top_terms(self, kind: str = "risk_factors", limit: int = 20) -> List[Tuple[str, int]]:
+        """
+        Most frequent normalized risk factors or diagnoses, for dashboard filters.
+        """
+        table = {"risk_factors": "note_risk_factors", "diagnoses": "note_diagnoses"}[kind]
+        return self._connection().execute(
+            f"SELECT term, COUNT(*) AS n FROM {table} GROUP BY term ORDER BY n DESC, term LIMIT ?", (limit,)
+        ).fetchall()
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+# Shared by NoteTaker.generate_notes and the server's /notes endpoints
+archive = NoteArchive()
+
+
+def import_jobs(paths: Iterable[str], target: NoteArchive = archive) -> int:
+    """
+    Backfills the archive from note jobs persisted by tools/note_queue.py.
+    """
+    count = 0
+    for path in paths:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                job = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️ Skipping {path}: {type(e).__name__}: {e}")
+            continue
+        result = job.get("result") or {}
+        if job.get("status") != "done" or not isinstance(result.get("notes"), dict):
+            continue
+        finished = job.get("finished_at")
+        target.add(job["thread_id"], result["notes"], result.get("pdf_path"),
+                   datetime.datetime.fromisoformat(finished) if finished else None)
+        count += 1
+    return count
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Query or backfill the SOAP note archive.")
+    parser.add_argument("--archive", default=ARCHIVE_PATH)
+    parser.add_argument("--import", dest="import_glob", help="note job JSON files to backfill, e.g. 'clinical_notes/jobs/*.json'")
+    parser.add_argument("--patient")
+    parser.add_argument("--since")
+    parser.add_argument("--until")
+    parser.add_argument("--risk", help='risk factor, "term*" for a prefix')
+    parser.add_argument("--diagnosis", help='diagnosis, "term*" for a prefix')
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--cursor")
+    args = parser.parse_args(argv)
+
+    target = NoteArchive(args.archive)
+    if args.import_glob:
+        print(f"✅ Imported {import_jobs(sorted(glob.glob(args.import_glob)), target)} notes into {args.archive}")
+        return 0
+
+    page = target.query(args.patient, args.since, args.until, args.risk, args.diagnosis, args.limit, args.cursor)
+    for item in page.items:
+        print(f"{item.created_at}  #{item.id}  {item.patient_id:<16} {item.chief_complaint[:60]}")
+        if item.risk_factors:
+            print(f"    risk: {'; '.join(item.risk_factors)}")
+        if item.differential_diagnosis:
+            print(f"    differential: {'; '.join(item.differential_diagnosis)}")
+    if page.next_cursor:
+        print(f"... more with --cursor '{page.next_cursor}'")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
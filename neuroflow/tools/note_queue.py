@@ -0,0 +1,185 @@
+import os
+import json
+import asyncio
+import datetime
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional
+from tools.notetaker import NoteTaker, REPO_ROOT
+
+"""
+Background SOAP note generation.
+
+Generating notes is a full scribe LLM round-trip plus a PDF build, so the final turn
+no longer waits for it. NeuroFlowMain submits the thread here and returns straight
+away; a bounded pool of workers produces the notes, retries failures and persists
+every job to disk so the clinician side can look results up by thread_id.
+"""
+
+JOBS_DIR = os.getenv("NEUROFLOW_NOTE_JOBS_DIR", os.path.join(REPO_ROOT, "jobs"))
+NOTE_WORKERS = int(os.getenv("NEUROFLOW_NOTE_WORKERS", "2"))
+NOTE_MAX_ATTEMPTS = int(os.getenv("NEUROFLOW_NOTE_MAX_ATTEMPTS", "3"))
+NOTE_RETRY_DELAY = float(os.getenv("NEUROFLOW_NOTE_RETRY_DELAY", "1.0"))
+
+
+@dataclass
+class NoteJob:
+    thread_id: str
+    status: str = "pending"  # pending | running | done | failed
+    attempts: int = 0
+    result: Optional[dict] = None  # {"notes": ..., "pdf_path": ..., "note_id": ...} once done
+    error: Optional[str] = None
+    submitted_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    draft: Optional[dict] = None  # rolling SOAP draft handed over at session end
+    conversation_thread: Optional[str] = None  # Backboard thread the session ended on, if rotated
+
+
+class NoteJobQueue:
+    def __init__(
+        self,
+        notetaker: NoteTaker,
+        workers: int = NOTE_WORKERS,
+        max_attempts: int = NOTE_MAX_ATTEMPTS,
+        retry_delay: float = NOTE_RETRY_DELAY,
+        jobs_dir: str = JOBS_DIR
+    ):
+        self.notetaker = notetaker
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.jobs_dir = jobs_dir
+
+        self.jobs: Dict[str, NoteJob] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_tasks: List[asyncio.Task] = []
+
+    def _start(self):
+        # Workers are bound to the loop of the first submit
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._worker_tasks = [
+                asyncio.create_task(self._worker(), name=f"note-worker-{i}")
+                for i in range(self.workers)
+            ]
+
+    async def submit(
+        self,
+        thread_id: str,
+        draft: Optional[dict] = None,
+        conversation_thread: Optional[str] = None
+    ) -> NoteJob:
+        """
+        Queues note generation for a thread and returns immediately.
+        Submitting a thread that is already queued, running or done is a no-op.
+        draft is the session's rolling SOAP draft, if it has one; conversation_thread is
+        the Backboard thread the scribe should read when it differs from thread_id.
+        """
+        job = self.jobs.get(thread_id)
+        if job is not None and job.status != "failed":
+            return job
+
+        self._start()
+        job = NoteJob(
+            thread_id=thread_id,
+            submitted_at=_now(),
+            draft=draft,
+            conversation_thread=conversation_thread if conversation_thread != thread_id else None
+        )
+        self.jobs[thread_id] = job
+        self._persist(job)
+        self._queue.put_nowait(thread_id)
+        return job
+
+    def status(self, thread_id: str) -> Optional[NoteJob]:
+        """
+        Looks up a job by thread_id, falling back to jobs persisted by earlier processes.
+        """
+        job = self.jobs.get(thread_id)
+        if job is not None:
+            return job
+        try:
+            with open(self._job_path(thread_id), "r", encoding="utf-8") as f:
+                return NoteJob(**json.load(f))
+        except (FileNotFoundError, json.JSONDecodeError, TypeError):
+            return None
+
+    async def wait(self, thread_id: str, poll_interval: float = 0.2) -> Optional[NoteJob]:
+        """
+        Waits until the thread's job is done or failed.
+        """
+        while True:
+            job = self.status(thread_id)
+            if job is None or job.status in ("done", "failed"):
+                return job
+            await asyncio.sleep(poll_interval)
+
+    async def join(self):
+        """
+        Waits for every queued job to finish, e.g. before a CLI process exits.
+        """
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def close(self):
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        self._queue = None
+
+    async def _worker(self):
+        while True:
+            thread_id = await self._queue.get()
+            job = self.jobs[thread_id]
+            try:
+                await self._run(job)
+            except Exception as e:
+                # e.g. the job file could not be written; fail this job, keep the worker for the next
+                job.status = "failed"
+                job.error = f"{type(e).__name__}: {e}"
+                job.finished_at = _now()
+                print(f"❌ Note job for {thread_id} failed: {job.error}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: NoteJob):
+        job.status = "running"
+        self._persist(job)
+
+        while job.attempts < self.max_attempts:
+            job.attempts += 1
+            try:
+                result = await self.notetaker.generate_notes(
+                    job.conversation_thread or job.thread_id, draft=job.draft, session_id=job.thread_id
+                )
+                if "error" in result:
+                    raise ValueError(result["error"])
+                job.status = "done"
+                job.result = result
+                job.error = None
+                break
+            except Exception as e:
+                job.error = f"{type(e).__name__}: {e}"
+                print(f"⚠️ Note generation for {job.thread_id} failed (attempt {job.attempts}): {job.error}")
+                if job.attempts < self.max_attempts:
+                    await asyncio.sleep(self.retry_delay * 2 ** (job.attempts - 1))
+        else:
+            job.status = "failed"
+
+        job.finished_at = _now()
+        self._persist(job)
+
+    def _job_path(self, thread_id: str) -> str:
+        return os.path.join(self.jobs_dir, f"{thread_id}.json")
+
+    def _persist(self, job: NoteJob):
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        path = self._job_path(job.thread_id)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(asdict(job), f, indent=2)
+        os.replace(tmp_path, path)
+
+
+def _now() -> str:
+    return datetime.datetime.now().isoformat(timespec="seconds")
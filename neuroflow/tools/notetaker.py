@@ -1,70 +1,167 @@
 import os
-import json
 import re
-from backboard import BackboardClient
+import copy
+import json
+import sqlite3
+import asyncio
+import client_pool
+import json_stream
+import tracing
+from resilience import NOTES_POLICY, call_with_policy
 from dotenv import load_dotenv
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.pagesizes import LETTER
-from reportlab.lib.units import inch
+from tools import pdf_renderer
+from tools import note_archive
 import datetime
+from typing import Optional
 
 REPO_ROOT = "clinical_notes/" 
+_UNSAFE_FILENAME = re.compile(r"[^A-Za-z0-9_.-]+")
+NOTES_MODE = os.getenv("NEUROFLOW_NOTES_MODE", "polish")  # full | polish | draft
+
+# Short end-of-session call used with a rolling draft: only the clinical judgement is left
+POLISH_PROMPT = """
+        [SYSTEM INSTRUCTION: END OF CLINICAL SESSION]
+
+        You are now acting as a Medical Scribe.
+        Below is a SOAP note draft assembled during this conversation. Subjective and objective
+        sections are already filled in. Using the conversation history, write only the missing parts.
+
+        Draft:
+        {draft}
+
+        Return raw JSON only, no markdown, with exactly this structure:
+        {{
+            "assessment": {{"summary": "...", "differential_diagnosis": ["..."]}},
+            "plan": {{"immediate_actions": "...", "recommendations": "..."}},
+            "corrections": {{"subjective": {{}}, "objective": {{}}}}
+        }}
+        Leave "corrections" empty unless the draft contradicts the conversation.
+        Risk factors marked "screen-flagged" were matched by an automatic phrase screen and
+        can be false positives (e.g. the patient talking about someone else). If any of them
+        is not supported by the conversation, return the full corrected list as
+        corrections.objective.risk_factors.
+"""
 
 class NoteTaker:
     load_dotenv()
 
-    api_key = os.getenv("BACKBOARD_API_KEY")  
-    client = BackboardClient(api_key=api_key)
-
     @staticmethod
     def _notes_to_pdf(notes: dict, output_path: str):
         """
-        Serialize SOAP notes into a readable PDF.
+        Serialize SOAP notes into a readable PDF (synchronously, in this process).
+        generate_notes uses the pooled pdf_renderer instead so the event loop stays free.
         """
-        styles = getSampleStyleSheet()
-        story = []
-
-        def heading(text):
-            story.append(Paragraph(f"<b>{text}</b>", styles["Heading2"]))
-            story.append(Spacer(1, 0.2 * inch))
-
-        def body(text):
-            story.append(Paragraph(text or "N/A", styles["Normal"]))
-            story.append(Spacer(1, 0.2 * inch))
+        pdf_renderer.render_pdf(notes, output_path)
 
-        heading("Clinical SOAP Note")
-
-        body(f"Patient ID: {notes.get('patient_id', 'unknown')}")
-        body(f"Generated at: {datetime.datetime.utcnow().isoformat()} UTC")
+    @staticmethod
+    async def generate_notes(
+        thread_id: str,
+        pdf_dir: str = REPO_ROOT,
+        draft: Optional[dict] = None,
+        mode: str = NOTES_MODE,
+        session_id: Optional[str] = None,
+        archive: Optional[note_archive.NoteArchive] = None
+    ):
+        """
+        Produces the session's SOAP note and its PDF, and files the note's JSON in the
+        archive (tools/note_archive.py) under session_id (default: thread_id).
+        With a rolling draft (see tools/soap_draft.py), mode picks how much the LLM still does:
+        "full" re-reads the whole session, "polish" only completes assessment and plan,
+        "draft" uses the draft as is. Without a draft the full scribe pass is used.
+        """
+        os.makedirs(pdf_dir, exist_ok=True)
 
+        if draft is None or mode == "full":
+            notes = await NoteTaker._scribe_notes(thread_id)
+        elif mode == "polish":
+            notes = await NoteTaker._polish_draft(thread_id, draft)
+        else:
+            notes = draft
+        if "error" in notes:
+            return notes
 
-        heading("Subjective")
-        subj = notes.get("subjective", {})
-        body(f"<b>Chief Complaint:</b> {subj.get('chief_complaint')}")
-        body(f"<b>History of Present Illness:</b> {subj.get('history_of_present_illness')}")
-        body(f"<b>Emotional State:</b> {subj.get('emotional_state')}")
+        curr_time = datetime.datetime.now()
+        time_stamp = curr_time.strftime("%Y-%m-%d_%H-%M-%S")
+        # Several workers may finish notes in the same second; the session keeps their PDFs apart
+        session = _UNSAFE_FILENAME.sub("_", str(session_id or thread_id))
+        pdf_path = os.path.join(pdf_dir, f"{time_stamp}_{session}_soap_note.pdf")
+        with tracing.span("notes_pdf_render"):
+            await pdf_renderer.renderer.render(notes, pdf_path)
 
-        heading("Objective")
-        obj = notes.get("objective", {})
-        body(f"<b>Observations:</b> {obj.get('observations')}")
-        body(f"<b>Risk Factors:</b> {', '.join(obj.get('risk_factors', []))}")
+        note_id = None
+        try:
+            with tracing.span("notes_archive"):
+                note_id = await asyncio.to_thread(
+                    (archive or note_archive.archive).add, session_id or thread_id, notes, pdf_path, curr_time
+                )
+        except sqlite3.Error as e:
+            # The PDF is written; a note missing from the archive can be backfilled from its job file
+            print(f"⚠️ Could not archive the note for {session_id or thread_id}: {type(e).__name__}: {e}")
 
-        heading("Assessment")
-        assess = notes.get("assessment", {})
-        body(f"<b>Summary:</b> {assess.get('summary')}")
-        body(f"<b>Differential Diagnosis:</b> {', '.join(assess.get('differential_diagnosis', []))}")
+        return {
+            "notes": notes,
+            "pdf_path": pdf_path,
+            "note_id": note_id
+        }
 
-        heading("Plan")
-        plan = notes.get("plan", {})
-        body(f"<b>Immediate Actions:</b> {plan.get('immediate_actions')}")
-        body(f"<b>Recommendations:</b> {plan.get('recommendations')}")
+    @staticmethod
+    async def _ask_scribe(thread_id: str, prompt: str) -> dict:
+        # We treat this as a message, but the content forces the AI to step out of character.
+        # Transient failures are retried under NOTES_POLICY before the note queue sees them.
+        client = client_pool.get_client()
+        with tracing.span("notes_scribe_call"):
+            response = await call_with_policy(NOTES_POLICY, lambda: client.add_message(
+                thread_id=thread_id,
+                content=prompt,
+                llm_provider = "google",
+                model_name = "gemini-2.5-flash"
+                # If your Backboard plan supports 'json_object' response format, uncomment this:
+                # response_format={"type": "json_object"} 
+            ))
+
+        # Extract and Clean the Output
+        raw_content = response.content or response.message
+        return NoteTaker._parse_json_safely(raw_content)
 
-        doc = SimpleDocTemplate(output_path, pagesize=LETTER)
-        doc.build(story)
+    @staticmethod
+    async def _polish_draft(thread_id: str, draft: dict) -> dict:
+        """
+        Asks only for the sections the draft cannot fill locally. Falls back to the
+        unpolished draft if the reply is unusable, so the note is never lost.
+        """
+        print(f"📝 Finalizing SOAP draft for Thread: {thread_id}...")
+        prompt = POLISH_PROMPT.format(draft=json.dumps(draft, indent=2))
+        try:
+            polished = await NoteTaker._ask_scribe(thread_id, prompt)
+        except Exception as e:
+            print(f"⚠️ Polish call failed for {thread_id}, keeping the draft: {type(e).__name__}: {e}")
+            return draft
+        if "error" in polished:
+            return draft
+
+        notes = copy.deepcopy(draft)
+        for section in ("assessment", "plan"):
+            if isinstance(polished.get(section), dict):
+                notes[section].update(polished[section])
+        if isinstance(polished.get("corrections"), dict):
+            for section, fields in polished["corrections"].items():
+                if isinstance(notes.get(section), dict) and isinstance(fields, dict):
+                    notes[section].update(fields)
+        # Screen flags are phrase matches, not findings: the scribe may dismiss them, but a
+        # dismissed flag stays on record as not confirmed instead of silently disappearing
+        screened = draft["objective"].get("risk_factors") or []
+        corrected = notes["objective"].get("risk_factors")
+        if not isinstance(corrected, list):
+            corrected = screened
+        confirmed = {note_archive.term(item) for item in corrected}
+        dismissed = [item for item in screened if note_archive.term(item) not in confirmed]
+        notes["objective"]["risk_factors"] = [str(item) for item in corrected]
+        if dismissed:
+            notes["objective"]["screen_flags_not_confirmed"] = dismissed
+        return notes
 
     @staticmethod
-    async def generate_notes(thread_id: str, pdf_dir: str = REPO_ROOT):
+    async def _scribe_notes(thread_id: str) -> dict:
         """
         Interacts with the EXISTING thread and memory to generate a clinical summary.
         It does not continue the conversation; it forces a 'Scribe' mode response.
@@ -106,48 +203,18 @@ class NoteTaker:
         """
 
         print(f"📝 Requesting Clinical Notes for Thread: {thread_id}...")
-        os.makedirs(pdf_dir, exist_ok=True)
-
         # 2. Send the command to Backboard
-        # We treat this as a message, but the content forces the AI to step out of character.
-        response = await NoteTaker.client.add_message(
-            thread_id=thread_id,
-            content=scribe_prompt,
-            llm_provider = "google",
-            model_name = "gemini-2.5-flash"
-            # If your Backboard plan supports 'json_object' response format, uncomment this:
-            # response_format={"type": "json_object"} 
-        )
-
-        # 3. Extract and Clean the Output
-        raw_content = response.content or response.message
-        notes = NoteTaker._parse_json_safely(raw_content)
-        if "error" in notes:
-            return notes
-        
-        curr_time = datetime.datetime.now()
-        time_stamp = curr_time.strftime("%Y-%m-%d_%H-%M-%S")
-        pdf_path = os.path.join(pdf_dir, f"{time_stamp}_soap_note.pdf")
-        NoteTaker._notes_to_pdf(notes, pdf_path)
-    
-        return {
-            "notes": notes,
-            "pdf_path": pdf_path
-        }
+        return await NoteTaker._ask_scribe(thread_id, scribe_prompt)
 
     @staticmethod
     def _parse_json_safely(text: str):
         """
-        LLMs often wrap JSON in markdown (```json ... ```). This strips it.
+        LLMs often wrap JSON in markdown (```json ... ```) or add prose around it.
+        Uses the same tolerant extractor as the chat turns.
         """
         try:
-            # Remove markdown code blocks if present
-            clean_text = re.sub(r"```json\s*", "", text)
-            clean_text = re.sub(r"```\s*", "", clean_text)
-            clean_text = clean_text.strip()
-            
-            return json.loads(clean_text)
-        except json.JSONDecodeError:
+            return json_stream.parse_json_object(text or "")
+        except json_stream.JSONExtractionError:
             print(f"❌ JSON Parsing Failed. Raw output: {text}")
             # Fallback: Return the raw text wrapped in a dict so the app doesn't crash
             return {
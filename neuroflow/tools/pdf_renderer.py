@@ -0,0 +1,189 @@
+import os
+import json
+import asyncio
+import argparse
+import datetime
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Iterable, List, Optional, Tuple
+from xml.sax.saxutils import escape
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.pagesizes import LETTER
+from reportlab.lib.units import inch
+
+"""
+SOAP note -> PDF rendering off the event loop.
+
+SimpleDocTemplate.build is CPU-bound, so running it inside generate_notes stalls every
+other session on the server. Rendering happens in a process pool instead; each worker
+builds the stylesheet once when it starts rather than on every note.
+"""
+
+PDF_WORKERS = int(os.getenv("NEUROFLOW_PDF_WORKERS", "2"))  # 0 renders in a thread instead
+PDF_MAX_PENDING = int(os.getenv("NEUROFLOW_PDF_MAX_PENDING", "16"))
+
+# Per-process template state, built once by _init_worker (or lazily in-process)
+_styles = None
+_spacer_height = 0.2 * inch
+
+
+def _init_worker():
+    global _styles
+    _styles = getSampleStyleSheet()
+
+
+def render_pdf(notes: dict, output_path: str) -> str:
+    """
+    Serialize SOAP notes into a readable PDF. Runs inside a pool worker.
+    """
+    if _styles is None:
+        _init_worker()
+    heading_style = _styles["Heading2"]
+    body_style = _styles["Normal"]
+    story = []
+
+    def heading(text):
+        story.append(Paragraph(f"<b>{text}</b>", heading_style))
+        story.append(Spacer(1, _spacer_height))
+
+    def body(text):
+        story.append(Paragraph(text or "N/A", body_style))
+        story.append(Spacer(1, _spacer_height))
+
+    def field(label: str, value: Any):
+        # Values come from the patient and the LLM: escape them, Paragraph parses markup
+        if isinstance(value, list):
+            value = ", ".join(str(item) for item in value)
+        body(f"<b>{label}:</b> {escape(str(value))}")
+
+    heading("Clinical SOAP Note")
+
+    body(f"Patient ID: {escape(str(notes.get('patient_id', 'unknown')))}")
+    body(f"Generated at: {datetime.datetime.utcnow().isoformat()} UTC")
+
+    heading("Subjective")
+    subj = notes.get("subjective", {})
+    field("Chief Complaint", subj.get("chief_complaint"))
+    field("History of Present Illness", subj.get("history_of_present_illness"))
+    field("Emotional State", subj.get("emotional_state"))
+
+    heading("Objective")
+    obj = notes.get("objective", {})
+    field("Observations", obj.get("observations"))
+    field("Risk Factors", obj.get("risk_factors", []))
+    if obj.get("screen_flags_not_confirmed"):
+        field("Screen Flags Not Confirmed", obj["screen_flags_not_confirmed"])
+
+    heading("Assessment")
+    assess = notes.get("assessment", {})
+    field("Summary", assess.get("summary"))
+    field("Differential Diagnosis", assess.get("differential_diagnosis", []))
+
+    heading("Plan")
+    plan = notes.get("plan", {})
+    field("Immediate Actions", plan.get("immediate_actions"))
+    field("Recommendations", plan.get("recommendations"))
+
+    doc = SimpleDocTemplate(output_path, pagesize=LETTER)
+    doc.build(story)
+    return output_path
+
+
+class PDFRenderer:
+    """
+    Async front-end to a process pool of PDF renderers.
+    At most max_pending renders are in flight; extra callers wait their turn.
+    """
+
+    def __init__(self, workers: int = PDF_WORKERS, max_pending: int = PDF_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._warm = False
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.workers > 0 and self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        return self._executor
+
+    async def warm(self):
+        """
+        Starts the worker processes ahead of the first note so it doesn't pay the spawn cost.
+        """
+        if self._warm:
+            return
+        self._warm = True
+        executor = self._get_executor()
+        if executor is not None:
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*(loop.run_in_executor(executor, _init_worker) for _ in range(self.workers)))
+
+    async def render(self, notes: dict, output_path: str) -> str:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+
+        async with self._slots:
+            executor = self._get_executor()
+            if executor is None:
+                return await asyncio.to_thread(render_pdf, notes, output_path)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(executor, render_pdf, notes, output_path)
+
+    async def render_many(self, items: Iterable[Tuple[dict, str]]) -> List[str]:
+        """
+        Renders (notes, output_path) pairs in parallel across the pool.
+        """
+        return await asyncio.gather(*(self.render(notes, path) for notes, path in items))
+
+    async def render_json_files(self, json_paths: Iterable[str], output_dir: str) -> List[str]:
+        """
+        Batch-renders stored SOAP JSONs. Accepts raw note JSON or NoteJobQueue job files.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        items = []
+        for path in json_paths:
+            notes = load_notes(path)
+            if notes is None:
+                print(f"⚠️ Skipping {path}: no SOAP note found")
+                continue
+            name = os.path.splitext(os.path.basename(path))[0]
+            items.append((notes, os.path.join(output_dir, f"{name}_soap_note.pdf")))
+        return await self.render_many(items)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self._warm = False
+
+
+def load_notes(path: str) -> Optional[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    # NoteJobQueue job files wrap the note as {"result": {"notes": ...}}
+    if "result" in data:
+        data = (data.get("result") or {}).get("notes")
+    if not isinstance(data, dict) or "error" in data:
+        return None
+    return data
+
+
+# Shared by NoteTaker
+renderer = PDFRenderer()
+
+
+if __name__ == "__main__":
+    # python tools/pdf_renderer.py clinical_notes/jobs/*.json --out clinical_notes/
+    parser = argparse.ArgumentParser(description="Render stored SOAP note JSONs to PDF in parallel.")
+    parser.add_argument("json_paths", nargs="+")
+    parser.add_argument("--out", default="clinical_notes/")
+    parser.add_argument("--workers", type=int, default=PDF_WORKERS)
+    args = parser.parse_args()
+
+    batch_renderer = PDFRenderer(workers=args.workers)
+    try:
+        paths = asyncio.run(batch_renderer.render_json_files(args.json_paths, args.out))
+    finally:
+        batch_renderer.close()
+    print(f"✅ Rendered {len(paths)} PDF(s) into {args.out}")
@@ -1,48 +1,21 @@
 # prompt_builder.py
 
+import os
+from collections import OrderedDict
 from prompts import INTENT_DEFINITIONS, EMOTION_DEFINITIONS, RESPONSE_INSTRUCTIONS, OVERALL_INSTRUCTIONS
-from prompt_schemas import ParsedResponse, ResponsePlan
-from tools.response_planner import default_response_plan, build_response_plan
+from prompt_schemas import ParsedResponse
+from tools.response_planner import plan_text_for, default_plan_text
+from tools.intent_classifier import Classification
 
-def build_full_prompt(
-    patient_text: str = "",
-    memory_context: str = "",
-    parsed: ParsedResponse | None = None
-) -> str:
-    """
-    Build the full LLM prompt:
-    - Parsing instructions (intent, emotion, memory_candidates)
-    - Response plan instructions (tone, goals, constraints)
-    - Patient text and optional memory context
-
-    If parsed is None, this is the first turn and a default ResponsePlan is used.
-    """
-
-    # Step 1: Determine ResponsePlan
-    plan: ResponsePlan = build_response_plan(parsed) if parsed else default_response_plan()
-
-    # Step 2: Render ResponsePlan into text
-    instructions = []
-    if plan.tone:
-        instructions.append(f"- Tone: {plan.tone}")
-    if plan.goals:
-        instructions.append("Goals:")
-        for g in plan.goals:
-            instructions.append(f"- {g}")
-    if plan.constraints:
-        instructions.append("Constraints:")
-        for c in plan.constraints:
-            instructions.append(f"- {c}")
-    plan_text = "\n".join(instructions)
-
-    # Step 3: Include patient text (if any) and memory context
-    patient_block = f'Patient message:\n"""{patient_text}"""' if patient_text else "No patient message yet."
-    memory_block = f"Memory context:\n\"\"\"{memory_context}\"\"\"" if memory_context else ""
+# Set to 0 to resend the full instructions with every message
+PREFIX_CACHE_ENABLED = os.getenv("NEUROFLOW_PROMPT_PREFIX_CACHE", "1") != "0"
+MAX_PRIMED_THREADS = int(os.getenv("NEUROFLOW_PRIMED_THREADS_MAX", "4096"))  # LRU; an evicted thread just gets the instructions again
 
-    # Step 4: Compose full prompt
-    full_prompt = f"""
+# The instruction block never changes, so it is built once at import and only sent
+# with the first message of each thread. Backboard keeps it in the thread history.
+STATIC_INSTRUCTIONS = f"""
     {OVERALL_INSTRUCTIONS}
-    
+
     Analyze the patient's text and return a JSON object with the following fields:
 
     - intent: one of:
@@ -56,16 +29,108 @@ def build_full_prompt(
     - response: text to respond back to the patient
     {RESPONSE_INSTRUCTIONS}
 
-    - terminate: boolean whether the chat is over. This can be indicated by the patient, or alternatively, once you know enough information, 
+    - terminate: boolean whether the chat is over. This can be indicated by the patient, or alternatively, once you know enough information,
     terminate the chat yourself. This should take around 6 to 10 rounds, and NEVER more than 12. Ensure that your questions are efficient at gathering information on the patient.
+"""
 
+# Short stand-in for STATIC_INSTRUCTIONS on every later turn of the thread
+INSTRUCTIONS_REMINDER = """
+    Keep following the clinical prescreen instructions given at the start of this conversation.
+    Return a JSON object with the fields intent, emotion, memory_candidates, response and terminate.
+"""
+
+_TURN_TEMPLATE = """
     Response guidelines:
     {plan_text}
 
+    {history_block}
+
     {patient_block}
 
     {memory_block}
 
     Return ONLY valid JSON. Do not include explanations or extra text.
     """
-    return full_prompt
\ No newline at end of file
+
+# Threads whose history already contains STATIC_INSTRUCTIONS, least recently used first
+_primed_threads: "OrderedDict[str, None]" = OrderedDict()
+
+
+def needs_instructions(thread_id) -> bool:
+    if not PREFIX_CACHE_ENABLED or thread_id is None or str(thread_id) not in _primed_threads:
+        return True
+    _primed_threads.move_to_end(str(thread_id))
+    return False
+
+
+def mark_primed(thread_id):
+    """
+    Record that a prompt with the static instructions was delivered to this thread.
+    Only call this once the message was actually sent.
+    """
+    if thread_id is not None:
+        _primed_threads[str(thread_id)] = None
+        _primed_threads.move_to_end(str(thread_id))
+        while len(_primed_threads) > MAX_PRIMED_THREADS:
+            _primed_threads.popitem(last=False)
+
+
+def forget_primed(*thread_ids):
+    """
+    Drops ended threads, so the primed set only tracks live sessions.
+    """
+    for thread_id in thread_ids:
+        if thread_id is not None:
+            _primed_threads.pop(str(thread_id), None)
+
+
+def plan_text(parsed: ParsedResponse | None = None, classification: Classification | None = None) -> str:
+    """
+    The rendered response plan for a turn (memoized per intent/emotion).
+    Labels the local classifier is confident about for this message win over the
+    previous turn's; with neither, the default plan is used.
+    """
+    intent, emotion = (parsed.intent, parsed.emotion) if parsed else (None, None)
+    if classification is not None and classification.detected:
+        intent, emotion = classification.labels_or(intent, emotion)
+    if intent is None and emotion is None:
+        return default_plan_text()
+    return plan_text_for(intent, emotion)
+
+
+def build_full_prompt(
+    patient_text: str = "",
+    memory_context: str = "",
+    parsed: ParsedResponse | None = None,
+    include_instructions: bool = True,
+    history: str = "",
+    classification: Classification | None = None
+) -> str:
+    """
+    Build the full LLM prompt:
+    - Parsing instructions (intent, emotion, memory_candidates), only if include_instructions
+    - Response plan instructions (tone, goals, constraints)
+    - Patient text and optional memory context
+
+    If parsed is None, this is the first turn and a default ResponsePlan is used.
+    classification (the local classifier's labels for patient_text) plans this turn directly.
+    history carries earlier exchanges over when a session moves to a fresh thread.
+    """
+
+    # Step 1 + 2: Determine the ResponsePlan and render it (memoized per intent/emotion)
+    turn_plan = plan_text(parsed, classification)
+
+    # Step 3: Include patient text (if any) and memory context
+    patient_block = f'Patient message:\n"""{patient_text}"""' if patient_text else "No patient message yet."
+    memory_block = f"Memory context:\n\"\"\"{memory_context}\"\"\"" if memory_context else ""
+    history_block = f"Conversation so far:\n\"\"\"{history}\"\"\"" if history else ""
+
+    # Step 4: Compose full prompt from the cached prefix and the per-turn part
+    turn_prompt = _TURN_TEMPLATE.format(
+        plan_text=turn_plan,
+        history_block=history_block,
+        patient_block=patient_block,
+        memory_block=memory_block
+    )
+    prefix = STATIC_INSTRUCTIONS if include_instructions else INSTRUCTIONS_REMINDER
+    return prefix + turn_prompt
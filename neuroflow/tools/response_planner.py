@@ -1,38 +1,106 @@
+import os
+import json
+from functools import lru_cache
 from prompt_schemas import ResponsePlan, ParsedResponse
 
 """
 Responsible for dictating the TONE of each response from the LLM
+
+Plans come from response_rules.json (or NEUROFLOW_RESPONSE_RULES):
+- "default": the plan for the first turn, before anything is known about the patient
+- "intents": per-intent tone, goals and constraints (replace the neutral plan)
+- "emotions": per-emotion additions; "tone" overrides, "goals"/"constraints" are appended
+
+There are only a handful of (intent, emotion) combinations, so the rendered plan text
+is memoized and planning a turn is a dict lookup.
 """
 
-def build_response_plan(parsed: ParsedResponse) -> ResponsePlan:
-        plan = ResponsePlan()
+RULES_PATH = os.getenv(
+    "NEUROFLOW_RESPONSE_RULES",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "response_rules.json")
+)
 
-        if parsed.intent == "venting":
-            plan.tone = "empathetic"
-            plan.goals = ["Validate feelings", "Encourage expression"]
-            plan.constraints = ["Do not give advice"]
+_rules = None
 
-        elif parsed.intent == "question":
-            plan.tone = "clear"
-            plan.goals = ["Answer the question"]
-            plan.constraints = ["Be concise"]
 
-        elif parsed.intent == "worry":
-            plan.tone = "reassuring"
-            plan.goals = ["Acknowledge concern", "Reduce anxiety"]
-            plan.constraints = ["Avoid alarmist language"]
+def load_rules() -> dict:
+    global _rules
+    if _rules is None:
+        with open(RULES_PATH, "r", encoding="utf-8") as f:
+            _rules = json.load(f)
+    return _rules
 
-        if parsed.emotion == "anxious":
-            plan.constraints.append("Use grounding language")
 
-        return plan
+def reload_rules():
+    """
+    Re-reads the rules file and drops every memoized plan.
+    """
+    global _rules
+    _rules = None
+    plan_for.cache_clear()
+    plan_text_for.cache_clear()
+    default_plan_text.cache_clear()
 
-def default_response_plan() -> ResponsePlan:
+
+def _plan_from_rule(rule: dict) -> ResponsePlan:
     return ResponsePlan(
-        tone="warm and professional",
-        goals=["Establish rapport", "Invite the patient to share"],
-        constraints=[
-            "Do not make assumptions",
-            "Ask at most one open-ended question"
-        ]
-    )
\ No newline at end of file
+        tone=rule.get("tone", "neutral"),
+        goals=list(rule.get("goals", [])),
+        constraints=list(rule.get("constraints", []))
+    )
+
+
+@lru_cache(maxsize=256)
+def plan_for(intent: str | None, emotion: str | None) -> ResponsePlan:
+    """
+    Memoized plan for an (intent, emotion) pair. Shared instance, do not mutate it.
+    """
+    rules = load_rules()
+    plan = _plan_from_rule(rules.get("intents", {}).get(intent, {}))
+
+    emotion_rule = rules.get("emotions", {}).get(emotion, {})
+    if "tone" in emotion_rule:
+        plan.tone = emotion_rule["tone"]
+    plan.goals.extend(emotion_rule.get("goals", []))
+    plan.constraints.extend(emotion_rule.get("constraints", []))
+    return plan
+
+
+def render_plan(plan: ResponsePlan) -> str:
+    instructions = []
+    if plan.tone:
+        instructions.append(f"- Tone: {plan.tone}")
+    if plan.goals:
+        instructions.append("Goals:")
+        for g in plan.goals:
+            instructions.append(f"- {g}")
+    if plan.constraints:
+        instructions.append("Constraints:")
+        for c in plan.constraints:
+            instructions.append(f"- {c}")
+    return "\n".join(instructions)
+
+
+@lru_cache(maxsize=256)
+def plan_text_for(intent: str | None, emotion: str | None) -> str:
+    return render_plan(plan_for(intent, emotion))
+
+
+@lru_cache(maxsize=1)
+def default_plan_text() -> str:
+    return render_plan(default_response_plan())
+
+
+def build_response_plan(parsed: ParsedResponse) -> ResponsePlan:
+    plan = plan_for(parsed.intent, parsed.emotion)
+    # Callers get their own copy so the memoized plan stays untouched
+    return ResponsePlan(
+        tone=plan.tone,
+        goals=list(plan.goals),
+        constraints=list(plan.constraints),
+        context=dict(plan.context)
+    )
+
+
+def default_response_plan() -> ResponsePlan:
+    return _plan_from_rule(load_rules()["default"])
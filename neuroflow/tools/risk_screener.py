@@ -0,0 +1,277 @@
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+import tracing
+
+"""
+Deterministic risk/crisis screen that runs on every patient message before the LLM call.
+
+Until now the first thing to notice a disclosure like "I want to end it all" was the LLM,
+a network round-trip later. This screen matches the message against a curated list of
+risk phrases with an Aho-Corasick automaton over words, so every phrase is found in a
+single pass over the message (a few microseconds for a typical message) and a match
+always lands on word boundaries.
+
+- each phrase belongs to a category; "crisis" categories trigger escalation, the others
+  are only recorded for the clinician
+- a match right after a negation in the same clause ("I would never hurt myself", "not
+  suicidal") is ignored; "No, I want to die" is not negated, and neither is a negation
+  that reads as a compulsion ("I can't stop thinking about suicide")
+- "kms" right after a number or quantity ("ran 5 kms") is a distance, not a disclosure
+- a crisis match about someone else ("my brother attempted suicide", "she wants to kill
+  them") does not escalate: the nearest subject before it in the clause is a third party
+  and not the patient, so it is recorded as a concern instead
+- matched categories become screen-flagged objective.risk_factors of the session's SOAP
+  draft, which the end-of-session polish can confirm or dismiss
+
+The screen complements the LLM's judgement; it does not replace it. Phrases err on the
+side of recall: a false flag costs a clinician a glance, a missed one costs far more.
+"""
+
+ESCALATION = os.getenv("NEUROFLOW_RISK_ESCALATION", "1") == "1"  # 0: flag only, never skip the LLM
+CRISIS_RESOURCES = os.getenv(
+    "NEUROFLOW_CRISIS_RESOURCES",
+    "If you are in immediate danger, please call your local emergency number now. "
+    "In the US you can call or text 988 (Suicide & Crisis Lifeline) at any time."
+)
+CRISIS_RESPONSE = (
+    "Thank you for telling me, I'm really glad you did. What you're describing sounds serious, "
+    "and your safety matters most right now. " + CRISIS_RESOURCES + " "
+    "I've flagged this so a clinician can follow up with you as soon as possible. "
+    "Are you safe right now?"
+)
+
+CRISIS = "crisis"
+CONCERN = "concern"
+THIRD_PARTY = "third_party_crisis"  # a crisis category matched in a clause about someone else
+THIRD_PARTY_LABEL = "Crisis disclosed about someone else"
+
+_WORD_RE = re.compile(r"[a-z0-9]+|[.,;:!?]")  # punctuation is kept as a clause boundary
+_APOSTROPHES = re.compile(r"['’]")
+_NEGATIONS = frozenset("not no never dont didnt wouldnt wont isnt wasnt cant cannot without".split())
+_NEGATION_WINDOW = 3  # words before a match, within its clause, that may negate it
+# "can't stop", "can't help", "can't get rid of": the negation makes it worse, not untrue
+_COMPULSIONS = (("stop",), ("help",), ("get", "rid", "of"))
+_QUANTITIES = frozenset("few several many couple more hundred hundreds thousand thousands".split())
+_BOUNDARIES = frozenset(".,;:!?")
+_FIRST_PERSON = frozenset("i im ive id ill me myself".split())
+_THIRD_PARTY = frozenset(
+    "he hes she shes they theyre his her their them someone somebody brother sister mom mum mother dad "
+    "father son daughter friend friends cousin uncle aunt husband wife partner boyfriend girlfriend "
+    "grandma grandpa grandmother grandfather roommate classmate coworker colleague neighbor neighbour".split()
+)
+
+# category -> (label for the note, severity, phrases). Apostrophes are dropped when matching,
+# so "don't" and "dont" are the same phrase.
+RISK_PHRASES: Dict[str, Tuple[str, str, Tuple[str, ...]]] = {
+    "suicidal_ideation": ("Suicidal ideation", CRISIS, (
+        "kill myself", "killing myself", "end my life", "ending my life", "take my own life",
+        "taking my own life", "want to die", "wanna die", "wish i was dead", "wish i were dead",
+        "better off dead", "better off without me", "suicidal", "commit suicide", "committing suicide",
+        "thinking about suicide", "thinking of suicide", "thoughts of suicide", "thought about suicide",
+        "considering suicide", "attempt suicide", "attempted suicide", "suicide attempt", "end it all",
+        "ending it all", "no reason to live", "don't want to live", "don't want to be alive",
+        "don't want to wake up", "unalive myself", "kms", "killed myself", "tried to kill myself",
+        "tried killing myself", "tried to end my life", "tried to end it all", "wanted to die",
+        "wished i was dead", "wished i were dead",
+    )),
+    "suicide_plan": ("Suicide plan or access to means", CRISIS, (
+        "suicide note", "goodbye letter", "saving up pills", "stockpiling pills", "take an overdose",
+        "taking an overdose", "took an overdose", "overdose on", "i overdosed", "want to overdose",
+        "going to overdose", "jump off", "hang myself", "hanging myself", "slit my wrists", "bought a gun",
+        "overdosed on", "tried to overdose", "tried to hang myself", "hanged myself",
+        "slit my wrist", "wrote a suicide note",
+    )),
+    "self_harm": ("Self-harm", CRISIS, (
+        "cut myself", "cutting myself", "hurt myself", "hurting myself", "harm myself", "harming myself",
+        "self harm", "self harming", "burn myself", "burning myself", "punish myself", "harmed myself",
+        "burned myself", "burnt myself",
+    )),
+    "harm_to_others": ("Thoughts of harming others", CRISIS, (
+        "kill him", "kill her", "kill them", "kill someone", "kill somebody", "hurt someone",
+        "hurt somebody", "hurt other people", "make them pay",
+    )),
+    "unsafe_environment": ("Abuse or unsafe environment", CONCERN, (
+        "hits me", "hit me", "beats me", "beat me", "abuses me", "abused me", "abusing me", "raped",
+        "sexually assaulted", "not safe at home", "afraid to go home", "scared to go home", "threatens me",
+        "threatened me", "afraid for my life",
+    )),
+    "substance_use": ("Substance misuse", CONCERN, (
+        "drinking every day", "drink every day", "drunk every day", "blackout", "blacked out",
+        "relapsed", "using again", "high every day", "can't stop drinking", "can't stop using",
+    )),
+    "hopelessness": ("Hopelessness", CONCERN, (
+        "hopeless", "no way out", "no point in anything", "can't go on", "give up on life",
+        "a burden", "burden to everyone", "worthless", "nothing will ever get better",
+    )),
+    "psychotic_symptoms": ("Possible psychotic symptoms", CONCERN, (
+        "hearing voices", "hear voices", "voices tell me", "voices telling me", "seeing things that",
+        "someone is watching me", "being followed", "controlling my thoughts",
+    )),
+}
+
+
+def words(text: str) -> List[str]:
+    return _WORD_RE.findall(_APOSTROPHES.sub("", (text or "").lower()))
+
+
+class PhraseMatcher:
+    """
+    Aho-Corasick automaton over word sequences. Built once; matching is one pass over the
+    message's words, following failure links instead of restarting at every position.
+    """
+
+    def __init__(self, phrases: Iterable[Tuple[str, object]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, object]]] = [[]]  # state -> (phrase length, value)
+        for phrase, value in phrases:
+            self._add(words(phrase), value)
+        self._link()
+
+    def _add(self, tokens: List[str], value: object):
+        if not tokens:
+            return
+        state = 0
+        for token in tokens:
+            nxt = self._goto[state].get(token)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._goto[state][token] = nxt
+            state = nxt
+        self._out[state].append((len(tokens), value))
+
+    def _link(self):
+        # Breadth-first, so a state's failure target is always finished before the state itself
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for token, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(token, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find(self, tokens: List[str]) -> List[Tuple[int, int, object]]:
+        """
+        All matches as (start, end, value), end exclusive, overlapping matches included.
+        """
+        matches = []
+        state = 0
+        for i, token in enumerate(tokens):
+            while state and token not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(token, 0)
+            for length, value in self._out[state]:
+                matches.append((i + 1 - length, i + 1, value))
+        return matches
+
+
+@dataclass(frozen=True)
+class RiskFlag:
+    category: str
+    label: str
+    severity: str
+    evidence: str  # the matched words, as normalized for matching
+
+
+@dataclass
+class Screening:
+    flags: List[RiskFlag] = field(default_factory=list)
+
+    @property
+    def crisis(self) -> bool:
+        return any(flag.severity == CRISIS for flag in self.flags)
+
+    @property
+    def categories(self) -> List[str]:
+        return list(dict.fromkeys(flag.category for flag in self.flags))
+
+
+def _negated(tokens: List[str], start: int) -> bool:
+    for i in range(start - 1, max(0, start - _NEGATION_WINDOW) - 1, -1):
+        token = tokens[i]
+        if token in _BOUNDARIES:
+            return False
+        if token in _NEGATIONS and not any(
+            tuple(tokens[i + 1:i + 1 + len(compulsion)]) == compulsion for compulsion in _COMPULSIONS
+        ):
+            return True
+    return False
+
+
+def _is_distance(tokens: List[str], start: int, end: int) -> bool:
+    if tokens[start:end] != ["kms"] or start == 0:
+        return False
+    return tokens[start - 1].isdigit() or tokens[start - 1] in _QUANTITIES
+
+
+def _about_someone_else(tokens: List[str], start: int) -> bool:
+    # The nearest subject before the match in its clause; none means the patient speaks of themself
+    for token in reversed(tokens[:start]):
+        if token in _BOUNDARIES or token in _FIRST_PERSON:
+            return False
+        if token in _THIRD_PARTY:
+            return True
+    return False
+
+
+class RiskScreener:
+    def __init__(self, phrases: Dict[str, Tuple[str, str, Tuple[str, ...]]] = RISK_PHRASES):
+        self.categories = {category: (label, severity) for category, (label, severity, _) in phrases.items()}
+        self.matcher = PhraseMatcher(
+            (phrase, category) for category, (_, _, category_phrases) in phrases.items() for phrase in category_phrases
+        )
+
+    def screen(self, text: str) -> Screening:
+        tokens = words(text)
+        flags: List[RiskFlag] = []
+        seen = set()
+        for start, end, category in self.matcher.find(tokens):
+            if _negated(tokens, start) or _is_distance(tokens, start, end):
+                continue
+            label, severity = self.categories[category]
+            if severity == CRISIS and _about_someone_else(tokens, start):
+                category, label, severity = THIRD_PARTY, THIRD_PARTY_LABEL, CONCERN
+            if category in seen:
+                continue
+            seen.add(category)
+            flags.append(RiskFlag(category, label, severity, " ".join(tokens[start:end])))
+        for flag in flags:
+            tracing.incr("neuroflow_risk_flags_total", category=flag.category)
+        return Screening(flags)
+
+
+_screener: Optional[RiskScreener] = None
+
+
+def get_screener() -> RiskScreener:
+    global _screener
+    if _screener is None:
+        _screener = RiskScreener()
+    return _screener
+
+
+def screen(text: str) -> Screening:
+    return get_screener().screen(text)
+
+
+def crisis_reply(screening: Screening) -> dict:
+    """
+    The crisis response in the shape of an LLM reply, so the rest of the turn handles it as usual.
+    """
+    labels = ", ".join(dict.fromkeys(flag.label for flag in screening.flags))
+    return {
+        "response": CRISIS_RESPONSE,
+        "intent": "report",
+        "emotion": "hopeless",
+        "memory_candidates": {"short_term": [], "long_term": [f"Risk screen flagged: {labels}"]},
+        "entities": {},
+        "terminate": False
+    }
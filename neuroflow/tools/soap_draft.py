@@ -0,0 +1,157 @@
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+from prompt_schemas import ParsedResponse
+from tools.risk_screener import Screening
+
+"""
+Rolling SOAP draft, kept up to date locally after every turn.
+
+Every turn already yields intent, emotion, entities and memory candidates. Merging them
+here as the session goes means the SOAP note is mostly written by the time the chat
+ends, so NoteTaker only needs a short polish call (NOTES_MODE="polish") or no call at
+all (NOTES_MODE="draft") instead of re-reading the whole conversation.
+
+Risk flags from the local screen (tools/risk_screener.py) are merged as soon as the
+message arrives, before the LLM call, so they reach objective.risk_factors even if that
+call fails. They are marked "screen-flagged": a phrase match, not a clinical finding,
+until the end-of-session polish confirms or dismisses them.
+
+to_soap() returns the same structure the scribe prompt asks the LLM for.
+"""
+
+MAX_STATEMENTS = 40  # patient statements kept for the HPI fallback
+SCREEN_FLAGGED = "screen-flagged"  # marks risk factors that come from the phrase screen
+
+
+def _add_unique(target: List[str], items: List[str], seen: set):
+    for item in items:
+        key = " ".join(item.split()).lower()
+        if key and key not in seen:
+            seen.add(key)
+            target.append(item.strip())
+
+
+@dataclass
+class SOAPDraft:
+    thread_id: str
+    turns: int = 0
+    statements: List[str] = field(default_factory=list)  # what the patient said, in order
+    findings: List[str] = field(default_factory=list)  # long-term memory candidates
+    context: List[str] = field(default_factory=list)  # short-term memory candidates
+    entities: Dict[str, str] = field(default_factory=dict)
+    intents: Counter = field(default_factory=Counter)
+    emotions: List[str] = field(default_factory=list)
+    risks: Dict[str, str] = field(default_factory=dict)  # risk label -> first words that flagged it
+    escalated: bool = False  # the crisis response was already given this session
+    _seen: set = field(default_factory=set, repr=False)
+
+    def update(self, parsed: ParsedResponse):
+        """
+        Merges one turn into the draft. Cheap enough to run on every turn.
+        """
+        self.turns += 1
+        text = (parsed.input_text or "").strip()
+        if text:
+            self.statements.append(text)
+            del self.statements[:-MAX_STATEMENTS]
+
+        candidates = parsed.memory_candidates or {}
+        _add_unique(self.findings, candidates.get("long_term", []), self._seen)
+        _add_unique(self.context, candidates.get("short_term", []), self._seen)
+
+        for key, value in (parsed.entities or {}).items():
+            if value not in (None, ""):
+                self.entities[str(key)] = str(value)
+        if parsed.intent:
+            self.intents[parsed.intent] += 1
+        if parsed.emotion and (not self.emotions or self.emotions[-1] != parsed.emotion):
+            self.emotions.append(parsed.emotion)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "thread_id": self.thread_id,
+            "turns": self.turns,
+            "statements": self.statements,
+            "findings": self.findings,
+            "context": self.context,
+            "entities": self.entities,
+            "intents": dict(self.intents),
+            "emotions": self.emotions,
+            "risks": self.risks,
+            "escalated": self.escalated
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SOAPDraft":
+        draft = cls(
+            thread_id=data["thread_id"],
+            turns=data.get("turns", 0),
+            statements=list(data.get("statements", [])),
+            findings=list(data.get("findings", [])),
+            context=list(data.get("context", [])),
+            entities=dict(data.get("entities", {})),
+            intents=Counter(data.get("intents", {})),
+            emotions=list(data.get("emotions", [])),
+            risks=dict(data.get("risks", {})),
+            escalated=bool(data.get("escalated", False))
+        )
+        draft._seen = {" ".join(item.split()).lower() for item in draft.findings + draft.context}
+        return draft
+
+    def add_screening(self, screening: Screening):
+        for flag in screening.flags:
+            self.risks.setdefault(flag.label, flag.evidence)
+
+    def risk_factors(self) -> List[str]:
+        return [f'{label} ({SCREEN_FLAGGED}: "{evidence}")' for label, evidence in self.risks.items()]
+
+    def chief_complaint(self) -> str:
+        if self.findings:
+            return self.findings[0]
+        for statement in self.statements:
+            if len(statement.split()) > 3:
+                return statement
+        return "Not established during the session"
+
+    def emotional_state(self) -> str:
+        if not self.emotions:
+            return "Not assessed"
+        latest = self.emotions[-1]
+        if len(self.emotions) == 1:
+            return latest
+        return f"{latest} at the end of the session (course: {' -> '.join(self.emotions)})"
+
+    def to_soap(self) -> dict:
+        findings = self.findings or self.statements[-5:]
+        intents = ", ".join(f"{intent} x{count}" for intent, count in self.intents.most_common())
+        observations = [f"{self.turns} patient exchanges"]
+        if intents:
+            observations.append(f"message types: {intents}")
+        if self.context:
+            observations.append("session context: " + "; ".join(self.context))
+        immediate_actions = "Clinician review of the prescreen"
+        if self.escalated:
+            immediate_actions = ("Urgent: crisis disclosure during the session, crisis resources were given. "
+                                 "Contact the patient for a safety assessment")
+
+        return {
+            "patient_id": self.entities.get("name") or self.entities.get("patient_id") or "unknown",
+            "subjective": {
+                "chief_complaint": self.chief_complaint(),
+                "history_of_present_illness": "; ".join(findings) or "No history gathered",
+                "emotional_state": self.emotional_state()
+            },
+            "objective": {
+                "observations": ". ".join(observations),
+                "risk_factors": self.risk_factors()
+            },
+            "assessment": {
+                "summary": "Draft assembled from the intake session; pending clinician review.",
+                "differential_diagnosis": []
+            },
+            "plan": {
+                "immediate_actions": immediate_actions,
+                "recommendations": "Follow up on the reported concerns with a licensed professional"
+            }
+        }
@@ -0,0 +1,452 @@
+import io
+import os
+import math
+import time
+import wave
+import argparse
+import threading
+from array import array
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import BinaryIO, Callable, Deque, Iterable, List, Optional, Union
+import tracing
+
+"""
+Streaming speech-to-text for the voice frontends.
+
+Audio never touches the disk: WAV bytes from the browser or frames from the microphone
+are handled as in-memory PCM. An energy-based voice activity detector splits an utterance
+at short pauses and ends it at a longer one. Each finished segment goes to the recognizer
+right away on a worker thread, so most of the utterance is already transcribed by the time
+the patient stops speaking. The microphone's ambient-noise threshold is measured once per
+process instead of on every turn.
+
+Recognizers are pluggable (NEUROFLOW_STT_BACKEND): "google" (speech_recognition's web
+API, the default), or the offline "sphinx" and "whisper" backends, which let recordings
+such as temp_input.wav be transcribed without a network:
+
+    python -m tools.stt ../temp_input.wav --backend sphinx
+"""
+
+STT_BACKEND = os.getenv("NEUROFLOW_STT_BACKEND", "google")  # google | sphinx | whisper
+STT_LANGUAGE = os.getenv("NEUROFLOW_STT_LANGUAGE", "en-US")
+STT_WORKERS = int(os.getenv("NEUROFLOW_STT_WORKERS", "2"))  # segments recognized at once
+SEGMENT_PAUSE = float(os.getenv("NEUROFLOW_STT_SEGMENT_PAUSE", "0.35"))  # seconds; closes a segment
+END_PAUSE = float(os.getenv("NEUROFLOW_STT_END_PAUSE", "0.9"))  # seconds; ends the utterance
+CALIBRATION_SECONDS = 1.0
+PRE_ROLL = 0.2  # seconds of audio kept before speech starts, so first syllables aren't clipped
+MIN_SEGMENT = 0.3  # shorter segments (clicks, breaths) are merged into the next one
+MIN_ENERGY = 300.0  # RMS floor for the speech threshold on 16-bit audio
+SPEECH_RATIO = 1.6  # speech threshold = ambient RMS * ratio
+
+
+@dataclass
+class PCM:
+    """
+    Mono 16-bit PCM in memory.
+    """
+
+    data: bytes
+    sample_rate: int
+    sample_width: int = 2
+
+    @property
+    def duration(self) -> float:
+        return len(self.data) / (self.sample_rate * self.sample_width)
+
+    def to_wav(self) -> bytes:
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as out:
+            out.setnchannels(1)
+            out.setsampwidth(self.sample_width)
+            out.setframerate(self.sample_rate)
+            out.writeframes(self.data)
+        return buffer.getvalue()
+
+    def to_audio_data(self):
+        import speech_recognition as sr
+
+        return sr.AudioData(self.data, self.sample_rate, self.sample_width)
+
+
+def _to_mono16(data: bytes, channels: int, sample_width: int) -> bytes:
+    if sample_width != 2:
+        raise ValueError(f"Expected 16-bit PCM audio, got {8 * sample_width}-bit")
+    if channels == 1:
+        return data
+    samples = array("h")
+    samples.frombytes(data[: len(data) - len(data) % (2 * channels)])
+    mono = array("h", (
+        sum(samples[i:i + channels]) // channels for i in range(0, len(samples), channels)
+    ))
+    return mono.tobytes()
+
+
+def load_wav(source: Union[bytes, BinaryIO]) -> PCM:
+    """
+    Reads a WAV file from bytes or a file-like object (e.g. st.audio_input's buffer).
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    with wave.open(source, "rb") as wav:
+        data = wav.readframes(wav.getnframes())
+        return PCM(_to_mono16(data, wav.getnchannels(), wav.getsampwidth()), wav.getframerate())
+
+
+def rms(frame: bytes) -> float:
+    samples = array("h")
+    samples.frombytes(frame[: len(frame) - len(frame) % 2])
+    if not samples:
+        return 0.0
+    return math.sqrt(sum(s * s for s in samples) / len(samples))
+
+
+class EnergyVAD:
+    """
+    Speech/silence decision per frame from its RMS energy against a calibrated threshold.
+    """
+
+    def __init__(self, threshold: float = MIN_ENERGY, ratio: float = SPEECH_RATIO):
+        self.threshold = threshold
+        self.ratio = ratio
+        self.calibrated = False
+
+    def calibrate(self, frames: Iterable[bytes]):
+        energies = [rms(frame) for frame in frames]
+        if energies:
+            ambient = sorted(energies)[len(energies) // 2]
+            self.threshold = max(MIN_ENERGY, ambient * self.ratio)
+        self.calibrated = True
+
+    def is_speech(self, frame: bytes) -> bool:
+        return rms(frame) > self.threshold
+
+
+class Endpointer:
+    """
+    Cuts a stream of PCM frames into segments at short pauses and reports the end of the
+    utterance after a long pause. push() returns a finished segment or None.
+    """
+
+    def __init__(
+        self,
+        vad: EnergyVAD,
+        sample_rate: int,
+        segment_pause: float = SEGMENT_PAUSE,
+        end_pause: float = END_PAUSE,
+        sample_width: int = 2
+    ):
+        self.vad = vad
+        self.bytes_per_second = sample_rate * sample_width
+        self.segment_pause = segment_pause
+        self.end_pause = end_pause
+        self.started = False
+        self.ended = False
+        self.speech_seconds = 0.0
+        self._segment = bytearray()
+        self._segment_speech = 0.0
+        self._silence = 0.0  # since the last speech frame
+        self._pre_roll: Deque[bytes] = deque()
+        self._pre_roll_seconds = 0.0
+
+    def _seconds(self, frame: bytes) -> float:
+        return len(frame) / self.bytes_per_second
+
+    def push(self, frame: bytes) -> Optional[bytes]:
+        if self.ended:
+            return None
+        seconds = self._seconds(frame)
+        if self.vad.is_speech(frame):
+            self.started = True
+            if not self._segment:
+                self._segment.extend(b"".join(self._pre_roll))
+                self._pre_roll.clear()
+                self._pre_roll_seconds = 0.0
+            self._segment.extend(frame)
+            self._segment_speech += seconds
+            self.speech_seconds += seconds
+            self._silence = 0.0
+            return None
+
+        self._silence += seconds
+        if not self._segment_speech:
+            # Before speech or between segments: keep only a short pre-roll of silence
+            self._pre_roll.append(frame)
+            self._pre_roll_seconds += seconds
+            while self._pre_roll and self._pre_roll_seconds - self._seconds(self._pre_roll[0]) >= PRE_ROLL:
+                self._pre_roll_seconds -= self._seconds(self._pre_roll.popleft())
+            if self.started and self._silence >= self.end_pause:
+                self.ended = True
+            return None
+
+        self._segment.extend(frame)
+        if self._silence >= self.end_pause:
+            self.ended = True
+            return self.flush()
+        if self._silence >= self.segment_pause and self._segment_speech >= MIN_SEGMENT:
+            return self.flush()
+        return None
+
+    def flush(self) -> Optional[bytes]:
+        """
+        Returns the buffered segment if it holds any speech, e.g. when the input runs out.
+        """
+        if not self._segment_speech:
+            return None
+        segment, self._segment = bytes(self._segment), bytearray()
+        self._segment_speech = 0.0
+        return segment
+
+
+# --- recognizers ---
+
+class STTBackend:
+    """
+    Transcribes one segment of speech. Returns "" for audio without intelligible words;
+    service failures raise. Implementations may block; they run on worker threads.
+    """
+
+    name = "base"
+
+    def __init__(self, language: str = STT_LANGUAGE):
+        self.language = language
+
+    def recognize(self, pcm: PCM) -> str:
+        raise NotImplementedError
+
+
+class _SpeechRecognitionBackend(STTBackend):
+    method = ""
+
+    def __init__(self, language: str = STT_LANGUAGE):
+        super().__init__(language)
+        import speech_recognition as sr
+
+        self._sr = sr
+        self._recognizer = sr.Recognizer()
+
+    def _call(self, audio):
+        return getattr(self._recognizer, self.method)(audio, language=self.language)
+
+    def recognize(self, pcm: PCM) -> str:
+        try:
+            return (self._call(pcm.to_audio_data()) or "").strip()
+        except self._sr.UnknownValueError:
+            return ""
+
+
+class GoogleBackend(_SpeechRecognitionBackend):
+    name = "google"
+    method = "recognize_google"
+
+
+class SphinxBackend(_SpeechRecognitionBackend):
+    """
+    Offline CMU Sphinx recognizer (pip install pocketsphinx).
+    """
+
+    name = "sphinx"
+    method = "recognize_sphinx"
+
+
+class WhisperBackend(_SpeechRecognitionBackend):
+    """
+    Offline local Whisper model (pip install openai-whisper).
+    """
+
+    name = "whisper"
+    method = "recognize_whisper"
+
+    def _call(self, audio):
+        language = self.language.split("-")[0].lower()
+        return self._recognizer.recognize_whisper(audio, model=os.getenv("NEUROFLOW_WHISPER_MODEL", "base.en"),
+                                                  language="english" if language == "en" else language)
+
+
+BACKENDS = {
+    "google": GoogleBackend,
+    "sphinx": SphinxBackend,
+    "whisper": WhisperBackend,
+}
+
+
+def get_backend(name: str = STT_BACKEND, language: str = STT_LANGUAGE) -> STTBackend:
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown STT backend: {name} (expected one of {', '.join(BACKENDS)})")
+    return BACKENDS[name](language)
+
+
+# --- transcription ---
+
+class Transcription:
+    """
+    Segments of one utterance, recognized in parallel and joined in order.
+    """
+
+    def __init__(self, backend: STTBackend, executor: ThreadPoolExecutor, sample_rate: int):
+        self.backend = backend
+        self.executor = executor
+        self.sample_rate = sample_rate
+        self._futures: List[Future] = []
+
+    def _recognize(self, segment: bytes) -> str:
+        with tracing.span("stt_recognize", backend=self.backend.name, seconds=round(len(segment) / (2 * self.sample_rate), 2)):
+            return self.backend.recognize(PCM(segment, self.sample_rate))
+
+    def submit(self, segment: Optional[bytes]):
+        if segment:
+            self._futures.append(self.executor.submit(self._recognize, segment))
+
+    def text(self) -> str:
+        parts = []
+        for future in self._futures:
+            try:
+                parts.append(future.result())
+            except Exception as e:
+                tracing.incr("neuroflow_stt_failures_total", backend=self.backend.name)
+                print(f"⚠️ Speech recognition failed: {type(e).__name__}: {e}")
+        return " ".join(part for part in parts if part)
+
+
+class SpeechToText:
+    """
+    Endpointing plus chunked recognition over in-memory audio or a live microphone.
+    """
+
+    def __init__(self, backend: Optional[STTBackend] = None, workers: int = STT_WORKERS):
+        self.backend = backend or get_backend()
+        self.executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="stt")
+        self.vad = EnergyVAD()
+        self._calibration_lock = threading.Lock()
+
+    def transcribe_pcm(self, pcm: PCM, frame_seconds: float = 0.03) -> str:
+        """
+        Transcribes a complete recording. Its pauses split it into segments that are
+        recognized in parallel; without calibration, the quietest frames set the threshold.
+        """
+        frame_bytes = max(2, int(pcm.sample_rate * frame_seconds) * 2)
+        frames = [pcm.data[i:i + frame_bytes] for i in range(0, len(pcm.data), frame_bytes)]
+        vad = self.vad
+        if not vad.calibrated:
+            vad = EnergyVAD()
+            quiet = sorted(frames, key=rms)[: max(1, len(frames) // 10)]
+            vad.calibrate(quiet)
+
+        transcription = Transcription(self.backend, self.executor, pcm.sample_rate)
+        endpointer = Endpointer(vad, pcm.sample_rate, end_pause=float("inf"))
+        with tracing.span("stt_transcribe", seconds=round(pcm.duration, 2)):
+            for frame in frames:
+                transcription.submit(endpointer.push(frame))
+            transcription.submit(endpointer.flush())
+            return transcription.text()
+
+    def transcribe_wav(self, source: Union[bytes, BinaryIO]) -> str:
+        return self.transcribe_pcm(load_wav(source))
+
+    def calibrate(self, read_frame: Callable[[], bytes], sample_rate: int, seconds: float = CALIBRATION_SECONDS):
+        """
+        Measures the ambient noise once; later listens reuse the threshold.
+        """
+        with self._calibration_lock:
+            if self.vad.calibrated:
+                return
+            frames, heard = [], 0.0
+            while heard < seconds:
+                frame = read_frame()
+                frames.append(frame)
+                heard += len(frame) / (2 * sample_rate)
+            self.vad.calibrate(frames)
+
+    def listen_stream(
+        self,
+        read_frame: Callable[[], bytes],
+        sample_rate: int,
+        timeout: float = 10.0,
+        max_seconds: float = 60.0,
+        on_speech: Optional[Callable[[], None]] = None,
+        vad: Optional[EnergyVAD] = None
+    ) -> str:
+        """
+        Reads frames until the utterance ends, recognizing each segment while the patient is
+        still speaking. Returns "" if no speech starts within timeout seconds.
+        on_speech is called once when speech starts (e.g. to stop playback on barge-in).
+        """
+        endpointer = Endpointer(vad or self.vad, sample_rate)
+        transcription = Transcription(self.backend, self.executor, sample_rate)
+        waited = heard = 0.0
+        started_at = None
+        with tracing.span("stt_listen"):
+            while not endpointer.ended:
+                frame = read_frame()
+                seconds = len(frame) / (2 * sample_rate)
+                transcription.submit(endpointer.push(frame))
+                heard += seconds
+                if not endpointer.started:
+                    waited += seconds
+                    if waited >= timeout:
+                        return ""
+                elif started_at is None:
+                    started_at = heard
+                    if on_speech is not None:
+                        on_speech()
+                elif heard - started_at >= max_seconds:
+                    transcription.submit(endpointer.flush())
+                    break
+            ended = time.perf_counter()
+            text = transcription.text()
+            # Time the patient waits after they stop talking: the last segment's recognition
+            tracing.observe("neuroflow_stt_tail_seconds", time.perf_counter() - ended)
+            return text
+
+    def listen_microphone(
+        self,
+        timeout: float = 10.0,
+        sample_rate: int = 16000,
+        on_speech: Optional[Callable[[], None]] = None,
+        vad: Optional[EnergyVAD] = None
+    ) -> str:
+        import speech_recognition as sr
+
+        with sr.Microphone(sample_rate=sample_rate) as source:
+            def read_frame() -> bytes:
+                return source.stream.read(source.CHUNK)
+
+            self.calibrate(read_frame, source.SAMPLE_RATE)
+            print("\nListening... (Speak now)")
+            return self.listen_stream(read_frame, source.SAMPLE_RATE, timeout=timeout, on_speech=on_speech, vad=vad)
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+_stt: Optional[SpeechToText] = None
+
+
+def get_stt() -> SpeechToText:
+    """
+    Process-wide transcriber; keeps the microphone calibration between turns.
+    """
+    global _stt
+    if _stt is None:
+        _stt = SpeechToText()
+    return _stt
+
+
+if __name__ == "__main__":
+    # python -m tools.stt ../temp_input.wav --backend sphinx
+    parser = argparse.ArgumentParser(description="Transcribe WAV recordings with the streaming STT pipeline.")
+    parser.add_argument("wav_paths", nargs="+")
+    parser.add_argument("--backend", default=STT_BACKEND, choices=sorted(BACKENDS))
+    args = parser.parse_args()
+
+    stt = SpeechToText(get_backend(args.backend))
+    try:
+        for path in args.wav_paths:
+            with open(path, "rb") as f:
+                pcm = load_wav(f.read())
+            started = time.perf_counter()
+            text = stt.transcribe_pcm(pcm)
+            print(f"{path} ({pcm.duration:.1f}s audio, {time.perf_counter() - started:.2f}s): {text}")
+    finally:
+        stt.close()
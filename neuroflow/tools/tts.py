@@ -0,0 +1,433 @@
+import os
+import re
+import sys
+import atexit
+import asyncio
+import hashlib
+import shutil
+import subprocess
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Dict, Iterable, List, Optional
+import tracing
+
+"""
+Text-to-speech for the voice frontends, with a content-addressed audio cache.
+
+Synthesis goes through a pluggable backend: gTTS (network, the default) or pyttsx3
+(offline, uses the system's speech engine). Fixed phrases (the greeting, "Goodbye.") are
+stored under the hash of (backend, voice, text), so a phrase that was spoken once is
+served from disk afterwards. The cache is bounded by total size and evicts the least
+recently used clips.
+
+Replies are about the patient, so by default their audio is not cached: it goes to a
+private scratch directory and the caller releases each clip once it has been played
+(TTSEngine.release), or takes the audio as bytes (synthesize_bytes).
+NEUROFLOW_TTS_CACHE_REPLIES=1 caches replies too.
+
+Replies are spoken sentence by sentence: synthesize_stream() starts on each sentence as
+soon as it is complete, so the first one can play while the rest of the reply is still
+being generated or synthesized.
+"""
+
+TTS_BACKEND = os.getenv("NEUROFLOW_TTS_BACKEND", "gtts")  # gtts | pyttsx3
+TTS_VOICE = os.getenv("NEUROFLOW_TTS_VOICE", "en")  # gTTS language, or a pyttsx3 voice id
+TTS_CACHE_DIR = os.getenv("NEUROFLOW_TTS_CACHE", ".neuroflow/tts_cache")
+TTS_CACHE_MB = float(os.getenv("NEUROFLOW_TTS_CACHE_MB", "64"))
+TTS_WORKERS = int(os.getenv("NEUROFLOW_TTS_WORKERS", "2"))  # sentences synthesized at once
+TTS_CACHE_REPLIES = os.getenv("NEUROFLOW_TTS_CACHE_REPLIES", "0") == "1"  # replies hold patient details
+
+
+class TTSBackend(ABC):
+    """
+    Turns one piece of text into an audio file. Implementations may block; the engine
+    calls them from worker threads.
+    """
+
+    name = "base"
+    ext = ".mp3"
+    mime = "audio/mp3"
+
+    def __init__(self, voice: str = TTS_VOICE):
+        self.voice = voice
+
+    @abstractmethod
+    def synthesize_to(self, text: str, path: str):
+        ...
+
+
+class GTTSBackend(TTSBackend):
+    name = "gtts"
+
+    def synthesize_to(self, text: str, path: str):
+        from gtts import gTTS
+
+        gTTS(text=text, lang=self.voice or "en").save(path)
+
+
+class Pyttsx3Backend(TTSBackend):
+    """
+    Offline synthesis through pyttsx3 (espeak / SAPI5 / NSSpeechSynthesizer).
+    The driver is not thread-safe, so calls are serialized.
+    """
+
+    name = "pyttsx3"
+    ext = ".wav"
+    mime = "audio/wav"
+
+    def __init__(self, voice: str = ""):
+        super().__init__(voice)
+        import pyttsx3  # optional dependency, only needed for offline speech
+
+        self._engine = pyttsx3.init()
+        if voice and voice != "en":
+            self._engine.setProperty("voice", voice)
+        self._lock = threading.Lock()
+
+    def synthesize_to(self, text: str, path: str):
+        with self._lock:
+            self._engine.save_to_file(text, path)
+            self._engine.runAndWait()
+
+
+BACKENDS = {
+    "gtts": GTTSBackend,
+    "pyttsx3": Pyttsx3Backend,
+}
+
+
+def get_backend(name: str = TTS_BACKEND, voice: str = TTS_VOICE) -> TTSBackend:
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown TTS backend: {name} (expected one of {', '.join(BACKENDS)})")
+    return BACKENDS[name](voice)
+
+
+class AudioCache:
+    """
+    On-disk clips keyed by content hash, evicted least-recently-used by total bytes.
+    Access order is kept by file mtime, so it survives restarts.
+    """
+
+    def __init__(self, path: str = TTS_CACHE_DIR, max_bytes: int = int(TTS_CACHE_MB * 1024 * 1024)):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._sizes: Optional[Dict[str, int]] = None  # file name -> size, oldest access first
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(backend: TTSBackend, text: str) -> str:
+        normalized = " ".join(text.split())
+        return hashlib.sha256(f"{backend.name}\0{backend.voice}\0{normalized}".encode("utf-8")).hexdigest()
+
+    def _load(self) -> Dict[str, int]:
+        if self._sizes is None:
+            os.makedirs(self.path, exist_ok=True)
+            entries = []
+            for entry in os.scandir(self.path):
+                if entry.is_file() and not entry.name.startswith("."):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, entry.name, stat.st_size))
+            self._sizes = {name: size for _, name, size in sorted(entries)}
+        return self._sizes
+
+    def get(self, name: str) -> Optional[str]:
+        with self._lock:
+            sizes = self._load()
+            if name not in sizes:
+                return None
+            path = os.path.join(self.path, name)
+            if not os.path.exists(path):
+                sizes.pop(name)
+                return None
+            sizes[name] = sizes.pop(name)  # most recently used goes last
+        os.utime(path)
+        return path
+
+    def put(self, name: str, tmp_path: str) -> str:
+        """
+        Moves a freshly synthesized file into the cache and evicts old clips over budget.
+        """
+        path = os.path.join(self.path, name)
+        with self._lock:
+            sizes = self._load()
+            os.replace(tmp_path, path)
+            sizes.pop(name, None)
+            sizes[name] = os.path.getsize(path)
+            total = sum(sizes.values())
+            for old in list(sizes):
+                if total <= self.max_bytes or old == name:
+                    break
+                total -= sizes.pop(old)
+                try:
+                    os.remove(os.path.join(self.path, old))
+                except FileNotFoundError:
+                    pass
+        return path
+
+    def size(self) -> int:
+        with self._lock:
+            return sum(self._load().values())
+
+    def clear(self):
+        with self._lock:
+            shutil.rmtree(self.path, ignore_errors=True)
+            self._sizes = None
+
+
+_SENTENCE_END = re.compile(r"(?<=[.!?…])[\"')\]]*\s+")
+MIN_SENTENCE_CHARS = 12  # shorter fragments ("Okay.") are spoken together with the next sentence
+
+
+def split_sentences(text: str) -> List[str]:
+    splitter = SentenceSplitter()
+    return splitter.feed(text) + splitter.flush()
+
+
+class SentenceSplitter:
+    """
+    Incremental sentence splitter for streamed text: feed() returns the sentences that are
+    complete so far, flush() whatever is left at the end.
+    """
+
+    def __init__(self, min_chars: int = MIN_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, chunk: str) -> List[str]:
+        self._buffer += chunk
+        sentences = []
+        start = 0
+        for match in _SENTENCE_END.finditer(self._buffer):
+            candidate = self._buffer[start:match.start()].strip()
+            if len(candidate) >= self.min_chars:
+                sentences.append(candidate)
+                start = match.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self) -> List[str]:
+        rest, self._buffer = self._buffer.strip(), ""
+        return [rest] if rest else []
+
+
+class TTSEngine:
+    """
+    Cached synthesis in front of a backend. synthesize() blocks; the async variants run
+    the backend in a bounded set of threads.
+    """
+
+    def __init__(
+        self,
+        backend: Optional[TTSBackend] = None,
+        cache: Optional[AudioCache] = None,
+        workers: int = TTS_WORKERS,
+        cache_replies: bool = TTS_CACHE_REPLIES
+    ):
+        self.backend = backend or get_backend()
+        self.cache = cache or AudioCache()
+        self.workers = workers
+        self.cache_replies = cache_replies
+        self._scratch_dir: Optional[str] = None  # uncached clips, readable by this user only
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._inflight: Dict[str, threading.Event] = {}
+        self._inflight_lock = threading.Lock()
+
+    @property
+    def mime(self) -> str:
+        return self.backend.mime
+
+    def synthesize(self, text: str, cache: Optional[bool] = None) -> str:
+        """
+        Returns the path of an audio file speaking text, synthesizing it on a cache miss.
+        Concurrent requests for the same text share one synthesis.
+        cache=False (the default for replies, see cache_replies) writes a scratch clip
+        instead, which the caller must release() once it is done with it.
+        """
+        name = AudioCache.key(self.backend, text) + self.backend.ext
+        cached = self.cache.get(name)
+        if cached is not None:
+            tracing.incr("neuroflow_tts_requests_total", outcome="hit")
+            return cached
+        if not (self.cache_replies if cache is None else cache):
+            return self._synthesize_scratch(text)
+
+        while True:
+            cached = self.cache.get(name)
+            if cached is not None:
+                tracing.incr("neuroflow_tts_requests_total", outcome="hit")
+                return cached
+            with self._inflight_lock:
+                pending = self._inflight.get(name)
+                if pending is None:
+                    self._inflight[name] = threading.Event()
+                    break
+            pending.wait()
+
+        try:
+            tracing.incr("neuroflow_tts_requests_total", outcome="miss")
+            os.makedirs(self.cache.path, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(suffix=self.backend.ext, dir=self.cache.path, prefix=".tmp-")
+            os.close(fd)
+            try:
+                with tracing.span("tts_synthesize", backend=self.backend.name, chars=len(text)):
+                    self.backend.synthesize_to(text, tmp_path)
+                return self.cache.put(name, tmp_path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(name).set()
+
+    def _synthesize_scratch(self, text: str) -> str:
+        tracing.incr("neuroflow_tts_requests_total", outcome="uncached")
+        if self._scratch_dir is None:
+            self._scratch_dir = tempfile.mkdtemp(prefix="neuroflow-tts-")
+            atexit.register(shutil.rmtree, self._scratch_dir, True)
+        fd, path = tempfile.mkstemp(suffix=self.backend.ext, dir=self._scratch_dir)
+        os.close(fd)
+        try:
+            with tracing.span("tts_synthesize", backend=self.backend.name, chars=len(text)):
+                self.backend.synthesize_to(text, path)
+        except BaseException:
+            os.remove(path)
+            raise
+        return path
+
+    def release(self, path: str):
+        """
+        Deletes a scratch clip once it has been played. Cached clips are left alone.
+        """
+        if self._scratch_dir is not None and os.path.dirname(path) == self._scratch_dir:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def synthesize_bytes(self, text: str, cache: Optional[bool] = None) -> bytes:
+        """
+        The audio itself, for callers that keep it around (e.g. Streamlit's session state)
+        and so must not depend on a file that the cache may evict.
+        """
+        path = self.synthesize(text, cache)
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        finally:
+            self.release(path)
+
+    async def synthesize_async(self, text: str, cache: Optional[bool] = None) -> str:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(max(1, self.workers))
+        async with self._slots:
+            return await asyncio.to_thread(self.synthesize, text, cache)
+
+    async def synthesize_stream(self, chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+        """
+        Yields one audio path per sentence of the streamed text, in order. Each sentence is
+        handed to the backend as soon as it is complete, while later text is still arriving.
+        A sentence that fails to synthesize is logged and skipped; the rest is still spoken.
+        Release each path once it has been played.
+        """
+        splitter = SentenceSplitter()
+        pending: "asyncio.Queue[Optional[asyncio.Task]]" = asyncio.Queue()
+
+        async def produce():
+            try:
+                async for chunk in chunks:
+                    for sentence in splitter.feed(chunk):
+                        pending.put_nowait(asyncio.create_task(self.synthesize_async(sentence)))
+                for sentence in splitter.flush():
+                    pending.put_nowait(asyncio.create_task(self.synthesize_async(sentence)))
+            finally:
+                pending.put_nowait(None)
+
+        producer = asyncio.create_task(produce())
+        tasks: List[asyncio.Task] = []
+        try:
+            while True:
+                task = await pending.get()
+                if task is None:
+                    break
+                tasks.append(task)
+                try:
+                    clip = await task
+                except Exception as e:
+                    tasks.remove(task)
+                    tracing.incr("neuroflow_tts_failures_total")
+                    print(f"⚠️ Could not synthesize a sentence, skipping it: {type(e).__name__}: {e}")
+                    continue
+                tasks.remove(task)
+                yield clip
+            await producer  # surfaces errors from the text stream
+        finally:
+            producer.cancel()
+            while not pending.empty():
+                task = pending.get_nowait()
+                if task is not None:
+                    tasks.append(task)
+            for task in tasks:
+                # Clips that were synthesized but never handed out are not going to be played
+                if task.done() and not task.cancelled() and task.exception() is None:
+                    self.release(task.result())
+                task.cancel()
+
+    async def synthesize_text(self, text: str, cache: Optional[bool] = None) -> List[str]:
+        """
+        Sentence clips for a complete text, synthesized in parallel. Sentences that fail
+        are logged and left out.
+        """
+        clips = await asyncio.gather(
+            *(self.synthesize_async(s, cache) for s in split_sentences(text)), return_exceptions=True
+        )
+        for clip in clips:
+            if isinstance(clip, Exception):
+                tracing.incr("neuroflow_tts_failures_total")
+                print(f"⚠️ Could not synthesize a sentence, skipping it: {type(clip).__name__}: {clip}")
+        return [clip for clip in clips if isinstance(clip, str)]
+
+    def prerender(self, phrases: Iterable[str]):
+        """
+        Warms the cache with fixed phrases so they never wait on the backend.
+        """
+        for phrase in phrases:
+            try:
+                self.synthesize(phrase, cache=True)
+            except Exception as e:
+                print(f"⚠️ Could not pre-render {phrase[:30]!r}: {type(e).__name__}: {e}")
+
+
+def player_command(path: str) -> List[str]:
+    if sys.platform == "darwin":
+        return ["afplay", path]
+    if sys.platform == "win32":
+        return ["powershell", "-NoProfile", "-Command", f"(New-Object Media.SoundPlayer '{path}').PlaySync()"] \
+            if path.endswith(".wav") else ["cmd", "/c", "start", "/wait", "", path]
+    if path.endswith(".wav") and shutil.which("aplay"):
+        return ["aplay", "-q", path]
+    return ["mpg123", "-q", path]  # Requires mpg123 installed
+
+
+def play(path: str):
+    """
+    Plays an audio file and blocks until it has finished.
+    """
+    try:
+        subprocess.run(player_command(path), check=False, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except FileNotFoundError as e:
+        print(f"⚠️ No audio player available: {e}")
+
+
+_engine: Optional[TTSEngine] = None
+
+
+def get_engine() -> TTSEngine:
+    """
+    Process-wide engine for the configured backend.
+    """
+    global _engine
+    if _engine is None:
+        _engine = TTSEngine()
+    return _engine
@@ -0,0 +1,198 @@
+import os
+import time
+import asyncio
+from typing import AsyncIterator, Callable, Optional
+import tracing
+from tools import stt, tts
+
+"""
+Pipelined voice turn: stream -> sentences -> synthesis -> playback, all overlapping.
+
+The reply is split into sentences while it streams from the LLM. Each sentence is
+synthesized as soon as it is complete and queued on an async player, so the patient
+hears the first sentence while later ones are still being generated. Listening for the
+next utterance starts while the reply is playing; if the patient starts talking
+(barge-in), the current clip is stopped and everything still queued is dropped.
+
+Without headphones the microphone also hears the reply, so during playback speech has
+to be BARGE_IN_RATIO times louder than the calibrated threshold to interrupt.
+"""
+
+BARGE_IN = os.getenv("NEUROFLOW_VOICE_BARGE_IN", "1") == "1"
+BARGE_IN_RATIO = float(os.getenv("NEUROFLOW_VOICE_BARGE_IN_RATIO", "2.5"))
+
+
+class AudioPlayer:
+    """
+    Plays queued clips one after another in a subprocess, without blocking the event loop.
+    Each clip is passed to release once it has been played or dropped.
+    """
+
+    def __init__(self, release: Optional[Callable[[str], None]] = None):
+        self.release = release
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._generation = 0  # bumped by stop(); a clip dequeued before a stop must not start
+
+    @property
+    def playing(self) -> bool:
+        return self._process is not None or bool(self._queue and not self._queue.empty())
+
+    def enqueue(self, path: str):
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        self._queue.put_nowait(path)
+
+    async def _run(self):
+        while True:
+            path = await self._queue.get()
+            generation = self._generation
+            try:
+                self._process = await asyncio.create_subprocess_exec(
+                    *tts.player_command(path),
+                    stdout=asyncio.subprocess.DEVNULL,
+                    stderr=asyncio.subprocess.DEVNULL
+                )
+                if generation != self._generation:
+                    self._process.terminate()
+                await self._process.wait()
+            except FileNotFoundError as e:
+                print(f"⚠️ No audio player available: {e}")
+            finally:
+                self._process = None
+                self._release(path)
+                self._queue.task_done()
+
+    def _release(self, path: str):
+        if self.release is not None:
+            self.release(path)
+
+    def stop(self):
+        """
+        Barge-in: drops queued clips and stops the one playing.
+        """
+        self._generation += 1
+        if self._queue is not None:
+            while not self._queue.empty():
+                self._release(self._queue.get_nowait())
+                self._queue.task_done()
+        if self._process is not None and self._process.returncode is None:
+            self._process.terminate()
+
+    def stop_threadsafe(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self.stop)
+
+    async def wait(self):
+        """
+        Waits until everything queued has been played (or dropped).
+        """
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def close(self):
+        self.stop()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+class _PlaybackAwareVAD(stt.EnergyVAD):
+    """
+    The shared calibrated VAD, with a higher bar while our own audio is playing.
+    """
+
+    def __init__(self, vad: stt.EnergyVAD, player: AudioPlayer, ratio: float):
+        super().__init__(vad.threshold, vad.ratio)
+        self.vad = vad
+        self.player = player
+        self.ratio_during_playback = ratio
+
+    def is_speech(self, frame: bytes) -> bool:
+        threshold = self.vad.threshold * (self.ratio_during_playback if self.player.playing else 1.0)
+        return stt.rms(frame) > threshold
+
+
+class VoicePipeline:
+    """
+    Voice front end over NeuroFlowMain.stream_patient_message.
+    """
+
+    def __init__(
+        self,
+        neuroflow,
+        engine: Optional[tts.TTSEngine] = None,
+        recognizer: Optional[stt.SpeechToText] = None,
+        player: Optional[AudioPlayer] = None,
+        barge_in: bool = BARGE_IN
+    ):
+        self.neuroflow = neuroflow
+        self.engine = engine or tts.get_engine()
+        self.recognizer = recognizer or stt.get_stt()
+        self.player = player or AudioPlayer(release=self.engine.release)
+        self.barge_in = barge_in
+
+    async def respond(self, thread_id: str, patient_text: str) -> dict:
+        """
+        Runs one streamed turn, queueing each sentence for playback as soon as it is
+        synthesized. Returns the final event once the text is complete; the audio may
+        still be playing.
+        """
+        final: dict = {}
+        started = time.perf_counter()
+        print("NeuroFlow (Speaking): ", end="", flush=True)
+
+        async def reply_text() -> AsyncIterator[str]:
+            async for event in self.neuroflow.stream_patient_message(thread_id, patient_text):
+                if event["type"] == "delta":
+                    print(event["text"], end="", flush=True)
+                    yield event["text"]
+                else:
+                    final.update(event)
+
+        first = True
+        try:
+            async for clip in self.engine.synthesize_stream(reply_text()):
+                if first:
+                    # What the patient perceives: time until the first sentence can play
+                    tracing.observe("neuroflow_voice_first_audio_seconds", time.perf_counter() - started)
+                    first = False
+                self.player.enqueue(clip)
+        finally:
+            print()
+        return final
+
+    async def say(self, text: str):
+        """
+        Speaks a fixed phrase (cached after its first synthesis).
+        """
+        for clip in await self.engine.synthesize_text(text, cache=True):
+            self.player.enqueue(clip)
+
+    async def listen(self, timeout: float = 10.0) -> str:
+        """
+        Listens for the next utterance while the previous reply may still be playing.
+        """
+        on_speech = vad = None
+        if self.barge_in:
+            on_speech = self._barge_in
+            vad = _PlaybackAwareVAD(self.recognizer.vad, self.player, BARGE_IN_RATIO)
+        else:
+            await self.player.wait()
+        return await asyncio.to_thread(self.recognizer.listen_microphone, timeout=timeout, on_speech=on_speech, vad=vad)
+
+    def _barge_in(self):
+        # Called from the listening thread when speech starts
+        if self.player.playing:
+            tracing.incr("neuroflow_voice_barge_ins_total")
+        self.player.stop_threadsafe()
+
+    async def close(self):
+        await self.player.wait()
+        await self.player.close()
@@ -0,0 +1,317 @@
+import os
+import json
+import math
+import time
+import threading
+import contextvars
+from typing import Dict, List, Optional, Tuple
+
+"""
+Per-turn instrumentation for NeuroFlowMain.
+
+Stages of a turn are wrapped in spans:
+    with tracing.turn(thread_id):
+        with tracing.span("get_context"):
+            ...
+Each span feeds a latency histogram per stage, counters and size histograms are
+updated with incr()/observe(), and every finished turn is appended to a JSONL trace
+file with its spans and counts. render_prometheus() serves everything in the
+Prometheus text format (the server exposes it at GET /metrics).
+
+Disabled by default. Set NEUROFLOW_TRACING=1 to turn it on and NEUROFLOW_TRACE_FILE to
+choose the trace file ("" keeps traces in memory only). When disabled, span() and
+turn() return one shared no-op object and incr()/observe() return immediately.
+"""
+
+TRACING_ENABLED = os.getenv("NEUROFLOW_TRACING", "0") == "1"
+TRACE_PATH = os.getenv("NEUROFLOW_TRACE_FILE", ".neuroflow/traces.jsonl")
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+_current_turn: contextvars.ContextVar[Optional["Turn"]] = contextvars.ContextVar("neuroflow_turn", default=None)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+
+class _NoopSpan:
+    """
+    Returned by span()/turn() while tracing is disabled.
+    """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    __slots__ = ("tracer", "name", "attrs", "start", "duration")
+
+    def __init__(self, tracer: "Tracer", name: str, attrs: dict):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.start = 0.0
+        self.duration = 0.0
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.start
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.tracer._finish_span(self)
+        return False
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "ms": round(self.duration * 1000, 3), **self.attrs}
+
+
+class Turn(Span):
+    """
+    Root span of one patient turn; collects its child spans and counts.
+    """
+    __slots__ = ("thread_id", "spans", "counts", "_token", "_closed", "wall_start")
+
+    def __init__(self, tracer: "Tracer", name: str, thread_id: str, attrs: dict):
+        super().__init__(tracer, name, attrs)
+        self.thread_id = thread_id
+        self.spans: List[Span] = []
+        self.counts: Dict[str, float] = {}
+        self._token = None
+        self._closed = False
+        self.wall_start = 0.0
+
+    def __enter__(self):
+        self._token = _current_turn.set(self)
+        self.wall_start = time.time()
+        return super().__enter__()
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            _current_turn.reset(self._token)
+        except ValueError:
+            pass  # an abandoned streaming turn finalized from another context
+        self._closed = True
+        return super().__exit__(exc_type, exc, tb)
+
+    def to_dict(self) -> dict:
+        return {
+            "kind": self.name,
+            "thread_id": self.thread_id,
+            "ts": self.wall_start,
+            "ms": round(self.duration * 1000, 3),
+            **self.attrs,
+            "counts": self.counts,
+            "spans": [span.to_dict() for span in self.spans],
+        }
+
+
+class Tracer:
+    def __init__(self, enabled: bool = TRACING_ENABLED, trace_path: Optional[str] = TRACE_PATH):
+        self.enabled = enabled
+        self.trace_path = trace_path
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, _Histogram]] = {}
+        self._help: Dict[str, str] = {}
+        self._trace_file = None
+
+    # --- recording ---
+
+    def span(self, name: str, **attrs):
+        if not self.enabled:
+            return _NOOP
+        return Span(self, name, attrs)
+
+    def turn(self, thread_id, kind: str = "turn", **attrs):
+        if not self.enabled:
+            return _NOOP
+        return Turn(self, kind, str(thread_id), attrs)
+
+    def incr(self, name: str, value: float = 1, **labels):
+        """
+        Adds to a counter, and to the running turn's counts if there is one.
+        """
+        if not self.enabled:
+            return
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+        current = _current_turn.get()
+        if current is not None and not current._closed:
+            current.counts[name] = current.counts.get(name, 0) + value
+
+    def observe(self, name: str, value: float, buckets: Tuple[float, ...] = SECONDS_BUCKETS, **labels):
+        if not self.enabled:
+            return
+        key = _labels(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _Histogram(buckets)
+            histogram.observe(value)
+
+    def describe(self, name: str, text: str):
+        self._help[name] = text
+
+    def _finish_span(self, span: Span):
+        if isinstance(span, Turn):
+            self.observe("neuroflow_turn_duration_seconds", span.duration, kind=span.name)
+            self._write_trace(span)
+            return
+        self.observe("neuroflow_stage_duration_seconds", span.duration, stage=span.name)
+        current = _current_turn.get()
+        # Background work can outlive its turn; it still counts, but is not in the trace
+        if current is not None and not current._closed:
+            current.spans.append(span)
+
+    def _write_trace(self, turn: Turn):
+        if not self.trace_path:
+            return
+        line = json.dumps(turn.to_dict(), default=str) + "\n"
+        with self._lock:
+            if self._trace_file is None:
+                directory = os.path.dirname(self.trace_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._trace_file = open(self.trace_path, "a", encoding="utf-8", buffering=1)
+            self._trace_file.write(line)
+
+    def close(self):
+        with self._lock:
+            if self._trace_file is not None:
+                self._trace_file.close()
+                self._trace_file = None
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    # --- export ---
+
+    def render_prometheus(self) -> str:
+        """
+        All counters and histograms in the Prometheus text exposition format.
+        """
+        lines: List[str] = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in series.items():
+                    lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+            for name, series in sorted(self._histograms.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in series.items():
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(key + (('le', _format_value(bound)),))} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(key + (('le', '+Inf'),))} {histogram.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {_format_value(histogram.sum)}")
+                    lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(key: LabelKey) -> str:
+    if not key:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in key)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(key, escaped)) + "}"
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """
+    Nearest-rank percentile (0-100) of already sorted values; 0.0 when there are none.
+    """
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+tracer = Tracer()
+tracer.describe("neuroflow_turn_duration_seconds", "End-to-end duration of a patient turn.")
+tracer.describe("neuroflow_stage_duration_seconds", "Duration of each stage of a turn.")
+tracer.describe("neuroflow_prompt_chars", "Size of prompts sent to the LLM in characters.")
+tracer.describe("neuroflow_response_chars", "Size of raw LLM replies in characters.")
+tracer.describe("neuroflow_backboard_attempts_total", "Backboard call attempts by policy and outcome.")
+tracer.describe("neuroflow_backboard_retries_total", "Backboard call attempts that were retries.")
+tracer.describe("neuroflow_parse_failures_total", "LLM replies that could not be parsed.")
+tracer.describe("neuroflow_response_cache_total", "Cacheable turns by response cache outcome.")
+tracer.describe("neuroflow_classifier_agreement_total", "Local intent/emotion labels by agreement with the LLM's.")
+tracer.describe("neuroflow_risk_flags_total", "Risk categories flagged by the local screen.")
+tracer.describe("neuroflow_risk_escalations_total", "Turns answered with the crisis response without waiting on the LLM.")
+tracer.describe("neuroflow_session_loads_total", "Session states deserialized or reused, by source.")
+tracer.describe("neuroflow_session_evictions_total", "Live sessions dropped by a full in-memory session store.")
+tracer.describe("neuroflow_session_flush_batch", "Sessions written per batched session store flush.")
+tracer.describe("neuroflow_session_expired_total", "Abandoned sessions deleted from the SQLite session store after their TTL.")
+tracer.describe("neuroflow_tts_requests_total", "Speech synthesis requests by cache outcome.")
+tracer.describe("neuroflow_tts_failures_total", "Sentences skipped because speech synthesis failed.")
+tracer.describe("neuroflow_stt_failures_total", "Speech recognition segments that failed.")
+tracer.describe("neuroflow_stt_tail_seconds", "Time from the end of speech to the finished transcript.")
+tracer.describe("neuroflow_voice_first_audio_seconds", "Time from a voice turn starting to its first sentence being ready to play.")
+tracer.describe("neuroflow_voice_barge_ins_total", "Replies interrupted by the patient speaking.")
+
+
+def span(name: str, **attrs):
+    return tracer.span(name, **attrs)
+
+
+def turn(thread_id, kind: str = "turn", **attrs):
+    return tracer.turn(thread_id, kind, **attrs)
+
+
+def incr(name: str, value: float = 1, **labels):
+    tracer.incr(name, value, **labels)
+
+
+def observe(name: str, value: float, buckets: Tuple[float, ...] = SECONDS_BUCKETS, **labels):
+    tracer.observe(name, value, buckets, **labels)